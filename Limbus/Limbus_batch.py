@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+たくさんのPascalのプログラムを、複数のプロセスでまとめて構文解析して実行し、結果をJSONで出力する。
+
+    python Limbus_batch.py [-j プロセス数] [-o レポート] [--parse-only] [--regex] <ディレクトリ|ファイル|マニフェスト> ...
+
+ディレクトリはその下の.pasのファイル、マニフェストは1行に1つファイル名を書いたテキストファイル。
+"""
+import argparse
+import json
+import sys
+
+from pascal.pascal import PascalScanner, PascalRegexScanner
+from pascal.pascal_batch import collect_files, run_batch
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='compile and execute many Pascal programs')
+    arg_parser.add_argument('paths', nargs='+', help='directories, .pas files or manifests')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (default: CPU count)')
+    arg_parser.add_argument('-o', '--output', default=None, help='report file (default: stdout)')
+    arg_parser.add_argument('--parse-only', action='store_true', help='do not execute the programs')
+    arg_parser.add_argument('--regex', action='store_true', help='use PascalRegexScanner')
+    args = arg_parser.parse_args()
+
+    files = collect_files(args.paths)
+    if not files:
+        print('no Pascal files found', file=sys.stderr)
+        sys.exit(1)
+
+    scanner_class = PascalRegexScanner if args.regex else PascalScanner
+    report = run_batch(files, workers=args.jobs, execute=not args.parse_only, scanner_class=scanner_class)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    summary = report['summary']
+    print('%d files, %d workers, %.2f sec, %.1f files/sec' %
+          (summary['files'], report['workers'], summary['elapsed'], summary['files_per_sec']), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Pascalのソースを字句に分けて、1行に1 Tokenずつ出力する。
+
+    python Limbus_tokens.py <file>
+
+Sourceを1行ずつ読み、Tokenも出力したら捨てるので、大きなファイルでも使うメモリは一定。
+"""
+import sys
+
+from limbus_core.frontend.source import Source
+from limbus_core.frontend.token import TokenType
+from pascal.pascal import PascalScanner
+
+TOKEN_FORMAT = '%05d %03d %-15s %-16s %s'
+
+
+def dump_tokens(file, out=sys.stdout):
+    with open(file) as reader:
+        scanner = PascalScanner(Source(reader))
+        for token in scanner:
+            if token.type == TokenType.PASCAL:
+                kind = token.ptype.name
+            else:
+                kind = token.type.name
+            print(TOKEN_FORMAT % (token.line_num, token.pos, kind, token.text, token.value), file=out)
+
+
+def main():
+    if len(sys.argv) != 2:
+        print('usage: python Limbus_tokens.py <file>')
+        sys.exit(1)
+    dump_tokens(sys.argv[1])
+
+
+if __name__ == '__main__':
+    main()
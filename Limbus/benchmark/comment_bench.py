@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+コメントの多い入力での、空白とコメントの読み飛ばしの速度比較。
+
+    python -m benchmark.comment_bench [MB]
+
+pascal_src のプログラムの各行に { }, (* *), // のコメントとタブを加えた入力を作り、
+一文字ずつ読み飛ばすPascalScanner、まとめて読み飛ばすPascalScanner、PascalRegexScannerで全Tokenを読み出す時間を計る。
+"""
+import sys
+
+from benchmark.scanner_bench import make_input, scan
+from pascal.pascal import PascalScanner, PascalRegexScanner
+
+
+class CharSkipScanner(PascalScanner):
+    """
+    空白とコメントを一文字ずつ読み飛ばすPascalScanner。
+    """
+    def skip_whitespace(self):
+        self.skip_whitespace_chars()
+
+
+def add_comments(text):
+    lines = []
+    for n, line in enumerate(text.split('\n')):
+        if n % 10 == 0:
+            lines.append('(* ' + 'generated block comment ' * 4)
+            lines.append('   ' + 'continued over several lines ' * 3)
+            lines.append('*)')
+        if n % 3 == 0:
+            lines.append('// ' + 'line comment ' * 5)
+        lines.append('\t' + line + '  { ' + 'trailing comment ' * 3 + '}')
+    return '\n'.join(lines)
+
+
+def main():
+    mb = float(sys.argv[1]) if len(sys.argv) > 1 else 4.0
+    size = int(mb * 1024 * 1024)
+    text = add_comments(make_input(size // 4))[:size]
+    text = text[:text.rfind('\n') + 1]
+    print("input: %d bytes, %d lines" % (len(text), text.count('\n')))
+
+    base = None
+    for name, scanner_class in [('char skip', CharSkipScanner), ('PascalScanner', PascalScanner),
+                                ('PascalRegexScanner', PascalRegexScanner)]:
+        count, elapsed = scan(scanner_class, text)
+        if base == None:
+            base = elapsed
+        print("%-20s %8d tokens %8.3f sec %10.0f tokens/sec  x%.1f" %
+              (name, count, elapsed, count / elapsed, base / elapsed))
+
+
+if __name__ == '__main__':
+    main()
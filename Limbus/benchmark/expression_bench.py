@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+式の構文解析にかかる時間の計測。
+
+    python -m benchmark.expression_bench [文の数]
+
+多項式の評価や座標の計算のような、式の多い数値計算のプログラムを作り、
+PascalParserTDで構文解析する時間を計る。字句解析の時間を含めないように、Tokenは先に全部読んでおく。
+1秒あたりに解析したオペランドの数も表示する。
+"""
+import contextlib
+import io
+import random
+import re
+import sys
+import time
+
+from limbus_core.frontend.source import BufferedSource
+from pascal.pascal import PascalScanner
+from pascal.pascal_parser import PascalParserTD
+
+INTEGERS = ['i', 'j', 'k', 'n', 'm']
+REALS = ['x', 'y', 'z', 'h', 's', 't']
+
+# 整数の式と実数の式の雛形。{i}は整数の変数、{r}は実数の変数、{c}は実数の定数。
+# DIVとMODの結果は実数の型になるので、それを含む式は実数の変数に代入する。
+INTEGER_TEMPLATES = [
+    '({i} * 3 + {i} * 2) * 7 - {i}',
+    '{i} + {i} * ({i} - 1) - 2',
+    '-{i} + ({i} + {i}) * ({i} - {i})',
+]
+REAL_TEMPLATES = [
+    '({i} * 3 + {i} div 2) - {i} mod 7',
+    '{i} + {i} * ({i} - 1) div 2',
+    '(({r} * {r} + {c}) * {r} - {c}) * {r} + {c}',
+    '{r} * {r} + {r} * {r} - 2 * {r} * {r}',
+    '({r} - {r}) * ({r} + {r}) + ({i} + {i}) / ({i} + 1)',
+    '-{r} * {c} + {r} * ({r} - {c} * {r})',
+]
+CONDITIONS = [
+    '{r} * {r} + {r} * {r} < {c}',
+    '({i} + {i}) mod 3 = {i} - {i}',
+    '{r} - {c} * {r} >= {r} + {r}',
+]
+
+
+def fill(template):
+    return re.sub(r'\{(.)\}', lambda m: {'i': random.choice(INTEGERS),
+                                        'r': random.choice(REALS),
+                                        'c': '%d.%d' % (random.randint(0, 9), random.randint(1, 99))}[m.group(1)],
+                  template)
+
+
+def make_program(n_statements):
+    random.seed(0)
+    lines = ['PROGRAM numeric;', 'VAR',
+             '    %s : integer;' % ', '.join(INTEGERS),
+             '    %s : real;' % ', '.join(REALS),
+             'BEGIN']
+    for k in range(n_statements):
+        kind = k % 4
+        if kind == 0:
+            lines.append('    %s := %s;' % (random.choice(INTEGERS), fill(random.choice(INTEGER_TEMPLATES))))
+        elif kind == 1 or kind == 2:
+            lines.append('    %s := %s;' % (random.choice(REALS), fill(random.choice(REAL_TEMPLATES))))
+        else:
+            lines.append('    IF %s THEN %s := %s;' % (fill(random.choice(CONDITIONS)),
+                                                      random.choice(REALS), fill(random.choice(REAL_TEMPLATES))))
+    lines.append('    %s := 0' % INTEGERS[0])
+    lines.append('END.')
+    return '\n'.join(lines) + '\n'
+
+
+def parse(text):
+    """
+    先にTokenを全部読んでScannerの先読みに入れておき、構文解析だけにかかる時間を計る。
+    """
+    scanner = PascalScanner(BufferedSource(io.StringIO(text)))
+    scanner.lookahead.extend(list(scanner.tokens()))
+
+    parser = PascalParserTD(scanner)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser.parse()
+    return time.perf_counter() - start, parser.get_error_count()
+
+
+def main():
+    n_statements = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = 5
+    text = make_program(n_statements)
+    operands = len(re.findall(r'\b(?:[a-z]|\d+\.\d+|\d+)\b', text.split('BEGIN', 1)[1]))
+    print("input: %d lines, %d operands" % (text.count('\n'), operands))
+
+    results = [parse(text) for _ in range(repeat)]
+    parse_time = min(t for t, errors in results)
+    print("errors  %7d" % results[0][1])
+    print("parse   %7.3f sec  %8.0f operands/sec" % (parse_time, operands / parse_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+フロントエンドの各段階の処理速度とメモリの計測。
+
+    python -m benchmark.frontend_bench [-n 行数] [-r 繰り返し回数] [-o 結果.json] [-c 以前の結果.json]
+
+program_generatorで種類ごとにおよそn行のプログラムを作り、次の4つを別々に計る。
+  scan   PascalScannerで全Tokenを読む
+  parse  PascalParserTD.parse (字句解析を含む)
+  xref   CrossReferencerで相互参照表を出力する
+  tree   ParseTreePrinterでiCodeを出力する
+時間はGCを止めて計ったr回のうち最短のもので、Token/秒と行/秒にする。メモリはtracemallocで別に1回計ったピーク。
+結果はJSONで保存し、-cで以前の結果を渡すと、時間の比(今回/以前)も表示する。
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from limbus_core.frontend.source import BufferedSource
+from limbus_core.frontend.token import TokenType
+from limbus_core.intermidiate.cross_referencer import CrossReferencer
+from limbus_core.intermidiate.parse_tree_printer import ParseTreePrinter
+from pascal.pascal import PascalScanner
+from pascal.pascal_parser import PascalParserTD
+from benchmark.program_generator import KINDS, make_program
+
+STAGES = ['scan', 'parse', 'xref', 'tree']
+
+
+def scan(text, state):
+    scanner = PascalScanner(BufferedSource(io.StringIO(text)))
+    count = 0
+    while scanner.next_token().type != TokenType.EOF:
+        count += 1
+    state['tokens'] = count
+
+
+def parse(text, state):
+    parser = PascalParserTD(PascalScanner(BufferedSource(io.StringIO(text))))
+    parser.parse()
+    state['errors'] = parser.get_error_count()
+    state['symtab_stack'] = parser.get_symTab()
+
+
+def xref(text, state):
+    CrossReferencer().print(state['symtab_stack'])
+
+
+def tree(text, state):
+    ParseTreePrinter(io.StringIO()).print(state['symtab_stack'])
+
+
+STAGE_FUNCTIONS = {'scan': scan, 'parse': parse, 'xref': xref, 'tree': tree}
+
+
+def measure(stage, text, state, repeat, devnull):
+    """
+    stageの処理の最短の時間と、tracemallocで計ったメモリのピーク(バイト)。
+    SymTabEntryのデバッグ用のprintと相互参照表の出力は捨てる。
+    """
+    function = STAGE_FUNCTIONS[stage]
+    best = None
+    with contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            # timeitと同じく、計っている間はGCを止める
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                function(text, state)
+                elapsed = time.perf_counter() - start
+            finally:
+                gc.enable()
+            if best == None or elapsed < best:
+                best = elapsed
+
+        tracemalloc.start()
+        try:
+            function(text, state)
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+def run(n, repeat):
+    # 深い入れ子の解析とiCodeの出力は再帰が深くなる
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    devnull = open(os.devnull, 'w')
+    programs = {}
+    for kind in KINDS:
+        text = make_program(kind, n)
+        lines = text.count('\n')
+        state = {}
+        stages = {}
+        for stage in STAGES:
+            seconds, peak = measure(stage, text, state, repeat, devnull)
+            stages[stage] = {'seconds': seconds,
+                             'tokens_per_sec': state['tokens'] / seconds,
+                             'lines_per_sec': lines / seconds,
+                             'peak_memory': peak}
+        programs[kind] = {'lines': lines, 'bytes': len(text), 'tokens': state['tokens'],
+                          'errors': state['errors'], 'stages': stages}
+    devnull.close()
+
+    return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'lines': n, 'repeat': repeat,
+            'programs': programs}
+
+
+def print_result(result, previous=None):
+    print('%-13s %-6s %7s %9s %12s %11s %10s %s' %
+          ('program', 'stage', 'lines', 'sec', 'tokens/sec', 'lines/sec', 'peak KB', '' if previous == None else 'ratio'))
+    for kind, program in result['programs'].items():
+        for stage, values in program['stages'].items():
+            ratio = ''
+            if previous != None:
+                try:
+                    ratio = 'x%.2f' % (values['seconds'] / previous['programs'][kind]['stages'][stage]['seconds'])
+                except (KeyError, ZeroDivisionError):
+                    ratio = '-'
+            print('%-13s %-6s %7d %9.3f %12.0f %11.0f %10.0f %s' %
+                  (kind, stage, program['lines'], values['seconds'], values['tokens_per_sec'],
+                   values['lines_per_sec'], values['peak_memory'] / 1024, ratio))
+        if program['errors'] != 0:
+            print('%-13s %d syntax errors' % (kind, program['errors']))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='front end benchmark')
+    arg_parser.add_argument('-n', '--lines', type=int, default=5000, help='lines per generated program')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3, help='timing runs per stage')
+    arg_parser.add_argument('-o', '--output', default=None, help='write the result as JSON')
+    arg_parser.add_argument('-c', '--compare', default=None, help='previous JSON result to compare with')
+    args = arg_parser.parse_args()
+
+    result = run(args.lines, args.repeat)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as fp:
+            previous = json.load(fp)
+    print_result(result, previous)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(result, fp, indent=2)
+
+
+if __name__ == '__main__':
+    main()
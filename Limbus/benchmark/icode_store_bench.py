@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+iCodeNodeの木と、iCodeStoreの表のメモリと走査の時間の比較。
+
+    python -m benchmark.icode_store_bench [-n 行数] [-r 繰り返し回数] [kind ...]
+
+program_generatorの各種類のプログラムを構文解析し、すべてのルーチンのiCodeをiCodeStoreに詰める。
+メモリはノードの構造の大きさ(sys.getsizeofの合計)で、識別子や定数など両方で共有するオブジェクトは数えない。
+走査は部分木のすべてのノードを前順に訪ねて、種類ごとの数とLINEの最大を求める時間で、r回のうち最短のもの。
+  objects   iCodeNodeのchildrenを辿る
+  views     iCodeStoreNodeのget_childrenを辿る
+  columns   iCodeStore.walkの番号で列を直接読む
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+from benchmark.program_generator import KINDS, make_program
+from limbus_core.context import CompilationContext
+from limbus_core.frontend.source import BufferedSource
+from limbus_core.intermidiate.iCode_store import iCodeStore, NO_NODE
+from pascal.pascal import PascalRegexScanner
+from pascal.pascal_parser import PascalParserTD
+
+
+def parse_roots(text):
+    parser = PascalParserTD(PascalRegexScanner(BufferedSource(io.StringIO(text))), CompilationContext())
+    parser.parse()
+    roots = []
+    pending = [parser.get_symTab().get_program_id()]
+    while pending:
+        routine_id = pending.pop()
+        root = routine_id.get_attribute('ROUTINE_ICODE').get_root()
+        if root != None:
+            roots.append(root)
+        pending.extend(routine_id.get_attribute('ROUTINE_ROUTINES'))
+    return roots
+
+
+def object_size(roots):
+    size = 0
+    pending = list(roots)
+    while pending:
+        node = pending.pop()
+        size += sys.getsizeof(node) + sys.getsizeof(node.children)
+        pending.extend(node.children)
+    return size
+
+
+def store_size(store):
+    size = sum(sys.getsizeof(column) for column in
+               (store.kinds, store.first_child, store.next_sibling, store.parent, store.lines,
+                store.typespecs, store.ids, store.values))
+    size += sum(sys.getsizeof(table) for table in
+                (store.kind_names, store.typespec_table, store.symbol_table, store.constant_table, store.attributes))
+    return size + sum(sys.getsizeof(attributes) for attributes in store.attributes.values())
+
+
+def visit_objects(roots):
+    counts = {}
+    max_line = 0
+    pending = list(roots)
+    while pending:
+        node = pending.pop()
+        counts[node.type] = counts.get(node.type, 0) + 1
+        line = node.line
+        if line != None and line > max_line:
+            max_line = line
+        pending.extend(node.children)
+    return counts, max_line
+
+
+def visit_views(roots):
+    counts = {}
+    max_line = 0
+    pending = list(roots)
+    while pending:
+        node = pending.pop()
+        node_type = node.type
+        counts[node_type] = counts.get(node_type, 0) + 1
+        line = node.line
+        if line != None and line > max_line:
+            max_line = line
+        pending.extend(node.get_children())
+    return counts, max_line
+
+
+def visit_columns(store, roots):
+    kinds = store.kinds
+    lines = store.lines
+    kind_counts = [0] * len(store.kind_names)
+    max_line = 0
+    for root in roots:
+        for index in store.walk(root.index):
+            kind_counts[kinds[index]] += 1
+            line = lines[index]
+            if line != NO_NODE and line > max_line:
+                max_line = line
+    counts = dict((name, count) for name, count in zip(store.kind_names, kind_counts) if count != 0)
+    return counts, max_line
+
+
+def best(function, repeat):
+    result = None
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if seconds == None or elapsed < seconds:
+            seconds = elapsed
+    return seconds, result
+
+
+def run(kind, n, repeat):
+    text = make_program(kind, n)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        roots = parse_roots(text)
+    store = iCodeStore()
+    views = [store.add_tree(root) for root in roots]
+
+    objects_time, expected = best(lambda: visit_objects(roots), repeat)
+    views_time, result = best(lambda: visit_views(views), repeat)
+    assert result == expected
+    columns_time, result = best(lambda: visit_columns(store, views), repeat)
+    assert result == expected
+    return len(store), object_size(roots), store_size(store), objects_time, views_time, columns_time
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='iCodeStore memory and traversal benchmark')
+    arg_parser.add_argument('-n', '--lines', type=int, default=5000, help='lines of each generated program')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=5, help='timing runs')
+    arg_parser.add_argument('kinds', nargs='*', default=KINDS, help='program kinds')
+    args = arg_parser.parse_args()
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+
+    print('%-13s %8s %10s %9s %6s %10s %10s %10s' %
+          ('kind', 'nodes', 'objects', 'store', 'ratio', 'obj ms', 'view ms', 'column ms'))
+    for kind in args.kinds:
+        nodes, object_bytes, store_bytes, objects_time, views_time, columns_time = run(kind, args.lines, args.repeat)
+        print('%-13s %8d %9dK %8dK %5.1fx %10.2f %10.2f %10.2f' %
+              (kind, nodes, object_bytes // 1024, store_bytes // 1024, object_bytes / store_bytes,
+               objects_time * 1000, views_time * 1000, columns_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+差分の構文解析(PascalIncrementalParser.edit)と、プログラム全体の構文解析の時間の比較。
+
+    python -m benchmark.incremental_bench [-n 行数] [-r 繰り返し回数]
+
+program_generatorのproceduresでおよそn行のプログラムを作り、プログラムの前の方、中ほど、後ろの方の手続きで、
+次の2つの編集をして元に戻す。時間はr回のうち最短のもの。
+  same-line  行の中の定数を書き換える(行数は変わらない)
+  new-line   文を1行足す(後ろのiCodeと相互参照の行番号をずらす)
+"""
+import argparse
+import contextlib
+import gc
+import os
+import sys
+import time
+
+from benchmark.program_generator import make_program
+from pascal.pascal_incremental import PascalIncrementalParser
+
+# 編集する文。proceduresの手続きと関数は、どれもこの文を持つ。
+STATEMENT = '        u := t - a;\n'
+EDITS = {
+    'same-line': ('        u := t - a;\n', '        u := t - 7;\n'),
+    'new-line': ('        u := t - a;\n', '        u := t - a;\n        u := u + 1;\n'),
+}
+
+
+def timed(function):
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = function()
+        return time.perf_counter() - start, result
+    finally:
+        gc.enable()
+
+
+def run(n, repeat):
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    text = make_program('procedures', n)
+    devnull = open(os.devnull, 'w')
+    rows = []
+    with contextlib.redirect_stdout(devnull):
+        full = min(timed(lambda: PascalIncrementalParser(text))[0] for _ in range(repeat))
+        parser = PascalIncrementalParser(text)
+        for where in (0.1, 0.4, 0.8):
+            for name, (old, new) in EDITS.items():
+                start = parser.text.index(STATEMENT, int(len(parser.text) * where))
+                best = None
+                reparsed = None
+                for _ in range(repeat):
+                    # 編集して元に戻す。どちらも差分の構文解析になる。
+                    seconds, reparsed = timed(lambda: parser.edit(start, start + len(old), new))
+                    parser.edit(start, start + len(new), old)
+                    if best == None or seconds < best:
+                        best = seconds
+                rows.append((where, name, reparsed.get_name() if reparsed != None else '(full)', best))
+    devnull.close()
+    return text.count('\n'), full, rows
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='incremental parsing benchmark')
+    arg_parser.add_argument('-n', '--lines', type=int, default=20000, help='lines of the generated program')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=5, help='timing runs per edit')
+    args = arg_parser.parse_args()
+
+    lines, full, rows = run(args.lines, args.repeat)
+    print('%d lines, full parse %.1f ms' % (lines, full * 1000))
+    print('%-6s %-10s %-10s %9s %8s' % ('where', 'edit', 'routine', 'ms', 'speedup'))
+    for where, name, routine, seconds in rows:
+        print('%-6.1f %-10s %-10s %9.2f %7.0fx' % (where, name, routine, seconds * 1000, full / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+単語の分類(予約語か識別子か)にかかる時間の比較。
+
+    python -m benchmark.keyword_bench [語数]
+
+識別子の多いプログラムを作り、その中の単語を
+以前の方法(upper()してreserved_listを先頭から探す)とclassify_word()で分類する。
+最後に同じプログラムをPascalScannerで読んだ時の速度も表示する。
+"""
+import io
+import random
+import re
+import sys
+import time
+
+from limbus_core.frontend.source import BufferedSource
+from limbus_core.frontend.token import TokenType
+from pascal.pascal import PascalScanner
+from pascal.pascal_token import PTT, reserved_list, classify_word
+
+
+def make_program(n_words):
+    random.seed(0)
+    names = ['alpha', 'Beta', 'gamma1', 'delta', 'EpsilonValue', 'zeta', 'eta', 'theta', 'Index', 'count']
+    lines = ['PROGRAM ident;', 'VAR']
+    lines += ['    %s : integer;' % name for name in names]
+    lines.append('BEGIN')
+    words = 0
+    while words < n_words:
+        a, b, c, d = (random.choice(names) for _ in range(4))
+        lines.append('    %s := %s + %s * %s;' % (a, b, c, d))
+        lines.append('    if %s > %s then %s := %s div %s;' % (a, b, c, d, a))
+        words += 11
+    lines.append('END.')
+    return '\n'.join(lines) + '\n'
+
+
+def old_classify_word(s):
+    if s.upper() in reserved_list:
+        return PTT.RESERVED, s.upper()
+    else:
+        return PTT.IDENTIFIER, s
+
+
+def classify(func, words):
+    start = time.perf_counter()
+    for s in words:
+        func(s)
+    return time.perf_counter() - start
+
+
+def main():
+    n_words = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    text = make_program(n_words)
+
+    words = re.findall(r'[A-Za-z][A-Za-z0-9]*', text)
+    print("input: %d words" % len(words))
+
+    base = classify(old_classify_word, words)
+    new = classify(classify_word, words)
+    print("reserved_list scan  %7.1f ns/word" % (base / len(words) * 1e9))
+    print("classify_word       %7.1f ns/word  x%.1f" % (new / len(words) * 1e9, base / new))
+
+    scanner = PascalScanner(BufferedSource(io.StringIO(text)))
+    count = 0
+    start = time.perf_counter()
+    while scanner.next_token().type != TokenType.EOF:
+        count += 1
+    print("PascalScanner       %7.0f tokens/sec" % (count / (time.perf_counter() - start)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+2段階の構文解析(ParallelPascalParser)と、1回の構文解析(PascalParserTD)の時間の比較。
+
+    python -m benchmark.parallel_bench [-n 行数] [-w worker数] [-r 繰り返し回数]
+
+program_generatorのproceduresでおよそn行のプログラムを作って構文解析する。時間はr回のうち最短のもの。
+parallelの内訳として、1段階目(skeleton)だけの時間も計る。
+"""
+import argparse
+import contextlib
+import gc
+import io
+import os
+import sys
+import time
+
+from benchmark.program_generator import make_program
+from limbus_core.context import CompilationContext
+from limbus_core.frontend.source import BufferedSource
+from pascal.pascal import PascalRegexScanner
+from pascal.pascal_parser import PascalParserTD
+from pascal.pascal_parallel import ParallelPascalParser, parse_skeleton
+
+
+def timed(function):
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        function()
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def parse(text, parser_class, **kwargs):
+    parser = parser_class(PascalRegexScanner(BufferedSource(io.StringIO(text))), CompilationContext(), **kwargs)
+    parser.parse()
+
+
+def run(n, workers, repeat):
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    text = make_program('procedures', n)
+    rows = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        rows.append(('sequential', min(timed(lambda: parse(text, PascalParserTD)) for _ in range(repeat))))
+        rows.append(('skeleton', min(timed(lambda: parse_skeleton(text, PascalRegexScanner)) for _ in range(repeat))))
+        rows.append(('parallel', min(timed(lambda: parse(text, ParallelPascalParser, workers=workers))
+                                     for _ in range(repeat))))
+    return text.count('\n'), rows
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='parallel parsing benchmark')
+    arg_parser.add_argument('-n', '--lines', type=int, default=20000, help='lines of the generated program')
+    arg_parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3, help='timing runs')
+    args = arg_parser.parse_args()
+
+    lines, rows = run(args.lines, args.workers, args.repeat)
+    print('%d lines, %d workers, %d cpus' % (lines, args.workers, os.cpu_count() or 1))
+    sequential = rows[0][1]
+    for name, seconds in rows:
+        print('%-10s %9.1f ms %6.2fx' % (name, seconds * 1000, sequential / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+フロントエンドのベンチマークに使う、Pascalのプログラムの生成。
+
+どのプログラムもおよそn行で、構文エラーの無いもの。
+現在のParserで扱えない構文(FOR文、2文字以上の文字列の定数)と、
+型の検査でエラーになる式(実数の/、DIVとMODの結果の整数の変数への代入)は使わない。
+"""
+
+# 生成するプログラムの種類。frontend_benchはこの順に計る。
+KINDS = ['declarations', 'nesting', 'expressions', 'case', 'procedures']
+
+
+def make_program(kind, n):
+    return GENERATORS[kind](n)
+
+
+def declarations(n):
+    """
+    定数、型、変数の定義が大半を占めるプログラム。
+    """
+    count = max(1, n // 8)
+    lines = ['PROGRAM declarations;', 'CONST']
+    for i in range(count):
+        lines.append('    c%d = %d;' % (i, i + 10))
+        lines.append('    r%d = %d.5;' % (i, i))
+    lines.append('TYPE')
+    for i in range(count):
+        lines.append('    e%d = (red%d, green%d, blue%d);' % (i, i, i, i))
+        lines.append('    s%d = 1..c%d;' % (i, i))
+        lines.append('    a%d = ARRAY [1..10] OF s%d;' % (i, i))
+        lines.append('    rec%d = RECORD x, y : real; n : integer END;' % i)
+    lines.append('VAR')
+    for i in range(count):
+        lines.append('    v%d : e%d; w%d : a%d;' % (i, i, i, i))
+        lines.append('    p%d : rec%d;' % (i, i))
+    lines.append('BEGIN')
+    lines.append('    v0 := red0')
+    lines.append('END.')
+    return '\n'.join(lines) + '\n'
+
+
+def nesting(n):
+    """
+    深く入れ子になった手続きと、入れ子になったIF, WHILE, REPEAT文のプログラム。
+    """
+    depth = 12
+    lines = ['PROGRAM nesting;', 'VAR', '    i, j : integer;', '    x : real;']
+    for d in range(depth):
+        indent = '    ' * d
+        lines.append('%sPROCEDURE level%d(n : integer);' % (indent, d))
+        lines.append('%s    VAR k%d : integer;' % (indent, d))
+    for d in range(depth - 1, -1, -1):
+        indent = '    ' * d
+        lines.append('%s    BEGIN' % indent)
+        lines.append('%s        k%d := n + %d' % (indent, d, d))
+        lines.append('%s    END;' % indent)
+
+    lines.append('BEGIN')
+    blocks = max(1, n // (depth * 4))
+    for b in range(blocks):
+        for d in range(depth):
+            indent = '    ' * (d + 1)
+            kind = d % 3
+            if kind == 0:
+                lines.append('%sIF i < %d THEN BEGIN' % (indent, b + d))
+            elif kind == 1:
+                lines.append('%sWHILE j > %d DO BEGIN' % (indent, d))
+            else:
+                lines.append('%sREPEAT' % indent)
+            lines.append('%s    j := j - 1; x := x * 0.5;' % indent)
+        for d in range(depth - 1, -1, -1):
+            indent = '    ' * (d + 1)
+            if d % 3 == 2:
+                lines.append('%s    i := i + 1' % indent)
+                lines.append('%sUNTIL i > %d;' % (indent, d))
+            else:
+                lines.append('%s    i := i + 1' % indent)
+                lines.append('%sEND;' % indent)
+        lines.append('    level0(i);')
+    lines.append('    i := 0')
+    lines.append('END.')
+    return '\n'.join(lines) + '\n'
+
+
+def expressions(n):
+    """
+    長い式の代入が並ぶプログラム。
+    """
+    integers = ['i', 'j', 'k', 'm']
+    reals = ['x', 'y', 'z']
+    lines = ['PROGRAM expressions;', 'VAR',
+             '    %s : integer;' % ', '.join(integers),
+             '    %s : real;' % ', '.join(reals),
+             '    b : boolean;',
+             'BEGIN']
+    for s in range(max(1, n)):
+        terms = []
+        for t in range(8):
+            a = integers[(s + t) % len(integers)]
+            b = integers[(s + t * 3) % len(integers)]
+            if t % 4 == 0:
+                terms.append('(%s + %d) * %s' % (a, t, b))
+            elif t % 4 == 1:
+                terms.append('%s * %s - %d' % (a, b, t))
+            elif t % 4 == 2:
+                terms.append('(-%s)' % a)
+            else:
+                terms.append('(%s - %s) * (%s + 1)' % (a, b, a))
+        kind = s % 3
+        if kind == 0:
+            lines.append('    %s := %s;' % (integers[s % len(integers)], ' + '.join(terms)))
+        elif kind == 1:
+            r = reals[s % len(reals)]
+            lines.append('    %s := %s * %s * (%s + 1.5) + %s;' % (r, r, r, r, ' - '.join(terms[:8])))
+        else:
+            lines.append('    b := (%s < %s) AND (%s >= %s) OR NOT (%s = %s);' %
+                         (terms[0], terms[1], terms[2], terms[3], terms[4], terms[5]))
+    lines.append('    i := 0')
+    lines.append('END.')
+    return '\n'.join(lines) + '\n'
+
+
+# 文字のCASE文の分岐に使う文字。同じ文字が2度出ないように、英数字だけを使う。
+CASE_CHARS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+
+
+def case(n):
+    """
+    分岐の多いCASE文のプログラム。
+    """
+    branches = 200
+    lines = ['PROGRAM cases;', 'VAR', '    i, j : integer;', '    c : char;', 'BEGIN']
+    s = 0
+    while s == 0 or len(lines) < n:
+        if s % 2 == 0:
+            lines.append('    CASE i + %d OF' % s)
+            for b in range(branches):
+                lines.append('        %d, %d: j := j + %d;' % (b * 2, b * 2 + 1, b))
+        else:
+            lines.append('    CASE c OF')
+            for b, cc in enumerate(CASE_CHARS):
+                lines.append("        '%s': j := %d;" % (cc, b))
+        lines.append('    END;')
+        s += 1
+    lines.append('    i := 0')
+    lines.append('END.')
+    return '\n'.join(lines) + '\n'
+
+
+def procedures(n):
+    """
+    引数と局所変数を持つ手続きと関数がたくさんあるプログラム。
+    """
+    count = max(1, n // 12)
+    lines = ['PROGRAM procedures;', 'VAR', '    i, j : integer;', '    x : real;']
+    for p in range(count):
+        if p % 2 == 0:
+            lines.append('PROCEDURE proc%d(a : integer; VAR b : integer; r : real);' % p)
+        else:
+            lines.append('FUNCTION func%d(a, b : integer; r : real) : real;' % p)
+        lines.append('    VAR')
+        lines.append('        t, u : integer;')
+        lines.append('        s : real;')
+        lines.append('    BEGIN')
+        lines.append('        t := a * 2 + b;')
+        lines.append('        u := t - a;')
+        lines.append('        s := r * 1.5 + t;')
+        if p % 2 == 0:
+            lines.append('        b := t + u')
+        else:
+            lines.append('        func%d := s + u' % p)
+        lines.append('    END;')
+        lines.append('')
+    lines.append('BEGIN')
+    for p in range(count):
+        if p % 2 == 0:
+            lines.append('    proc%d(i, j, x);' % p)
+        else:
+            lines.append('    x := func%d(i, j, x);' % p)
+    lines.append('    i := 0')
+    lines.append('END.')
+    return '\n'.join(lines) + '\n'
+
+
+GENERATORS = {
+    'declarations': declarations,
+    'nesting': nesting,
+    'expressions': expressions,
+    'case': case,
+    'procedures': procedures,
+}
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+PascalScannerとPascalRegexScannerの速度比較。
+
+    python -m benchmark.scanner_bench [MB]
+
+pascal_src のプログラムを繋げて指定サイズ(デフォルト 4MB)の入力を作り、
+両方のScannerで全Tokenを読み出す時間を計る。
+"""
+import io
+import sys
+import time
+
+from limbus_core.frontend.source import BufferedSource
+from limbus_core.frontend.token import TokenType
+from pascal.pascal import PascalScanner, PascalRegexScanner
+
+SAMPLE_FILES = ['pascal_src/routines.pas', 'pascal_src/block.pas', 'pascal_src/wolfisland.pas',
+                'pascal_src/hilbert.pas', 'pascal_src/NEWTON.PAS']
+
+
+def make_input(size):
+    unit = ''.join(open(f).read() for f in SAMPLE_FILES)
+    return unit * (size // len(unit) + 1)
+
+
+def scan(scanner_class, text):
+    scanner = scanner_class(BufferedSource(io.StringIO(text)))
+    count = 0
+    start = time.perf_counter()
+    while scanner.next_token().type != TokenType.EOF:
+        count += 1
+    return count, time.perf_counter() - start
+
+
+def main():
+    mb = float(sys.argv[1]) if len(sys.argv) > 1 else 4.0
+    text = make_input(int(mb * 1024 * 1024))
+    print("input: %d bytes, %d lines" % (len(text), text.count('\n')))
+
+    base = None
+    for scanner_class in [PascalScanner, PascalRegexScanner]:
+        count, elapsed = scan(scanner_class, text)
+        if base == None:
+            base = elapsed
+        print("%-20s %8d tokens %8.3f sec %10.0f tokens/sec  x%.1f" %
+              (scanner_class.__name__, count, elapsed, count / elapsed, base / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+構文解析の結果を、構文解析し直す代わりにバイナリ(iCode_serializer)から読み込んだ時の時間と大きさ。
+
+    python -m benchmark.serializer_bench [-n 行数] [-r 繰り返し回数] [kind ...]
+
+program_generatorの各種類のプログラムについて、次を計る。時間はGCを止めて計ったr回のうち最短のもの。
+  parse  PascalParserTD.parse
+  tree   ParseTreePrinterでtree.xmlの文字列を作る
+  dump   iCode_serializer.dumps
+  load   iCode_serializer.loads
+大きさは、バイナリと、同じ記号表のstackのpickleとtree.xml。
+読み込んだ記号表のstackのtree.xmlが、元のものと同じことも確かめる。
+"""
+import argparse
+import contextlib
+import gc
+import io
+import os
+import pickle
+import re
+import sys
+import time
+
+from benchmark.program_generator import KINDS, make_program
+from limbus_core.context import CompilationContext
+from limbus_core.frontend.source import BufferedSource
+from limbus_core.intermidiate import iCode_serializer
+from limbus_core.intermidiate.parse_tree_printer import ParseTreePrinter
+from pascal.pascal import PascalScanner
+from pascal.pascal_parser import PascalParserTD
+
+# 名前の無い型は、tree.xmlにオブジェクトのidを使った名前で出る
+ANONYMOUS_TYPE_RE = re.compile(r'\$anon_\d+')
+
+
+def best(function, repeat):
+    result = None
+    seconds = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        if seconds == None or elapsed < seconds:
+            seconds = elapsed
+    return seconds, result
+
+
+def parse(text):
+    parser = PascalParserTD(PascalScanner(BufferedSource(io.StringIO(text))), CompilationContext())
+    parser.parse()
+    return parser.get_symTab()
+
+
+def tree(symtab_stack):
+    fp = io.StringIO()
+    ParseTreePrinter(fp).print(symtab_stack)
+    return fp.getvalue()
+
+
+def run(kind, n, repeat):
+    text = make_program(kind, n)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        parse_time, symtab_stack = best(lambda: parse(text), repeat)
+        tree_time, xml = best(lambda: tree(symtab_stack), repeat)
+        dump_time, data = best(lambda: iCode_serializer.dumps(symtab_stack), repeat)
+        load_time, loaded = best(lambda: iCode_serializer.loads(data), repeat)
+        assert ANONYMOUS_TYPE_RE.sub('', tree(loaded)) == ANONYMOUS_TYPE_RE.sub('', xml)
+    pickle_size = len(pickle.dumps(symtab_stack, pickle.HIGHEST_PROTOCOL))
+    return parse_time, tree_time, dump_time, load_time, len(data), pickle_size, len(xml.encode('utf-8'))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='iCode serializer benchmark')
+    arg_parser.add_argument('-n', '--lines', type=int, default=5000, help='lines of each generated program')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3, help='timing runs')
+    arg_parser.add_argument('kinds', nargs='*', default=KINDS, help='program kinds')
+    args = arg_parser.parse_args()
+    # pickleは深いiCodeの木で再帰が深くなる
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+
+    print('%-13s %9s %9s %9s %9s %7s %9s %9s %9s' %
+          ('kind', 'parse ms', 'tree ms', 'dump ms', 'load ms', 'speedup', 'binary', 'pickle', 'xml'))
+    for kind in args.kinds:
+        parse_time, tree_time, dump_time, load_time, size, pickle_size, xml_size = run(kind, args.lines, args.repeat)
+        print('%-13s %9.1f %9.1f %9.1f %9.1f %6.1fx %8dK %8dK %8dK' %
+              (kind, parse_time * 1000, tree_time * 1000, dump_time * 1000, load_time * 1000,
+               parse_time / load_time, size // 1024, pickle_size // 1024, xml_size // 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+代入のトレース(ASSIGNメッセージ)の出力にかかる時間の比較。
+
+    python -m benchmark.trace_bench [繰り返し回数]
+
+WHILEループで代入を繰り返すプログラムを実行し、BackendMessageListenerで1件ずつprintする場合と
+BufferedMessageListenerでまとめて書き出す場合の実行時間を比べる。
+端末で実行した時は端末に、そうでない時は/dev/nullに出力する。
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+from limbus_core.frontend.source import BufferedSource
+from limbus_core.backend.executer import Executer
+from limbus_core.message import BufferedMessageListener
+from pascal.pascal import PascalScanner, BackendMessageListener
+from pascal.pascal_parser import PascalParserTD
+
+PROGRAM = """PROGRAM trace;
+VAR
+    i, j, k : integer;
+BEGIN
+    i := 0;
+    j := 0;
+    WHILE i < %d DO BEGIN
+        i := i + 1;
+        j := j + i;
+        k := j - i
+    END
+END.
+"""
+
+
+class NoTrace(BackendMessageListener):
+    message_types = frozenset()
+
+    def message_received(self, msg):
+        pass
+
+
+def parse(n):
+    parser = PascalParserTD(PascalScanner(BufferedSource(io.StringIO(PROGRAM % n))))
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser.parse()
+    symtab_stack = parser.get_symTab()
+    return symtab_stack.get_program_id().get_attribute('ROUTINE_ICODE'), symtab_stack
+
+
+def run(listener, icode, symtab_stack, out):
+    backend = Executer(None)
+    backend.add_message_listener(listener)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(out):
+        backend.process(icode, symtab_stack)
+        if isinstance(listener, BufferedMessageListener):
+            listener.close()
+    return time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    out = sys.stdout if sys.stdout.isatty() else open(os.devnull, 'w')
+
+    icode, symtab_stack = parse(n)
+    untraced = run(NoTrace(), icode, symtab_stack, out)
+    base = run(BackendMessageListener(), icode, symtab_stack, out)
+    buffered = run(BufferedMessageListener(BackendMessageListener(), out=out), icode, symtab_stack, out)
+    threaded = run(BufferedMessageListener(BackendMessageListener(), out=out, threaded=True), icode, symtab_stack, out)
+
+    print("%d assignments" % (3 * n + 2), file=sys.stderr)
+    print("no trace              %7.3f sec" % untraced, file=sys.stderr)
+    print("print per message     %7.3f sec" % base, file=sys.stderr)
+    print("buffered              %7.3f sec  x%.1f" % (buffered, base / buffered), file=sys.stderr)
+    print("buffered (thread)     %7.3f sec  x%.1f" % (threaded, base / threaded), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
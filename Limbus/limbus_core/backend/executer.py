@@ -1,47 +1,90 @@
 # -*- coding: utf-8 -*-
+import sys
+
 from . backend import Backend
 from .. message import Message, MessageType
+from .. context import ExecutionContext, Diagnostic, ProcessingAborted
+from .. intermidiate.iCode_if import iCodeNodeType
+
+# ノードの種類。実行のたびにiCodeNodeTypeの属性を引かないように、モジュールの名前にしておく。
+COMPOUND = iCodeNodeType.COMPOUND
+ASSIGN = iCodeNodeType.ASSIGN
+LOOP = iCodeNodeType.LOOP
+TEST = iCodeNodeType.TEST
+IF = iCodeNodeType.IF
+SELECT = iCodeNodeType.SELECT
+NO_OP = iCodeNodeType.NO_OP
+VARIABLE = iCodeNodeType.VARIABLE
+INTEGER_CONSTANT = iCodeNodeType.INTEGER_CONSTANT
+REAL_CONSTANT = iCodeNodeType.REAL_CONSTANT
+STRING_CONSTANT = iCodeNodeType.STRING_CONSTANT
+BOOLEAN_CONSTANT = iCodeNodeType.BOOLEAN_CONSTANT
+NEGATE = iCodeNodeType.NEGATE
+NOT = iCodeNodeType.NOT
+ADD = iCodeNodeType.ADD
+SUBTRACT = iCodeNodeType.SUBTRACT
+MULTIPLY = iCodeNodeType.MULTIPLY
+FLOAT_DIVIDE = iCodeNodeType.FLOAT_DIVIDE
+INTEGER_DIVIDE = iCodeNodeType.INTEGER_DIVIDE
+MOD = iCodeNodeType.MOD
+AND = iCodeNodeType.AND
+OR = iCodeNodeType.OR
+EQ = iCodeNodeType.EQ
+NE = iCodeNodeType.NE
+LT = iCodeNodeType.LT
+LE = iCodeNodeType.LE
+GT = iCodeNodeType.GT
+GE = iCodeNodeType.GE
 
 
 class RunTimeErrorHandler:
-    def __init__(self):
-        self.MAX_ERRORS = 5
-        self.error_count = 0
-
-    def get_error_count(self):
-        return self.error_count
-
+    """
+    実行時エラーのMessageを送り、backendのExecutionContextで数える。状態を持たないので、すべてのExecuterで共有する。
+    """
     def flag(self, node, error_code, backend):
         # line_number = ""
-        while node and node.get_attribute("LINE"):
+        while node and node.line:
             node = node.get_parent()
 
         if node != None:
-            msg = Message('RUNTIME_ERROR', (error_code, node.get_attribute('LINE')))
+            line_number = node.line
         else:
-            msg = Message('RUNTIME_ERROR', (error_code, None))
+            line_number = None
+        msg = Message(MessageType.RUNTIME_ERROR, (error_code, line_number))
 
         backend.send_message(msg)
 
-        Executer.runtime_error += 1
-        if Executer.runtime_error > self.MAX_ERRORS:
+        # 実行時エラーは実行のContextに集める
+        context = backend.context
+        context.diagnostics.append(Diagnostic(error_code, line_number))
+        context.runtime_error += 1
+        if context.runtime_error > context.max_errors:
+            context.aborted = 'TOO_MANY_ERRORS'
+            if context.collect_errors:
+                raise ProcessingAborted(context.aborted)
             print("*** ABORTED AFTER TOO MANY RUNTIME ERRORS.")
             sys.exit(1)
 
 
 class Executer(Backend):
     error_handler = RunTimeErrorHandler()
-    execution_count = 0
-    runtime_error = 0
 
-    def __init__(self, parent):
+    def __init__(self, parent, context=None):
         super().__init__()
+        if parent != None:
+            # ノードごとに作るExecutorは、親と同じlistenerにMessageを送り、親と同じContextで数える
+            self.message_handler = parent.message_handler
+            self.context = parent.context
+        elif context != None:
+            self.context = context
+        else:
+            self.context = ExecutionContext()
 
     def get_error_handler(self):
         return Executer.error_handler
 
     def increment_exec_count(self):
-        Executer.execution_count += 1
+        self.context.execution_count += 1
 
     def process(self, icode, symtab):
         self.iCode = icode
@@ -49,10 +92,14 @@ class Executer(Backend):
 
         root_node = self.iCode.get_root()
         statement_exec = StatementExecutor(self)
-        statement_exec.execute(root_node)
-
-        ec = Executer.execution_count
-        re = Executer.runtime_error
+        try:
+            statement_exec.execute(root_node)
+        except ProcessingAborted:
+            # エラーを集めるモードで打ち切った時は、ここまでのまとめを送って戻る
+            pass
+
+        ec = self.context.execution_count
+        re = self.context.runtime_error
         msg = Message(MessageType.INTERPRETER_SUMMARY, (ec, re))
         self.send_message(msg)
 
@@ -65,22 +112,22 @@ class StatementExecutor(Executer):
         node_type = node.type
         self.send_sourceline_message(node)
 
-        if node_type == 'COMPOUND':
+        if node_type == COMPOUND:
             coupound_exec = CompoundExecutor(self)
             return coupound_exec.execute(node)
-        elif node_type == 'ASSIGN':
+        elif node_type == ASSIGN:
             assignment_exec = AssignmentExecutor(self)
             return assignment_exec.execute(node)
-        elif node_type == 'LOOP':
+        elif node_type == LOOP:
             loop_exec = LoopExecutor(self)
             return loop_exec.execute(node)
-        elif node_type == 'IF':
+        elif node_type == IF:
             if_exec = IfExecutor(self)
             return if_exec.execute(node)
-        elif node_type == 'SELECT':
+        elif node_type == SELECT:
             select_exec = SelectExecutor(self)
             return select_exec.execute(node)
-        elif node_type == 'NO_OP':
+        elif node_type == NO_OP:
             return None
 
         else:
@@ -88,7 +135,10 @@ class StatementExecutor(Executer):
             return None
 
     def send_sourceline_message(self, node):
-        line_number = node.get_attribute('LINE')
+        if not self.message_handler.has_listener(MessageType.SOURCE_LINE):
+            return
+
+        line_number = node.line
         if line_number:
             msg =  Message(MessageType.SOURCE_LINE, line_number)
             self.message_handler.send_message(msg)
@@ -118,7 +168,7 @@ class AssignmentExecutor(StatementExecutor):
         expression_exec = ExpressionExecutor(self)
         value = expression_exec.execute(expression_node)
 
-        variable_id = variable_node.get_attribute('ID')
+        variable_id = variable_node.id
         variable_id.set_attribute('DATA_VALUE', value)
 
         #print("ASSIGN ", variable_id.name, " ", value, " ", variable_id)
@@ -130,41 +180,45 @@ class AssignmentExecutor(StatementExecutor):
         return None
 
     def _send_message(self, node, name, value):
-        line_number = node.get_attribute('LINE')
+        line_number = node.line
         if line_number:
-            msg = Message('ASSIGN', (line_number, name, value))
+            msg = Message(MessageType.ASSIGN, (line_number, name, value))
             self.send_message(msg)
 
 
 class ExpressionExecutor(StatementExecutor):
 
+    ARITH_OPS = frozenset([ADD, SUBTRACT, MULTIPLY, FLOAT_DIVIDE, INTEGER_DIVIDE, MOD])
+
     def __init__(self, parent):
-        self.ARITH_OPS = ['ADD', 'SUBTRACT', 'MULTIPLY', 'FLOAT_DIVIDE', 'INTEGER_DIVIDE', 'MOD']
         super().__init__(parent)
 
     def execute(self, node):
         node_type = node.type
 
-        if node_type == 'VARIABLE':
-            entry = node.get_attribute('ID')
+        if node_type == VARIABLE:
+            entry = node.id
             #print("Exe:entry:", entry.name, " ", entry.attribute, " ", entry)
             val = entry.get_attribute('DATA_VALUE')
             return val
-        elif node_type == 'INTEGER_CONSTANT':
-            val = int(node.get_attribute('VALUE'))
+        elif node_type == INTEGER_CONSTANT:
+            val = int(node.value)
             return val
-        elif node_type == 'REAL_CONSTANT':
-            val = float(node.get_attribute('VALUE'))
+        elif node_type == REAL_CONSTANT:
+            val = float(node.value)
             return val
-        elif node_type == 'STRING_CONSTANT':
-            val = str(node.get_attribute('VALUE'))
+        elif node_type == STRING_CONSTANT:
+            val = str(node.value)
             return val
-        elif node_type == 'NEGATE':
+        elif node_type == BOOLEAN_CONSTANT:
+            # 比較などを畳み込んだ定数(ConstantFolder)。値はbool。
+            return node.value
+        elif node_type == NEGATE:
             children = node.get_children()
             expression_node = children[0]
             value = self.execute(expression_node)
             return - value
-        elif node_type == 'NOT':
+        elif node_type == NOT:
             children = node.get_children()
             expression_node = children[0]
             value = self.execute(expression_node)
@@ -187,25 +241,25 @@ class ExpressionExecutor(StatementExecutor):
             if intmode:
                 value1 = int(oprand1)
                 value2 = int(oprand2)
-                if node_type == 'ADD':
+                if node_type == ADD:
                     return value1 + value2
-                elif node_type == 'SUBTRACT':
+                elif node_type == SUBTRACT:
                     return  value1 - value2
-                elif node_type == 'MULTIPLY':
+                elif node_type == MULTIPLY:
                     return value1 * value2
-                elif node_type == 'FLOAT_DIVIDE':
+                elif node_type == FLOAT_DIVIDE:
                     if value2 != 0:
                         return float(value1) / float(value2)
                     else:
                         self.error_handler.flag(node, 'DIVISION_BY_ZERO', self)
                         return 0
-                elif node_type == 'INTEGER_DIVIDE':
+                elif node_type == INTEGER_DIVIDE:
                     if value2 != 0:
                         return int(value1/value2)
                     else:
                         self.error_handler.flag(node, 'DIVISION_BY_ZERO', self)
                         return 0
-                elif node_type == 'MOD':
+                elif node_type == MOD:
                     if value2 != 0:
                         return  value1 % value2
                     else:
@@ -215,50 +269,49 @@ class ExpressionExecutor(StatementExecutor):
                 # float mode
                 value1 = float(oprand1)
                 value2 = float(oprand2)
-                if node_type == 'ADD':
+                if node_type == ADD:
                     return value1 + value2
-                elif node_type == 'SUBTRACT':
+                elif node_type == SUBTRACT:
                     return  value1 - value2
-                elif node_type == 'MULTIPLY':
+                elif node_type == MULTIPLY:
                     return value1 * value2
-                elif node_type == 'FLOAT_DIVIDE':
+                elif node_type == FLOAT_DIVIDE:
                     if value2 != 0:
                         return value1 / value2
                     else:
                         self.error_handler.flag(node, 'DIVISION_BY_ZERO', self)
                         return 0
-        elif node_type == 'AND':
+        elif node_type == AND:
             return oprand1 and oprand2
-        elif node_type == 'OR':
+        elif node_type == OR:
             return oprand1 or oprand2
-        if node_type == 'EQ':
+        if node_type == EQ:
             return oprand1 == oprand2
-        elif node_type == 'NE':
+        elif node_type == NE:
             return oprand1 != oprand2
-        elif node_type == 'LT':
+        elif node_type == LT:
             return oprand1 <  oprand2
-        elif node_type == 'LE':
+        elif node_type == LE:
             return oprand1 <= oprand2
-        elif node_type == 'GT':
+        elif node_type == GT:
             return oprand1 > oprand2
-        elif node_type == 'GE':
+        elif node_type == GE:
             return oprand1 >= oprand2
 
         return 0
 
 
 class SelectExecutor(StatementExecutor):
-    jump_cache = {}
-
     def __init__(self, parent):
         super().__init__(parent)
 
     def execute(self, node):
-        if node in SelectExecutor.jump_cache:
-            jump_table = SelectExecutor.jump_cache[node]
+        jump_cache = self.context.jump_cache
+        if node in jump_cache:
+            jump_table = jump_cache[node]
         else:
             jump_table = self.create_jumptable(node)
-            SelectExecutor.jump_cache[node] = jump_table
+            jump_cache[node] = jump_table
 
         select_children = node.get_children()
         expr_node = select_children[0]
@@ -285,7 +338,7 @@ class SelectExecutor(StatementExecutor):
 
             constants_list = constants_node.get_children()
             for cn in constants_list:
-                value = cn.get_attribute('VALUE')
+                value = cn.value
                 jump_table[value] = statement_node
 
         return jump_table
@@ -307,7 +360,7 @@ class LoopExecutor(StatementExecutor):
             self.increment_exec_count()
             for child in loop_children:
                 child_type = child.get_type()
-                if child_type == 'TEST':
+                if child_type == TEST:
                     if expr_node == None:
                         expr_node = child.get_children()[0]
                     exit_loop = expression_exec.execute(expr_node)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+コンパイルと実行の状態。
+1つのプロセスで複数のプログラムを続けて、あるいは別々のthreadで同時にコンパイルして実行できるように、
+これまでクラス変数に持っていた状態をプログラムごとのContextに持たせる。
+"""
+from limbus_core.intermidiate.symtabstack_impl import SymTabStack
+from limbus_core.intermidiate.iCode_factory import iCodeFactory
+from limbus_core.intermidiate.type_impl import Predefined
+
+
+class ProcessingAborted(Exception):
+    """
+    エラーを集めるモード(collect_errors)で、エラーが多すぎてコンパイルか実行を打ち切る時に投げる。
+    コンパイルはPascalParserTD.parse、実行はExecuter.processで受け止めて、呼び出し元に戻る。
+    """
+    def __init__(self, error_code):
+        super().__init__(error_code)
+        self.error_code = error_code
+
+
+class Diagnostic:
+    """
+    コンパイルか実行の時の1つのエラー。
+    """
+    def __init__(self, error_code, line_number, position=None, text=None):
+        self.error_code = error_code
+        self.line_number = line_number
+        self.position = position
+        self.text = text
+
+    def to_dict(self):
+        return {'error': str(self.error_code), 'line': self.line_number, 'pos': self.position, 'text': self.text}
+
+
+class CompilationContext:
+    """
+    1つのプログラムのコンパイルの状態。
+    Parserは親から子へ同じContextを渡し、記号表のstack、iCode、エラー、定義済みの識別子を共有する。
+
+    エラーはdiagnosticsに集める。エラーがmax_errors個を超えるか、エラーの後に読み飛ばしたTokenが
+    max_skipped_tokens個を超えるとコンパイルを打ち切る。打ち切る時は、collect_errorsがFalseならsys.exitし、
+    Trueならabortedにエラーコードを入れて呼び出し元に戻る。
+    """
+    def __init__(self, collect_errors=False, max_errors=5, max_skipped_tokens=None):
+        self.symtab_stack = SymTabStack()
+        self.iCode = iCodeFactory().create()
+        self.predefined = Predefined()
+
+        self.collect_errors = collect_errors
+        self.max_errors = max_errors
+        self.max_skipped_tokens = max_skipped_tokens
+        self.error_count = 0
+        self.skipped_tokens = 0
+        self.diagnostics = []
+        self.aborted = None
+
+        # 2段階の構文解析(ParallelPascalParser)の1段階目では、プログラム直下の手続きと関数のブロックを読み飛ばす
+        self.skip_routine_blocks = False
+
+
+class ExecutionContext:
+    """
+    1つのプログラムの実行の状態。
+    Executerは親から子へ同じContextを渡し、実行した文の数、実行時エラー、CASE文の飛び先の表を共有する。
+
+    実行時エラーはdiagnosticsに集め、max_errors個を超えると実行を打ち切る。
+    打ち切る時は、collect_errorsがFalseならsys.exitし、Trueならabortedにエラーコードを入れて呼び出し元に戻る。
+    """
+    def __init__(self, collect_errors=False, max_errors=5):
+        self.execution_count = 0
+        self.runtime_error = 0
+        # SELECTのノードから、定数と実行する文の対応表を引く
+        self.jump_cache = {}
+
+        self.collect_errors = collect_errors
+        self.max_errors = max_errors
+        self.diagnostics = []
+        self.aborted = None
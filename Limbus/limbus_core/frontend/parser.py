@@ -1,18 +1,19 @@
 # -*- coding: utf-8 -*-
 from abc import ABCMeta, abstractmethod
 from .. message import MessageProducer, MessageHandler
-from .. intermidiate.symtabstack_impl import SymTabStack
-from limbus_core.intermidiate.iCode_factory import iCodeFactory
+from .. context import CompilationContext
 
 class Parser(MessageProducer, metaclass=ABCMeta):
-    symtab_stack = SymTabStack()
-    iCode = iCodeFactory().create()
-
-
-    def __init__(self, scanner):
+    def __init__(self, scanner, context=None):
         self.symTab = None
         self.scanner = scanner
         self.message_handler = MessageHandler()
+        # コンパイルの状態。渡されなければ新しいContextでコンパイルする。
+        if context == None:
+            context = CompilationContext()
+        self.context = context
+        self.symtab_stack = context.symtab_stack
+        self.iCode = context.iCode
 
     @abstractmethod
     def parse(self):
@@ -1,22 +1,66 @@
 # -*- coding: utf-8 -*-
-
+import collections
 from abc import ABCMeta, abstractmethod
 
+from .token import TokenType
+
 
 class Scanner(metaclass=ABCMeta):
     EOF = None
+    # peek()で先読みできるTokenの数
+    MAX_LOOKAHEAD = 4
 
     def __init__(self, source):
         self.source = source
         self.cur_token = None
+        # 先読み済みのToken。next_token()はここから先に取り出す。
+        self.lookahead = collections.deque()
 
     def current_token(self):
         return self.cur_token
 
     def next_token(self):
-        self.cur_token = self.extract_token()
+        if self.lookahead:
+            self.cur_token = self.lookahead.popleft()
+        else:
+            self.cur_token = self.extract_token()
         return self.cur_token
 
+    def peek(self, n=1):
+        """
+        current_token()のn個先のTokenを、読み進めずに返す。EOFより先はEOFのTokenを返す。
+        """
+        if n < 1 or n > self.MAX_LOOKAHEAD:
+            raise ValueError("lookahead must be 1..%d: %d" % (self.MAX_LOOKAHEAD, n))
+
+        lookahead = self.lookahead
+        while len(lookahead) < n:
+            last = lookahead[-1] if lookahead else self.cur_token
+            if last != None and last.type == TokenType.EOF:
+                return last
+            lookahead.append(self.extract_token())
+        return lookahead[n - 1]
+
+    def seek(self, offset):
+        """
+        ソースのoffsetの位置から字句解析を続ける。先読みしたTokenは捨てる。ソースはBufferedSourceに限る。
+        """
+        self.lookahead.clear()
+        self.source.seek(offset)
+
+    def tokens(self):
+        """
+        EOFまでのTokenを順に返すジェネレータ。最後にEOFのTokenを返して終わる。
+        """
+        while True:
+            token = self.next_token()
+            yield token
+            if token.type == TokenType.EOF:
+                return
+
+    def __iter__(self):
+        return self.tokens()
+
     @abstractmethod
     def extract_token(self):
         raise NotImplementedError()
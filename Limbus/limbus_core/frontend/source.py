@@ -1,4 +1,8 @@
 # -*- coding: utf-8 -*-
+import bisect
+import re
+import sys
+
 from .. message import MessageProducer, MessageHandler, Message, MessageType
 
 
@@ -43,10 +47,11 @@ class Source(MessageProducer):
 
         self.current_pos = -1
         self.line_num = self.line_num + 1
-        ln = self.line_num
-        line = self.line
-        msg = Message(MessageType.SOURCE_LINE, (ln, line))
-        self.send_message(msg)
+        if self.message_handler.has_listener(MessageType.SOURCE_LINE):
+            ln = self.line_num
+            line = self.line
+            msg = Message(MessageType.SOURCE_LINE, (ln, line))
+            self.send_message(msg)
 
     def next_char(self):
         self.current_pos = self.current_pos + 1
@@ -81,3 +86,100 @@ class Source(MessageProducer):
 
     def send_message(self, message):
         self.message_handler.send_message(message)
+
+
+class BufferedSource(Source):
+    """
+    ファイル全体を一つのバッファに読み込むSource。
+    行の開始位置を事前に計算しておき、行番号と行内の位置はそこから求める。
+    """
+    def __init__(self, reader):
+        self.line_num = 0
+        self.reader = reader
+        self.message_handler = MessageHandler()
+
+        text = reader.read()
+        if text and not text.endswith('\n'):
+            text = text + '\n'
+        self.buffer = text
+
+        # line_starts[i] は i+1 行目の先頭位置。最後の要素はバッファの長さ(番兵)
+        self.line_starts = [0] + [m.end() for m in re.finditer('\n', text)]
+
+        self.offset = 0
+        self.line_start = 0
+        self.line_end = -1  # 現在の行の改行の位置
+
+    def current_char(self):
+        if self.offset > self.line_end:
+            self.read_line()
+        try:
+            return self.buffer[self.offset]
+        except IndexError:
+            return self.EOF
+
+    def read_line(self):
+        if self.line_num + 1 >= len(self.line_starts):
+            # EOF, Sourceと同じく位置を一つ進め、以降は行の切り替えを行わない
+            self.offset = self.offset + 1
+            self.line_end = sys.maxsize
+            return self.EOF
+
+        self.line_num = self.line_num + 1
+        self.line_start = self.line_starts[self.line_num - 1]
+        self.line_end = self.line_starts[self.line_num] - 1
+
+        if self.message_handler.has_listener(MessageType.SOURCE_LINE):
+            ln = self.line_num
+            line = self.buffer[self.line_start:self.line_end]
+            msg = Message(MessageType.SOURCE_LINE, (ln, line))
+            self.send_message(msg)
+
+    def next_char(self):
+        self.offset = self.offset + 1
+        if self.offset > self.line_end:
+            self.read_line()
+        try:
+            return self.buffer[self.offset]
+        except IndexError:
+            return self.EOF
+
+    def peek_char(self):
+        if self.current_char() == self.EOF:
+            return self.EOF
+
+        next_offset = self.offset + 1
+        if next_offset <= self.line_end:
+            return self.buffer[next_offset]
+        else:
+            return self.EOL
+
+    def get_position(self):
+        return self.offset - self.line_start
+
+    def seek(self, offset):
+        """
+        バッファ内の位置へ移動する。SOURCE_LINEを受け取るlistenerがいる時は、前方への移動で通過した行のSOURCE_LINEを送る。
+        """
+        if offset < self.line_start or self.line_end == sys.maxsize or \
+                (offset > self.line_end and not self.message_handler.has_listener(MessageType.SOURCE_LINE)):
+            self.line_num, pos = self.line_of(offset)
+            self.line_start = self.line_starts[self.line_num - 1]
+            self.line_end = self.line_starts[self.line_num] - 1
+
+        self.offset = offset
+        while self.offset > self.line_end:
+            self.read_line()
+
+    def line_of(self, offset):
+        """
+        バッファ内の位置から(行番号, 行内の位置)を求める。
+        """
+        ln = bisect.bisect_right(self.line_starts, offset, 0, len(self.line_starts) - 1)
+        return ln, offset - self.line_starts[ln - 1]
+
+    @property
+    def line(self):
+        if self.offset >= len(self.buffer):
+            return self.EOF
+        return self.buffer[self.line_start:self.line_end]
@@ -9,6 +9,10 @@ class TokenType(Enum):
 
 
 class Token:
+    # sourceは字句を切り出している間だけ保持する。Token自体はSourceを参照しないので、
+    # そのままpickleしてキャッシュしたり、別プロセスに渡したりできる。
+    __slots__ = ('type', 'text', 'value', 'error_code', 'line_num', 'pos', 'source')
+
     def __init__(self, source):
         self.type = TokenType.DUMMY
         self.text = ""
@@ -18,6 +22,7 @@ class Token:
         self.line_num = source.get_line_num()
         self.pos = source.get_position()
         self.extract()
+        del self.source
 
     def extract(self):
         self.text = self.current_char()
@@ -35,6 +40,8 @@ class Token:
 
 
 class ErrorToken(Token):
+    __slots__ = ('err_code',)
+
     def __init__(self, err_code, source):
         super().__init__(source)
         self.type = TokenType.ERROR
@@ -42,6 +49,8 @@ class ErrorToken(Token):
 
 
 class EofToken(Token):
+    __slots__ = ()
+
     def __init__(self, source):
         super().__init__(source)
         self.type = TokenType.EOF
@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 from abc import ABCMeta, abstractmethod
-from enum import Enum,  auto
+from enum import IntEnum, auto
 
 
-class iCodeNodeType(Enum):
+class iCodeNodeType(IntEnum):
+    """
+    iCodeのノードの種類(命令)。小さな整数なので、比べるのも辞書で引くのも速い。
+    """
     PROGRAM = auto() 
     PROCEDURE = auto()
     FUNCTION = auto() 
@@ -41,9 +44,16 @@ class iCodeNodeType(Enum):
     REAL_CONSTANT = auto() 
     STRING_CONSTANT = auto() 
     BOOLEAN_CONSTANT = auto()
+    WRITE_PARM = auto()
 
+    # Enumのhashはメソッドの呼び出しになるので、集合や辞書で速く引けるようにintのhashを使う
+    __hash__ = int.__hash__
 
-class iCodeKey(Enum):
+
+class iCodeKey(IntEnum):
+    """
+    iCodeのノードの属性。iCodeNodeはそれぞれを__slots__の欄(line, id, value)に持つ。
+    """
     LINE = auto()
     ID = auto()
     VALUE = auto()
@@ -60,6 +70,9 @@ class iCodeIF(metaclass=ABCMeta):
 
 
 class iCodeNodeIF(metaclass=ABCMeta):
+    # ノードは__slots__で欄を決めるので、ここでも__dict__を作らない
+    __slots__ = ()
+
     @abstractmethod
     def get_type(self):
         raise NotImplementedError()
@@ -15,12 +15,25 @@ class iCode(iCodeIF):
         return self.root
 
 
+# 属性の名前から、iCodeNodeの欄の名前を引く。iCodeKeyと文字列のどちらでも引ける。
+ATTRIBUTE_SLOTS = {iCodeKey.LINE: 'line', iCodeKey.ID: 'id', iCodeKey.VALUE: 'value',
+                   'LINE': 'line', 'ID': 'id', 'VALUE': 'value'}
+
+
 class iCodeNode(iCodeNodeIF):
+    """
+    iCodeのノード。typeはiCodeNodeType、属性はLINE, ID, VALUEの3つだけで、それぞれline, id, valueの欄に持つ。
+    無い属性の欄はNone。
+    """
+    __slots__ = ('type', 'parent', 'children', 'line', 'id', 'value', 'typespec')
+
     def __init__(self, ntype):
         self.type = ntype
         self.parent = None
         self.children = []
-        self.attribute = {}
+        self.line = None
+        self.id = None
+        self.value = None
         self.typespec = None
 
     def get_type(self):
@@ -38,17 +51,26 @@ class iCodeNode(iCodeNodeIF):
         return self.children
 
     def set_attribute(self, key, value):
-        self.attribute[key] = value
+        setattr(self, ATTRIBUTE_SLOTS[key], value)
 
     def get_attribute(self, key):
-        dic = self.attribute
-        if key in dic:
-            return dic[key]
-        else:
+        slot = ATTRIBUTE_SLOTS.get(key)
+        if slot == None:
             return None
+        return getattr(self, slot)
 
     def get_all_attributes(self):
-        return self.attribute
+        """
+        Noneでない属性のdict。キーは属性の名前の文字列で、ID, VALUE, LINEの順。
+        """
+        attributes = {}
+        if self.id != None:
+            attributes['ID'] = self.id
+        if self.value != None:
+            attributes['VALUE'] = self.value
+        if self.line != None:
+            attributes['LINE'] = self.line
+        return attributes
 
     def set_typespec(self, typespec):
         self.typespec = typespec
@@ -60,5 +82,4 @@ class iCodeNode(iCodeNodeIF):
         return copy.deepcopy(self)
 
     def __str__ (self):
-        return str(self.type)
-
+        return self.type.name
@@ -0,0 +1,464 @@
+# -*- coding: utf-8 -*-
+"""
+構文解析の後、実行の前にiCodeの木を小さくする最適化。
+
+ConstantFolder  定数だけの部分木を計算して定数のノードにし、CONSTの識別子を定数にし、
+                x*1, x+0, not not bのような式を簡単にする。
+DeadCodeEliminator  条件が定数のIF, LOOP, SELECTから実行されない文を取り除き、NO_OPと子が1つのCOMPOUNDを
+                    詰め、どこからも呼ばれないルーチンをROUTINE_ROUTINESから外す。ConstantFolderの後に使う。
+
+値はExecuterが計算するのと同じ規則で計算する。整数どうしの+, -, *, div, modは整数、
+どちらかが実数の時と/は実数。0での割り算のように実行時エラーになる式は、実行時にエラーになるように残す。
+"""
+from .iCode_if import iCodeNodeType
+from .iCode_impl import iCodeNode
+from .iCode_store import iCodeStoreNode
+from .type_impl import Definition, Predefined
+
+INTEGER_CONSTANT = iCodeNodeType.INTEGER_CONSTANT
+REAL_CONSTANT = iCodeNodeType.REAL_CONSTANT
+STRING_CONSTANT = iCodeNodeType.STRING_CONSTANT
+BOOLEAN_CONSTANT = iCodeNodeType.BOOLEAN_CONSTANT
+VARIABLE = iCodeNodeType.VARIABLE
+NEGATE = iCodeNodeType.NEGATE
+NOT = iCodeNodeType.NOT
+ADD = iCodeNodeType.ADD
+SUBTRACT = iCodeNodeType.SUBTRACT
+MULTIPLY = iCodeNodeType.MULTIPLY
+FLOAT_DIVIDE = iCodeNodeType.FLOAT_DIVIDE
+INTEGER_DIVIDE = iCodeNodeType.INTEGER_DIVIDE
+MOD = iCodeNodeType.MOD
+AND = iCodeNodeType.AND
+OR = iCodeNodeType.OR
+EQ = iCodeNodeType.EQ
+NE = iCodeNodeType.NE
+LT = iCodeNodeType.LT
+LE = iCodeNodeType.LE
+GT = iCodeNodeType.GT
+GE = iCodeNodeType.GE
+COMPOUND = iCodeNodeType.COMPOUND
+LOOP = iCodeNodeType.LOOP
+IF = iCodeNodeType.IF
+TEST = iCodeNodeType.TEST
+SELECT = iCodeNodeType.SELECT
+NO_OP = iCodeNodeType.NO_OP
+CALL = iCodeNodeType.CALL
+
+# 定数のノードの種類から、Executerが値を読む時の変換を引く
+CONSTANT_TYPES = {INTEGER_CONSTANT: int, REAL_CONSTANT: float, STRING_CONSTANT: str, BOOLEAN_CONSTANT: bool}
+
+# 値のPythonの型から、定数のノードの種類を引く
+CONSTANT_NODE_TYPES = {bool: BOOLEAN_CONSTANT, int: INTEGER_CONSTANT, float: REAL_CONSTANT, str: STRING_CONSTANT}
+
+ARITH_OPS = frozenset([ADD, SUBTRACT, MULTIPLY, FLOAT_DIVIDE, INTEGER_DIVIDE, MOD])
+COMPARISON_OPS = frozenset([EQ, NE, LT, LE, GT, GE])
+
+# 実行すると必ずboolになるノード
+BOOLEAN_RESULT_TYPES = COMPARISON_OPS | frozenset([NOT, BOOLEAN_CONSTANT])
+
+
+def routine_icodes(routine_id):
+    """
+    routine_idと、その中で宣言されたルーチンの(識別子, iCode)を、外側から順に返す。
+    """
+    pending = [routine_id]
+    while pending:
+        routine_id = pending.pop()
+        icode = routine_id.get_attribute('ROUTINE_ICODE')
+        if icode != None:
+            yield routine_id, icode
+        pending.extend(reversed(routine_id.get_attribute('ROUTINE_ROUTINES') or []))
+
+
+def count_nodes(root):
+    count = 0
+    pending = [root] if root != None else []
+    while pending:
+        node = pending.pop()
+        count += 1
+        pending.extend(node.get_children())
+    return count
+
+
+def tree_root(icode):
+    """
+    iCodeの木の根。iCodeStoreに詰めた木は、書き換えられるようにiCodeNodeの木に戻して入れ替える。
+    """
+    root = icode.get_root()
+    if isinstance(root, iCodeStoreNode):
+        root = icode.set_root(root.store.to_tree(root.index))
+    return root
+
+
+def preorder(root):
+    """
+    (ノード, 親, 親の子の中の番号)を前順に並べたリスト。逆順に辿ると、子を親より先に訪ねる。
+    """
+    order = []
+    pending = [(root, None, 0)]
+    while pending:
+        item = pending.pop()
+        order.append(item)
+        node = item[0]
+        children = node.children
+        for index in range(len(children) - 1, -1, -1):
+            pending.append((children[index], node, index))
+    return order
+
+
+def constant_value(node):
+    """
+    定数のノードを、ExpressionExecutorが計算するのと同じ値にする。
+    """
+    if node.type == BOOLEAN_CONSTANT:
+        return node.value
+    return CONSTANT_TYPES[node.type](node.value)
+
+
+def is_integer(node):
+    typespec = node.get_typespec()
+    return typespec != None and typespec.base_type() == Predefined.integer_type
+
+
+def is_real(node):
+    typespec = node.get_typespec()
+    return typespec != None and typespec.base_type() == Predefined.real_type
+
+
+def is_integer_constant(node, value):
+    return node.type == INTEGER_CONSTANT and int(node.value) == value
+
+
+def evaluate_binary(node_type, value1, value2):
+    """
+    ExecuterのExpressionExecutor.execute_binary_opと同じ規則で二項演算を計算し、(計算できたか, 値)を返す。
+    0での割り算と、Executerが0を返すだけの組み合わせは、実行時のままにするため計算しない。
+    """
+    if node_type in ARITH_OPS:
+        if isinstance(value1, int) and isinstance(value2, int):
+            value1 = int(value1)
+            value2 = int(value2)
+            if node_type == ADD:
+                return True, value1 + value2
+            elif node_type == SUBTRACT:
+                return True, value1 - value2
+            elif node_type == MULTIPLY:
+                return True, value1 * value2
+            elif value2 == 0:
+                return False, None
+            elif node_type == FLOAT_DIVIDE:
+                return True, float(value1) / float(value2)
+            elif node_type == INTEGER_DIVIDE:
+                return True, int(value1 / value2)
+            else:
+                return True, value1 % value2
+        else:
+            value1 = float(value1)
+            value2 = float(value2)
+            if node_type == ADD:
+                return True, value1 + value2
+            elif node_type == SUBTRACT:
+                return True, value1 - value2
+            elif node_type == MULTIPLY:
+                return True, value1 * value2
+            elif node_type == FLOAT_DIVIDE and value2 != 0:
+                return True, value1 / value2
+            return False, None
+    elif node_type == AND:
+        return True, value1 and value2
+    elif node_type == OR:
+        return True, value1 or value2
+    elif node_type == EQ:
+        return True, value1 == value2
+    elif node_type == NE:
+        return True, value1 != value2
+    elif node_type == LT:
+        return True, value1 < value2
+    elif node_type == LE:
+        return True, value1 <= value2
+    elif node_type == GT:
+        return True, value1 > value2
+    elif node_type == GE:
+        return True, value1 >= value2
+    return False, None
+
+
+class ConstantFolder:
+    """
+    定数の畳み込みと式の簡単化。optimizeはプログラムとその中のすべてのルーチンのiCodeを書き換え、
+    減ったノードの数を返す。
+
+      - 子がすべて定数のNEGATE, NOT, 算術演算, 比較, AND, ORを、計算した値の定数のノードにする。
+        定数のノードの型(typespec)は、置き換えた式の型のまま。
+      - CONSTと列挙型の定数を指すVARIABLEのノードを、定数のノードにする。
+      - x+0, 0+x, x-0 (xが整数)と、x*1, 1*x (xが整数か実数)をxにする。
+        実数の0を足すと値が実数になるので、整数の定数の時だけ。
+      - not not bは、bが必ずboolになる式(比較、NOT)か、IFとLOOPの条件(真偽だけを見る)の時にbにする。
+    """
+    def __init__(self):
+        self.removed = 0
+
+    def optimize(self, routine_id):
+        removed = 0
+        for routine_id, icode in routine_icodes(routine_id):
+            root = tree_root(icode)
+            if root == None:
+                continue
+            before = count_nodes(root)
+            root = icode.set_root(self.fold_tree(root))
+            removed += before - count_nodes(root)
+        self.removed += removed
+        return removed
+
+    def fold_tree(self, root):
+        for node, parent, index in reversed(preorder(root)):
+            condition = parent != None and (parent.type == TEST or (parent.type == IF and index == 0))
+            new_node = self.fold_node(node, condition)
+            if new_node is not node:
+                if parent == None:
+                    root = new_node
+                else:
+                    parent.children[index] = new_node
+        return root
+
+    def fold_node(self, node, condition=False):
+        """
+        nodeの子はもう畳んである。nodeを置き換えるノードを返す。置き換えない時はnodeを返す。
+        conditionは、nodeがIFかLOOPの条件で、値の真偽だけが使われること。
+        """
+        node_type = node.type
+        children = node.children
+
+        if node_type == VARIABLE:
+            entry = node.id
+            definition = entry.get_definition() if entry != None else None
+            if not children and (definition == Definition.CONSTANT or
+                                 definition == Definition.ENUMERATION_CONSTANT):
+                value = entry.get_attribute('CONSTANT_VALUE')
+                if type(value) in CONSTANT_NODE_TYPES:
+                    return self.make_constant(node, value)
+            return node
+
+        if node_type == NEGATE or node_type == NOT:
+            if len(children) != 1:
+                return node
+            child = children[0]
+            if child.type in CONSTANT_TYPES:
+                value = CONSTANT_TYPES[child.type](child.value)
+                if node_type == NOT:
+                    return self.make_constant(node, not value)
+                elif isinstance(value, (int, float)):
+                    return self.make_constant(node, -value)
+            elif node_type == NOT and child.type == NOT and len(child.children) == 1:
+                operand = child.children[0]
+                if condition or operand.type in BOOLEAN_RESULT_TYPES:
+                    return operand
+            return node
+
+        if node_type in ARITH_OPS or node_type in COMPARISON_OPS or node_type == AND or node_type == OR:
+            if len(children) != 2:
+                return node
+            left, right = children
+            if left.type in CONSTANT_TYPES and right.type in CONSTANT_TYPES:
+                try:
+                    folded, value = evaluate_binary(node_type, CONSTANT_TYPES[left.type](left.value),
+                                                    CONSTANT_TYPES[right.type](right.value))
+                except (ArithmeticError, TypeError, ValueError):
+                    folded = False
+                if folded and type(value) in CONSTANT_NODE_TYPES:
+                    return self.make_constant(node, value)
+                return node
+            return self.simplify(node, node_type, left, right)
+
+        return node
+
+    def simplify(self, node, node_type, left, right):
+        """
+        片方が定数の二項演算で、値を変えずにもう片方だけにできる時は、それを返す。
+        """
+        if node_type == ADD:
+            if is_integer_constant(right, 0) and is_integer(left):
+                return left
+            if is_integer_constant(left, 0) and is_integer(right):
+                return right
+        elif node_type == SUBTRACT:
+            if is_integer_constant(right, 0) and is_integer(left):
+                return left
+        elif node_type == MULTIPLY:
+            if is_integer_constant(right, 1) and (is_integer(left) or is_real(left)):
+                return left
+            if is_integer_constant(left, 1) and (is_integer(right) or is_real(right)):
+                return right
+        return node
+
+    @staticmethod
+    def make_constant(node, value):
+        constant_node = iCodeNode(CONSTANT_NODE_TYPES[type(value)])
+        constant_node.value = value
+        constant_node.line = node.line
+        constant_node.set_typespec(node.get_typespec())
+        return constant_node
+
+
+class DeadCodeEliminator:
+    """
+    実行されない文と、実行しても何もしないノードの除去。optimizeはプログラムとその中のルーチンのiCodeを書き換え、
+    どこからも呼ばれないルーチンをROUTINE_ROUTINESから外して、減ったノードの数を返す。
+
+      - 条件が定数のIFを、実行される方の文にする。else部が無くて条件が偽の時はNO_OPにする。
+      - 最初のTESTの条件が定数で真のLOOPは、TESTの前の文を1回実行するだけなので、それらのCOMPOUNDにする。
+      - 式が定数のSELECTを、一致する分岐の文にする。一致する分岐が無い時はNO_OPにする。
+        式が定数でなくても、定数がすべて後の分岐と重なっている分岐は選ばれないので取り除き、文がNO_OPの分岐も取り除く。
+      - COMPOUNDとLOOPの中のNO_OPを取り除き、子が1つのCOMPOUNDをその子にし、空のCOMPOUNDをNO_OPにする。
+        ルーチンの根のCOMPOUNDはそのまま残す。
+    IF, LOOP, SELECTは実行のたびに数えられるので、取り除くと実行した文の数は減る。
+    """
+    def __init__(self):
+        self.removed = 0
+        self.removed_routines = 0
+
+    def optimize(self, routine_id):
+        removed = 0
+        for _, icode in routine_icodes(routine_id):
+            root = tree_root(icode)
+            if root == None:
+                continue
+            before = count_nodes(root)
+            root = icode.set_root(self.eliminate_tree(root))
+            removed += before - count_nodes(root)
+        removed += self.remove_unused_routines(routine_id)
+        self.removed += removed
+        return removed
+
+    def eliminate_tree(self, root):
+        for node, parent, index in reversed(preorder(root)):
+            new_node = self.eliminate_node(node, parent == None)
+            if new_node is not node:
+                if parent == None:
+                    root = new_node
+                else:
+                    parent.children[index] = new_node
+        return root
+
+    def eliminate_node(self, node, is_root=False):
+        """
+        nodeの子はもう済んでいる。nodeを置き換えるノードを返す。置き換えない時はnodeを返す。
+        """
+        node_type = node.type
+        children = node.children
+
+        if node_type == IF:
+            if len(children) < 2 or children[0].type not in CONSTANT_TYPES:
+                return node
+            if constant_value(children[0]):
+                return children[1]
+            elif len(children) > 2:
+                return children[2]
+            return self.make_no_op(node)
+
+        if node_type == LOOP:
+            for index, child in enumerate(children):
+                if child.type == TEST:
+                    test = child.children[0] if child.children else None
+                    if test != None and test.type in CONSTANT_TYPES and constant_value(test):
+                        return self.eliminate_node(self.make_compound(node, children[:index]), is_root)
+                    break
+            self.remove_no_op(node)
+            return node
+
+        if node_type == SELECT:
+            return self.eliminate_select(node)
+
+        if node_type == COMPOUND:
+            self.remove_no_op(node)
+            if is_root:
+                return node
+            if not children:
+                return self.make_no_op(node)
+            if len(children) == 1:
+                return children[0]
+            return node
+
+        return node
+
+    def eliminate_select(self, node):
+        """
+        SelectExecutorのジャンプ表と同じく、定数の値から分岐を引く。同じ値の定数は後の分岐が使われる。
+        """
+        children = node.children
+        if not children:
+            return node
+        branches = children[1:]
+        jump_table = {}
+        for branch in branches:
+            for constant in branch.children[0].children:
+                jump_table[constant.value] = branch
+
+        if children[0].type in CONSTANT_TYPES:
+            branch = jump_table.get(constant_value(children[0]))
+            if branch != None:
+                return branch.children[1]
+            return self.make_no_op(node)
+
+        # 残った分岐の定数は他の分岐と重ならないので、文がNO_OPの分岐も取り除ける
+        used = set(id(branch) for branch in jump_table.values() if branch.children[1].type != NO_OP)
+        if len(used) != len(branches):
+            node.children = [children[0]] + [branch for branch in branches if id(branch) in used]
+        return node
+
+    def remove_unused_routines(self, program_id):
+        """
+        プログラムから呼ばれるルーチンを辿り、呼ばれないルーチンをROUTINE_ROUTINESから外す。
+        外したルーチンとその中のルーチンのノードの数を返す。
+        """
+        called = set([id(program_id)])
+        pending = [program_id]
+        while pending:
+            icode = pending.pop().get_attribute('ROUTINE_ICODE')
+            root = icode.get_root() if icode != None else None
+            nodes = [root] if root != None else []
+            while nodes:
+                node = nodes.pop()
+                nodes.extend(node.get_children())
+                if node.type == CALL:
+                    callee = node.id
+                    if callee != None and id(callee) not in called and \
+                            callee.get_attribute('ROUTINE_ICODE') != None:
+                        called.add(id(callee))
+                        pending.append(callee)
+
+        removed = 0
+        pending = [program_id]
+        while pending:
+            routine_id = pending.pop()
+            routines = routine_id.get_attribute('ROUTINE_ROUTINES')
+            if not routines:
+                continue
+            for sub_id in routines:
+                if id(sub_id) not in called:
+                    self.removed_routines += 1
+                    for _, icode in routine_icodes(sub_id):
+                        removed += count_nodes(icode.get_root())
+            routines[:] = [sub_id for sub_id in routines if id(sub_id) in called]
+            pending.extend(routines)
+        return removed
+
+    @staticmethod
+    def remove_no_op(node):
+        children = node.children
+        if any(child.type == NO_OP for child in children):
+            node.children = [child for child in children if child.type != NO_OP]
+
+    @staticmethod
+    def make_no_op(node):
+        no_op_node = iCodeNode(NO_OP)
+        no_op_node.line = node.line
+        return no_op_node
+
+    @staticmethod
+    def make_compound(node, children):
+        compound_node = iCodeNode(COMPOUND)
+        compound_node.line = node.line
+        for child in children:
+            compound_node.add_child(child)
+        return compound_node
@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+"""
+記号表のstackと、そこから辿れる記号表(SymTab)、識別子(SymTabEntry)、型(TypeSpec)、iCodeの木を
+バイナリの形式で保存し、読み込む。
+
+    data = dumps(symtab_stack)          symtab_stack = loads(data)
+    save(symtab_stack, path)            symtab_stack = load(path)
+
+記号表、識別子、型、iCodeは種類ごとの表に1度だけ書き、それを指すところには表の番号を書く。
+型の表の先頭はPredefinedの型で、番号だけを書いて中身は書かない。定義済みの型の識別子は、
+プロセスで最初に構文解析したプログラムの記号表にあるので、中身を書くとそのプログラムまで保存してしまう。
+読み込む時はこのプロセスの型を使う(まだ型を作っていない時は作る)。
+
+形式
+  MAGIC, FORMAT_VERSION(u16), marshalのバージョン(u16)
+  続けて、次の欄のtupleをmarshalにしたもの。表のオブジェクトは欄ごとのlistに並べる(列にする)。
+    記号表        nesting_level, map(名前から識別子の番号)
+    識別子        name, symtab, line_numbers, definition, typespec, attribute
+    型            form, identifier, attributes(定義済みの型は除く)
+    iCode         根のノードの番号
+    定数          ノードのVALUE(型と値の同じものは1つにまとめる。-0.0は0.0と別)
+    ノード        kinds(B), parents, lines, ids, values, typespecs(i)のarrayのバイト列(リトルエンディアン)
+    記号表のstack stack, current_nesting_level, program_id
+ノードはiCodeごとに前順に並べ、親、識別子、定数、型は番号で持つ(無い時は-1)。
+属性の値のうち、None, bool, int, float, strとそのlistとdictはそのまま書き、記号表、識別子、型、iCode、
+Definition、iCodeNodeType、tupleは(タグ, 番号か値)のtupleにして書く。
+"""
+import marshal
+import struct
+import sys
+from array import array
+
+from .iCode_if import iCodeNodeType
+from .iCode_impl import iCode, iCodeNode
+from .symtabstack_impl import SymTabStack, SymTab, SymTabEntry
+from .type_impl import Definition, Predefined, TypeSpec
+
+MAGIC = b'LIMBUSIC'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sHH')
+
+# tupleにして書く値のタグ
+TAG_SYMTAB = 's'
+TAG_ENTRY = 'e'
+TAG_TYPESPEC = 'y'
+TAG_ICODE = 'i'
+TAG_DEFINITION = 'd'
+TAG_NODE_TYPE = 'n'
+TAG_TUPLE = 't'
+
+# そのまま書く値の型
+PLAIN_TYPES = frozenset([type(None), bool, int, float, str])
+
+# ノードの列はarrayのまま書くので、要素の大きさとバイト順を決めておく
+assert array('i').itemsize == 4
+SWAP_BYTES = sys.byteorder != 'little'
+
+NO_INDEX = -1
+
+# ノードの種類を値から引く表
+NODE_TYPES = dict((node_type.value, node_type) for node_type in iCodeNodeType)
+
+
+class SerializeError(Exception):
+    """
+    保存できない値があった時と、読み込むデータが壊れている時に投げる。
+    """
+    pass
+
+
+class iCodeSerializer:
+    """
+    記号表のstackをバイナリにする。
+    """
+    def __init__(self):
+        self.symtabs = []
+        self.entries = []
+        self.typespecs = []
+        self.icodes = []
+        self.constants = []
+        # オブジェクトのidから表の番号を引く。定数は(型, 値)から引く。
+        self.numbers = {}
+        self.constant_numbers = {}
+
+        self.kinds = array('B')
+        self.parents = array('i')
+        self.lines = array('i')
+        self.ids = array('i')
+        self.values = array('i')
+        self.node_typespecs = array('i')
+
+    def dumps(self, symtab_stack):
+        types = Predefined.get_types()
+        if not types:
+            raise SerializeError('定義済みの型がまだ作られていない')
+        for name in Predefined.TYPE_NAMES:
+            self.number(self.typespecs, types[name])
+
+        # 記号表のstackから辿った順に表を埋める
+        stack = ([self.number(self.symtabs, symtab) for symtab in symtab_stack.stack],
+                 symtab_stack.current_nesting_level, self.entry_number(symtab_stack.program_id))
+
+        symtabs = ([], [])
+        entries = ([], [], [], [], [], [])
+        typespecs = ([], [], [])
+        roots = []
+        # 定義済みの型は番号だけなので、その後ろから書く
+        written = [0, 0, len(Predefined.TYPE_NAMES), 0]
+        while True:
+            progress = False
+            while written[0] < len(self.symtabs):
+                self.write_symtab(symtabs, self.symtabs[written[0]])
+                written[0] += 1
+                progress = True
+            while written[1] < len(self.entries):
+                self.write_entry(entries, self.entries[written[1]])
+                written[1] += 1
+                progress = True
+            while written[2] < len(self.typespecs):
+                self.write_typespec(typespecs, self.typespecs[written[2]])
+                written[2] += 1
+                progress = True
+            while written[3] < len(self.icodes):
+                roots.append(self.write_tree(self.icodes[written[3]].get_root()))
+                written[3] += 1
+                progress = True
+            if not progress:
+                break
+
+        constants = [self.encode(constant) for constant in self.constants]
+        columns = []
+        for column in (self.kinds, self.parents, self.lines, self.ids, self.values, self.node_typespecs):
+            if SWAP_BYTES:
+                column = array(column.typecode, column)
+                column.byteswap()
+            columns.append(column.tobytes())
+
+        body = (len(self.typespecs), symtabs, entries, typespecs, roots, constants, tuple(columns), stack)
+        return HEADER.pack(MAGIC, FORMAT_VERSION, marshal.version) + marshal.dumps(body)
+
+    def number(self, table, obj):
+        number = self.numbers.get(id(obj))
+        if number == None:
+            number = len(table)
+            table.append(obj)
+            self.numbers[id(obj)] = number
+        return number
+
+    def entry_number(self, entry):
+        return NO_INDEX if entry == None else self.number(self.entries, entry)
+
+    def typespec_number(self, typespec):
+        return NO_INDEX if typespec == None else self.number(self.typespecs, typespec)
+
+    def constant_number(self, value):
+        # 1と1.0とTrue、0.0と-0.0は等しいが別の定数。floatはreprで区別する
+        key = (type(value), repr(value) if isinstance(value, float) else value)
+        number = self.constant_numbers.get(key)
+        if number == None:
+            number = len(self.constants)
+            self.constants.append(value)
+            self.constant_numbers[key] = number
+        return number
+
+    def write_symtab(self, symtabs, symtab):
+        levels, maps = symtabs
+        levels.append(symtab.nesting_level)
+        maps.append(dict((name, self.entry_number(entry)) for name, entry in symtab.map.items()))
+
+    def write_entry(self, entries, entry):
+        names, symtabs, line_numbers, definitions, typespecs, attributes = entries
+        names.append(entry.name)
+        symtabs.append(NO_INDEX if entry.symtab == None else self.number(self.symtabs, entry.symtab))
+        line_numbers.append(list(entry.line_numbers))
+        definitions.append(NO_INDEX if entry.definition == None else entry.definition.value)
+        typespecs.append(self.typespec_number(entry.typespec))
+        attributes.append(self.encode(entry.attribute))
+
+    def write_typespec(self, typespecs, typespec):
+        forms, identifiers, attributes = typespecs
+        forms.append(self.encode(typespec.form))
+        identifiers.append(self.entry_number(typespec.identifier))
+        attributes.append(self.encode(typespec.attributes))
+
+    def write_tree(self, root):
+        """
+        rootの木のノードを前順に列に足し、根の番号を返す。rootがNoneの時はNO_INDEX。
+        """
+        if root == None:
+            return NO_INDEX
+        start = len(self.kinds)
+        pending = [(root, NO_INDEX)]
+        while pending:
+            node, parent = pending.pop()
+            index = len(self.kinds)
+            self.kinds.append(node.type)
+            self.parents.append(parent)
+            line = node.line
+            self.lines.append(NO_INDEX if line == None else line)
+            node_id = node.id
+            if node_id != None and not isinstance(node_id, SymTabEntry):
+                raise SerializeError('ノードのIDが識別子でない: %r' % (node_id,))
+            self.ids.append(self.entry_number(node_id))
+            value = node.value
+            self.values.append(NO_INDEX if value == None else self.constant_number(value))
+            self.node_typespecs.append(self.typespec_number(node.get_typespec()))
+            for child in reversed(node.get_children()):
+                pending.append((child, index))
+        return start
+
+    def encode(self, value):
+        """
+        属性の値を、marshalで書ける値にする。
+        """
+        value_type = type(value)
+        if value_type in PLAIN_TYPES:
+            return value
+        elif value_type is list:
+            return [self.encode(item) for item in value]
+        elif value_type is dict:
+            return dict((self.encode(key), self.encode(item)) for key, item in value.items())
+        elif value_type is tuple:
+            return (TAG_TUPLE, tuple(self.encode(item) for item in value))
+        elif value_type is SymTab:
+            return (TAG_SYMTAB, self.number(self.symtabs, value))
+        elif value_type is SymTabEntry:
+            return (TAG_ENTRY, self.number(self.entries, value))
+        elif value_type is TypeSpec:
+            return (TAG_TYPESPEC, self.number(self.typespecs, value))
+        elif value_type is iCode:
+            return (TAG_ICODE, self.number(self.icodes, value))
+        elif value_type is Definition:
+            return (TAG_DEFINITION, value.value)
+        elif value_type is iCodeNodeType:
+            return (TAG_NODE_TYPE, int(value))
+        raise SerializeError('保存できない値: %r' % (value,))
+
+
+class iCodeDeserializer:
+    """
+    iCodeSerializerで作ったバイナリから、記号表のstackを作り直す。
+    オブジェクトは__init__を呼ばずに作り、欄を直接埋める。
+    """
+    def __init__(self, data):
+        self.data = data
+        self.symtabs = []
+        self.entries = []
+        self.typespecs = []
+        self.icodes = []
+        self.tag_readers = {
+            TAG_SYMTAB: self.symtabs.__getitem__,
+            TAG_ENTRY: self.entries.__getitem__,
+            TAG_TYPESPEC: self.typespecs.__getitem__,
+            TAG_ICODE: self.icodes.__getitem__,
+            TAG_DEFINITION: Definition,
+            TAG_NODE_TYPE: NODE_TYPES.__getitem__,
+            TAG_TUPLE: lambda items: tuple(self.decode(item) for item in items),
+        }
+
+    def loads(self):
+        if len(self.data) < HEADER.size:
+            raise SerializeError('iCodeのデータではない')
+        magic, version, marshal_version = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise SerializeError('iCodeのデータではない')
+        if version != FORMAT_VERSION or marshal_version != marshal.version:
+            raise SerializeError('形式のバージョンが違う: %d.%d' % (version, marshal_version))
+        typespec_count, symtabs, entries, typespecs, roots, constants, columns, stack = \
+            marshal.loads(memoryview(self.data)[HEADER.size:])
+
+        # 定義済みの型はこのプロセスの型を使う
+        types = Predefined.get_types()
+        if not types:
+            Predefined().initialize(SymTabStack())
+            types = Predefined.get_types()
+        levels, maps = symtabs
+        names, entry_symtabs, line_numbers, definitions, entry_typespecs, attributes = entries
+        forms, identifiers, typespec_attributes = typespecs
+        self.symtabs.extend(SymTab.__new__(SymTab) for _ in levels)
+        self.entries.extend(SymTabEntry.__new__(SymTabEntry) for _ in names)
+        self.typespecs.extend(types[name] for name in Predefined.TYPE_NAMES)
+        self.typespecs.extend(TypeSpec.__new__(TypeSpec) for _ in forms)
+        self.icodes.extend(iCode() for _ in roots)
+        if len(self.typespecs) != typespec_count:
+            raise SerializeError('型の数が合わない')
+
+        # 番号が-1(NO_INDEX)の時に最後のNoneを引けるように、表の最後にNoneを足しておく
+        symtabs = self.symtabs + [None]
+        entries = self.entries + [None]
+        types = self.typespecs + [None]
+        definition_table = dict((definition.value, definition) for definition in Definition)
+        definition_table[NO_INDEX] = None
+
+        decode = self.decode
+        for symtab, level, entry_map in zip(self.symtabs, levels, maps):
+            symtab.nesting_level = level
+            symtab.map = dict((name, entries[number]) for name, number in entry_map.items())
+        for entry, name, symtab, numbers, definition, typespec, attribute in \
+                zip(self.entries, names, entry_symtabs, line_numbers, definitions, entry_typespecs, attributes):
+            entry.name = name
+            entry.symtab = symtabs[symtab]
+            entry.line_numbers = numbers
+            entry.definition = definition_table[definition]
+            entry.typespec = types[typespec]
+            entry.attribute = decode(attribute) if attribute else attribute
+        for typespec, form, identifier, attribute in \
+                zip(self.typespecs[len(Predefined.TYPE_NAMES):], forms, identifiers, typespec_attributes):
+            typespec.form = decode(form)
+            typespec.identifier = entries[identifier]
+            typespec.attributes = decode(attribute) if attribute else attribute
+
+        constants = [decode(constant) for constant in constants]
+        nodes = self.read_nodes(columns, entries, constants + [None], types)
+        for icode, root in zip(self.icodes, roots):
+            icode.root = nodes[root] if root != NO_INDEX else None
+
+        stack_symtabs, level, program_id = stack
+        symtab_stack = SymTabStack.__new__(SymTabStack)
+        symtab_stack.stack = [self.symtabs[number] for number in stack_symtabs]
+        symtab_stack.current_nesting_level = level
+        symtab_stack.program_id = entries[program_id]
+        return symtab_stack
+
+    def read_nodes(self, columns, entries, constants, types):
+        """
+        ノードの列からiCodeNodeを作り、親の子に足す。番号順のノードのリストを返す。
+        entries, constants, typesは、最後にNoneを足した表。
+        """
+        kinds, parents, lines, ids, values, typespecs = [array(typecode) for typecode in 'Biiiii']
+        for column, data in zip((kinds, parents, lines, ids, values, typespecs), columns):
+            column.frombytes(data)
+            if SWAP_BYTES:
+                column.byteswap()
+        count = len(kinds)
+        if any(len(column) != count for column in (parents, lines, ids, values, typespecs)):
+            raise SerializeError('ノードの列の長さが合わない')
+        unknown = set(kinds) - NODE_TYPES.keys()
+        if unknown:
+            raise SerializeError('ノードの種類が無い: %s' % sorted(unknown))
+
+        node_types = NODE_TYPES
+        nodes = []
+        append = nodes.append
+        new = iCodeNode.__new__
+        for kind, parent, line, node_id, value, typespec in zip(kinds, parents, lines, ids, values, typespecs):
+            node = new(iCodeNode)
+            node.type = node_types[kind]
+            node.parent = None
+            node.children = []
+            node.line = line if line != NO_INDEX else None
+            node.id = entries[node_id]
+            node.value = constants[value]
+            node.typespec = types[typespec]
+            if parent != NO_INDEX:
+                nodes[parent].children.append(node)
+            append(node)
+        return nodes
+
+    def decode(self, value):
+        """
+        iCodeSerializer.encodeの逆。
+        """
+        value_type = type(value)
+        if value_type is tuple:
+            tag, payload = value
+            return self.tag_readers[tag](payload)
+        elif value_type is list:
+            decode = self.decode
+            return [item if type(item) in PLAIN_TYPES else decode(item) for item in value]
+        elif value_type is dict:
+            decode = self.decode
+            return {(key if type(key) is str else decode(key)): (item if type(item) in PLAIN_TYPES else decode(item))
+                    for key, item in value.items()}
+        return value
+
+
+def dumps(symtab_stack):
+    """
+    記号表のstackと、そこから辿れるすべてをbytesにする。
+    """
+    return iCodeSerializer().dumps(symtab_stack)
+
+
+def loads(data):
+    """
+    dumpsで作ったbytesから記号表のstackを作り直す。
+    """
+    try:
+        return iCodeDeserializer(data).loads()
+    except (EOFError, IndexError, KeyError, TypeError, ValueError) as e:
+        raise SerializeError('データが壊れている: %s' % e)
+
+
+def save(symtab_stack, path):
+    with open(path, 'wb') as fp:
+        fp.write(dumps(symtab_stack))
+
+
+def load(path):
+    with open(path, 'rb') as fp:
+        return loads(fp.read())
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+iCodeのノードを列(array)に並べて持つ表。
+
+ノードごとのオブジェクト(iCodeNode)は、type、parent、childrenのlist、attributeのdict、typespecを持つので、
+大きなプログラムでは1つのノードに数百バイトかかる。iCodeStoreはノードを番号で表し、次の列に持つ。
+  kinds         ノードの種類(kind_namesの番号)
+  first_child   最初の子、next_sibling 次の兄弟、parent 親(無い時はNO_NODE)
+  lines         LINE(無い時はNO_NODE)
+  typespecs     型(typespec_tableの番号)
+  ids           ID(symbol_tableの番号)、values VALUE(constant_tableの番号)
+それ以外の属性はattributesに、ノードの番号からdictを引いて持つ。
+
+木はadd_treeでiCodeNodeの木から前順に入れるので、部分木は番号の連続した範囲になる。
+iCodeStoreNodeは表と番号だけを持つ、iCodeNodeと同じように使えるノードで、使う時に作る。
+"""
+import copy
+from array import array
+
+from .iCode_if import iCodeNodeIF, iCodeKey
+from .iCode_impl import iCodeNode
+
+# 親、子、兄弟、LINE、型などが無いことを表す番号
+NO_NODE = -1
+
+# 属性の名前。iCodeKeyでも文字列でも、列に持つ属性は文字列の名前にそろえる。
+ATTRIBUTE_NAMES = {iCodeKey.LINE: 'LINE', iCodeKey.ID: 'ID', iCodeKey.VALUE: 'VALUE'}
+
+
+class iCodeStore:
+    def __init__(self):
+        self.kinds = array('B')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.parent = array('i')
+        self.lines = array('i')
+        self.typespecs = array('i')
+        self.ids = array('i')
+        self.values = array('i')
+
+        self.kind_names = []
+        self.kind_numbers = {}
+        self.typespec_table = []
+        self.symbol_table = []
+        self.constant_table = []
+        self.attributes = {}
+        # add_treeで入れた木の根から、その木の次の番号を引く
+        self.tree_ends = {}
+
+        # add_childで後から子を足すと、部分木が連続した範囲でなくなる
+        self.contiguous = True
+        # 型の番号を引く表はオブジェクトのidを使うので、pickleせずに使う時に作り直す
+        self.typespec_numbers = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['typespec_numbers'] = None
+        return state
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def node(self, index):
+        if index == NO_NODE:
+            return None
+        return iCodeStoreNode(self, index)
+
+    def new_node(self, ntype):
+        """
+        親も子も無いノードを表の最後に足し、その番号を返す。
+        """
+        kind = self.kind_numbers.get(ntype)
+        if kind == None:
+            kind = len(self.kind_names)
+            self.kind_names.append(ntype)
+            self.kind_numbers[ntype] = kind
+        self.kinds.append(kind)
+        self.first_child.append(NO_NODE)
+        self.next_sibling.append(NO_NODE)
+        self.parent.append(NO_NODE)
+        self.lines.append(NO_NODE)
+        self.typespecs.append(NO_NODE)
+        self.ids.append(NO_NODE)
+        self.values.append(NO_NODE)
+        return len(self.kinds) - 1
+
+    def add_tree(self, root):
+        """
+        iCodeNodeの木を前順に表に入れ、根のiCodeStoreNodeを返す。
+        """
+        if root == None:
+            return None
+        start = len(self.kinds)
+        last_child = {}
+        pending = [(root, NO_NODE)]
+        while pending:
+            node, parent = pending.pop()
+            index = self.new_node(node.type)
+            if parent != NO_NODE:
+                self.parent[index] = parent
+                if parent in last_child:
+                    self.next_sibling[last_child[parent]] = index
+                else:
+                    self.first_child[parent] = index
+                last_child[parent] = index
+            if node.line != None:
+                self.set_attribute(index, 'LINE', node.line)
+            if node.id != None:
+                self.set_attribute(index, 'ID', node.id)
+            if node.value != None:
+                self.set_attribute(index, 'VALUE', node.value)
+            if node.typespec != None:
+                self.set_typespec(index, node.typespec)
+            for child in reversed(node.children):
+                pending.append((child, index))
+        self.tree_ends[start] = len(self.kinds)
+        return iCodeStoreNode(self, start)
+
+    def to_tree(self, index):
+        """
+        indexの部分木を、iCodeNodeの木にして返す。
+        """
+        root = None
+        pending = [(index, None)]
+        while pending:
+            index, parent = pending.pop()
+            node = iCodeNode(self.kind_names[self.kinds[index]])
+            node.line = self.get_attribute(index, 'LINE')
+            node.id = self.get_attribute(index, 'ID')
+            node.value = self.get_attribute(index, 'VALUE')
+            node.typespec = self.get_typespec(index)
+            if parent == None:
+                root = node
+            else:
+                parent.add_child(node)
+            for child in reversed(self.get_children(index)):
+                pending.append((child, node))
+        return root
+
+    def add_child(self, index, child):
+        self.parent[child] = index
+        last = self.first_child[index]
+        if last == NO_NODE:
+            self.first_child[index] = child
+        else:
+            while self.next_sibling[last] != NO_NODE:
+                last = self.next_sibling[last]
+            self.next_sibling[last] = child
+        self.contiguous = False
+
+    def get_children(self, index):
+        children = []
+        next_sibling = self.next_sibling
+        child = self.first_child[index]
+        while child != NO_NODE:
+            children.append(child)
+            child = next_sibling[child]
+        return children
+
+    def walk(self, index):
+        """
+        indexの部分木のノードの番号を前順に返す。部分木が連続した範囲なら、rangeを返す。
+        """
+        if self.contiguous:
+            return range(index, self.subtree_end(index))
+        indexes = []
+        pending = [index]
+        while pending:
+            index = pending.pop()
+            indexes.append(index)
+            pending.extend(reversed(self.get_children(index)))
+        return indexes
+
+    def subtree_end(self, index):
+        """
+        前順に並んだ表で、indexの部分木の次の番号。
+        """
+        while self.next_sibling[index] == NO_NODE:
+            if self.parent[index] == NO_NODE:
+                return self.tree_ends.get(index, len(self.kinds))
+            index = self.parent[index]
+        return self.next_sibling[index]
+
+    def set_attribute(self, index, key, value):
+        key = ATTRIBUTE_NAMES.get(key, key)
+        if key == 'LINE' and isinstance(value, int) and value >= 0:
+            self.lines[index] = value
+        elif key == 'ID':
+            self.ids[index] = self.append_to(self.ids[index], self.symbol_table, value)
+        elif key == 'VALUE':
+            self.values[index] = self.append_to(self.values[index], self.constant_table, value)
+        else:
+            self.attributes.setdefault(index, {})[key] = value
+
+    @staticmethod
+    def append_to(number, table, value):
+        if number != NO_NODE:
+            table[number] = value
+            return number
+        table.append(value)
+        return len(table) - 1
+
+    def get_attribute(self, index, key):
+        key = ATTRIBUTE_NAMES.get(key, key)
+        if key == 'LINE':
+            line = self.lines[index]
+            if line != NO_NODE:
+                return line
+        elif key == 'ID':
+            number = self.ids[index]
+            return self.symbol_table[number] if number != NO_NODE else None
+        elif key == 'VALUE':
+            number = self.values[index]
+            return self.constant_table[number] if number != NO_NODE else None
+        attributes = self.attributes.get(index)
+        if attributes == None:
+            return None
+        return attributes.get(key)
+
+    def get_all_attributes(self, index):
+        """
+        属性のdict。順は、パーサが属性を入れる順に合わせてID, VALUE, その他, LINE。
+        """
+        attributes = {}
+        if self.ids[index] != NO_NODE:
+            attributes['ID'] = self.symbol_table[self.ids[index]]
+        if self.values[index] != NO_NODE:
+            attributes['VALUE'] = self.constant_table[self.values[index]]
+        if index in self.attributes:
+            attributes.update(self.attributes[index])
+        if self.lines[index] != NO_NODE:
+            attributes['LINE'] = self.lines[index]
+        return attributes
+
+    def set_typespec(self, index, typespec):
+        if typespec == None:
+            self.typespecs[index] = NO_NODE
+            return
+        if self.typespec_numbers == None:
+            self.typespec_numbers = dict((id(ts), number) for number, ts in enumerate(self.typespec_table))
+        number = self.typespec_numbers.get(id(typespec))
+        if number == None:
+            number = len(self.typespec_table)
+            self.typespec_table.append(typespec)
+            self.typespec_numbers[id(typespec)] = number
+        self.typespecs[index] = number
+
+    def get_typespec(self, index):
+        number = self.typespecs[index]
+        if number == NO_NODE:
+            return None
+        return self.typespec_table[number]
+
+
+class iCodeStoreNode(iCodeNodeIF):
+    """
+    iCodeStoreの1つのノード。表と番号だけを持ち、同じ表の同じ番号のノードは等しい。
+    """
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def type(self):
+        store = self.store
+        return store.kind_names[store.kinds[self.index]]
+
+    def get_type(self):
+        return self.type
+
+    # iCodeNodeの欄と同じ名前で、LINE, ID, VALUEを読み書きする
+    @property
+    def line(self):
+        return self.store.get_attribute(self.index, 'LINE')
+
+    @line.setter
+    def line(self, value):
+        self.store.set_attribute(self.index, 'LINE', value)
+
+    @property
+    def id(self):
+        return self.store.get_attribute(self.index, 'ID')
+
+    @id.setter
+    def id(self, value):
+        self.store.set_attribute(self.index, 'ID', value)
+
+    @property
+    def value(self):
+        return self.store.get_attribute(self.index, 'VALUE')
+
+    @value.setter
+    def value(self, value):
+        self.store.set_attribute(self.index, 'VALUE', value)
+
+    def get_parent(self):
+        return self.store.node(self.store.parent[self.index])
+
+    def add_child(self, node):
+        if node:
+            if not (isinstance(node, iCodeStoreNode) and node.store is self.store):
+                node = self.store.add_tree(node)
+            self.store.add_child(self.index, node.index)
+        return node
+
+    def get_children(self):
+        store = self.store
+        return [iCodeStoreNode(store, child) for child in store.get_children(self.index)]
+
+    def set_attribute(self, key, value):
+        self.store.set_attribute(self.index, key, value)
+
+    def get_attribute(self, key):
+        return self.store.get_attribute(self.index, key)
+
+    def get_all_attributes(self):
+        return self.store.get_all_attributes(self.index)
+
+    def set_typespec(self, typespec):
+        self.store.set_typespec(self.index, typespec)
+
+    def get_typespec(self):
+        return self.store.get_typespec(self.index)
+
+    def copy(self):
+        # iCodeNode.copyと同じく、識別子と型も含めて複製する
+        return copy.deepcopy(self.store.to_tree(self.index))
+
+    def __eq__(self, other):
+        if isinstance(other, iCodeStoreNode):
+            return self.store is other.store and self.index == other.index
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((id(self.store), self.index))
+
+    def __str__(self):
+        return self.type.name
+
+
+def compact_routines(routine_id, store=None):
+    """
+    routine_idと、その中で宣言されたルーチンのiCodeの木を、1つのiCodeStoreに入れ替える。
+    """
+    if store == None:
+        store = iCodeStore()
+    pending = [routine_id]
+    while pending:
+        routine_id = pending.pop()
+        icode = routine_id.get_attribute('ROUTINE_ICODE')
+        root = icode.get_root() if icode != None else None
+        if root != None and not isinstance(root, iCodeStoreNode):
+            icode.set_root(store.add_tree(root))
+        pending.extend(reversed(routine_id.get_attribute('ROUTINE_ROUTINES') or []))
+    return store
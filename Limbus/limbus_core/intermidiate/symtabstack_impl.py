@@ -10,6 +10,8 @@ class SymTabKey(Enum):
     ROUTINE_ICODE = auto()
     ROUTINE_PARMS = auto()
     ROUTINE_ROUTINES = auto()
+    ROUTINE_SPAN = auto()
+    ROUTINE_FORWARD = auto()
     DATA_VALUE = auto()
 
 
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import threading
 from enum import Enum,  auto
 from .type_if import TypeFormIF, TypeKeyIF, TypeSpecIF
 from .symtabstack_impl import SymTabEntry, SymTabStack
@@ -49,109 +50,119 @@ class Definition(Enum):
 
 
 class Predefined:
+    """
+    定義済みの型と識別子。
+    型はプロセスで1つだけ作り、すべてのコンパイルで共有する。
+    識別子はコンパイルごとの記号表に入るので、コンパイルごとに作るPredefinedのインスタンスが持つ。
+    """
     integer_type = None
     real_type = None
     boolean_type = None
     char_type = None
     undefined_type = None
-
-    integer_id = None
-    real_id = None
-    boolean_id = None
-    char_id = None
-    false_id = None
-    true_id = None
-    read_id = None
-    readln_id = None
-    write_id = None
-    writeln_id = None
-    abs_id = None
-    arctan_id = None
-    chr_id = None
-    cos_id = None
-    eof_id = None
-    eoln_id = None
-    exp_id = None
-    ln_id = None
-    odd_id = None
-    ord_id = None
-    pred_id = None
-    round_id = None
-    sin_id = None
-    sqr_id = None
-    sqrt_id = None
-    succ_id = None
-    trunc_id = None
+    TYPE_NAMES = ('integer_type', 'real_type', 'boolean_type', 'char_type', 'undefined_type')
+
+    # 型を作るのは最初のコンパイルだけ。同時に始まったコンパイルが別々に作らないようにする。
+    types_lock = threading.Lock()
+
+    def __init__(self):
+        self.integer_id = None
+        self.real_id = None
+        self.boolean_id = None
+        self.char_id = None
+        self.false_id = None
+        self.true_id = None
+        self.read_id = None
+        self.readln_id = None
+        self.write_id = None
+        self.writeln_id = None
+        self.abs_id = None
+        self.arctan_id = None
+        self.chr_id = None
+        self.cos_id = None
+        self.eof_id = None
+        self.eoln_id = None
+        self.exp_id = None
+        self.ln_id = None
+        self.odd_id = None
+        self.ord_id = None
+        self.pred_id = None
+        self.round_id = None
+        self.sin_id = None
+        self.sqr_id = None
+        self.sqrt_id = None
+        self.succ_id = None
+        self.trunc_id = None
 
     def initialize(self, symtab_stack):
-        self.initialize_types(symtab_stack)
-        self.initialize_constants(symtab_stack)
+        with Predefined.types_lock:
+            create_types = Predefined.integer_type == None
+            self.initialize_types(symtab_stack, create_types)
+            self.initialize_constants(symtab_stack, create_types)
         self.initialize_standard_routines(symtab_stack)
 
-    def initialize_types(self, symtab_stack):
-        Predefined.integer_id = symtab_stack.enter_local("integer")
-        Predefined.integer_type = TypeSpec(TypeForm.SCALAR)
-        Predefined.integer_type.set_identifier(Predefined.integer_id)
-        Predefined.integer_id.set_definition(Definition.TYPE)
-        Predefined.integer_id.set_typespec(Predefined.integer_type)
-
-        Predefined.real_id = symtab_stack.enter_local("real")
-        Predefined.real_type = TypeSpec(TypeForm.SCALAR)
-        Predefined.real_type.set_identifier(Predefined.real_id)
-        Predefined.real_id.set_definition(Definition.TYPE)
-        Predefined.real_id.set_typespec(Predefined.real_type)
-
-        Predefined.boolean_id = symtab_stack.enter_local("boolean")
-        Predefined.boolean_type = TypeSpec(TypeForm.ENUMERATION)
-        Predefined.boolean_type.set_identifier(Predefined.boolean_id)
-        Predefined.boolean_id.set_definition(Definition.TYPE)
-        Predefined.boolean_id.set_typespec(Predefined.boolean_type)
-
-        Predefined.char_id = symtab_stack.enter_local("char")
-        Predefined.char_type = TypeSpec(TypeForm.SCALAR)
-        Predefined.char_type.set_identifier(Predefined.char_id)
-        Predefined.char_id.set_definition(Definition.TYPE)
-        Predefined.char_id.set_typespec(Predefined.char_type)
-
-        Predefined.undefined_type = TypeSpec(TypeForm.SCALAR)
-
-    def initialize_constants(self, symtab_stack):
-        Predefined.false_id = symtab_stack.enter_local('false')
-        Predefined.false_id.set_definition(Definition.ENUMERATION_CONSTANT)
-        Predefined.false_id.set_typespec(Predefined.boolean_type)
-        Predefined.false_id.set_attribute('CONSTANT_VALUE', 0)
-
-        Predefined.true_id = symtab_stack.enter_local('true')
-        Predefined.true_id.set_definition(Definition.ENUMERATION_CONSTANT)
-        Predefined.true_id.set_typespec(Predefined.boolean_type)
-        Predefined.true_id.set_attribute('CONSTANT_VALUE', 1)
-
-        constants = [Predefined.false_id, Predefined.true_id]
-        Predefined.boolean_type.set_attribute(Definition.ENUMERATION_CONSTANT, constants)
+    def initialize_types(self, symtab_stack, create_types):
+        if create_types:
+            Predefined.integer_type = TypeSpec(TypeForm.SCALAR)
+            Predefined.real_type = TypeSpec(TypeForm.SCALAR)
+            Predefined.boolean_type = TypeSpec(TypeForm.ENUMERATION)
+            Predefined.char_type = TypeSpec(TypeForm.SCALAR)
+            Predefined.undefined_type = TypeSpec(TypeForm.SCALAR)
+
+        self.integer_id = self.enter_type(symtab_stack, "integer", Predefined.integer_type, create_types)
+        self.real_id    = self.enter_type(symtab_stack, "real",    Predefined.real_type,    create_types)
+        self.boolean_id = self.enter_type(symtab_stack, "boolean", Predefined.boolean_type, create_types)
+        self.char_id    = self.enter_type(symtab_stack, "char",    Predefined.char_type,    create_types)
+
+    def initialize_constants(self, symtab_stack, create_types):
+        self.false_id = symtab_stack.enter_local('false')
+        self.false_id.set_definition(Definition.ENUMERATION_CONSTANT)
+        self.false_id.set_typespec(Predefined.boolean_type)
+        self.false_id.set_attribute('CONSTANT_VALUE', 0)
+
+        self.true_id = symtab_stack.enter_local('true')
+        self.true_id.set_definition(Definition.ENUMERATION_CONSTANT)
+        self.true_id.set_typespec(Predefined.boolean_type)
+        self.true_id.set_attribute('CONSTANT_VALUE', 1)
+
+        if create_types:
+            constants = [self.false_id, self.true_id]
+            Predefined.boolean_type.set_attribute(Definition.ENUMERATION_CONSTANT, constants)
 
     def initialize_standard_routines(self, symtab_stack):
-        Predefined.read_id    = self.enter_standard(symtab_stack, Definition.PROCEDURE, "read",    'READ')
-        Predefined.readln_id  = self.enter_standard(symtab_stack, Definition.PROCEDURE, "readln",  'READLN')
-        Predefined.write_id   = self.enter_standard(symtab_stack, Definition.PROCEDURE, "write",   'WRITE')
-        Predefined.writeln_id = self.enter_standard(symtab_stack, Definition.PROCEDURE, "writeln", 'WRITELN')
-
-        Predefined.abs_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "abs",    'ABS')
-        Predefined.arctan_id = self.enter_standard(symtab_stack, Definition.FUNCTION, "arctan", 'ARCTAN')
-        Predefined.chr_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "chr",    'CHR')
-        Predefined.cos_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "cos",    'COS')
-        Predefined.eof_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "eof",    'EOF')
-        Predefined.eoln_id   = self.enter_standard(symtab_stack, Definition.FUNCTION, "eoln",   'EOLN')
-        Predefined.exp_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "exp",    'EXP')
-        Predefined.ln_id     = self.enter_standard(symtab_stack, Definition.FUNCTION, "ln",     'LN')
-        Predefined.odd_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "odd",    'ODD')
-        Predefined.ord_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "ord",    'ORD')
-        Predefined.pred_id   = self.enter_standard(symtab_stack, Definition.FUNCTION, "pred",   'PRED')
-        Predefined.round_id  = self.enter_standard(symtab_stack, Definition.FUNCTION, "round",  'ROUND')
-        Predefined.sin_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "sin",    'SIN')
-        Predefined.sqr_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "sqr",    'SQR')
-        Predefined.sqrt_id   = self.enter_standard(symtab_stack, Definition.FUNCTION, "sqrt",   'SQRT')
-        Predefined.succ_id   = self.enter_standard(symtab_stack, Definition.FUNCTION, "succ",   'SUCC')
-        Predefined.trunc_id  = self.enter_standard(symtab_stack, Definition.FUNCTION, "trunc",  'TRUNC')
+        self.read_id    = self.enter_standard(symtab_stack, Definition.PROCEDURE, "read",    'READ')
+        self.readln_id  = self.enter_standard(symtab_stack, Definition.PROCEDURE, "readln",  'READLN')
+        self.write_id   = self.enter_standard(symtab_stack, Definition.PROCEDURE, "write",   'WRITE')
+        self.writeln_id = self.enter_standard(symtab_stack, Definition.PROCEDURE, "writeln", 'WRITELN')
+
+        self.abs_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "abs",    'ABS')
+        self.arctan_id = self.enter_standard(symtab_stack, Definition.FUNCTION, "arctan", 'ARCTAN')
+        self.chr_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "chr",    'CHR')
+        self.cos_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "cos",    'COS')
+        self.eof_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "eof",    'EOF')
+        self.eoln_id   = self.enter_standard(symtab_stack, Definition.FUNCTION, "eoln",   'EOLN')
+        self.exp_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "exp",    'EXP')
+        self.ln_id     = self.enter_standard(symtab_stack, Definition.FUNCTION, "ln",     'LN')
+        self.odd_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "odd",    'ODD')
+        self.ord_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "ord",    'ORD')
+        self.pred_id   = self.enter_standard(symtab_stack, Definition.FUNCTION, "pred",   'PRED')
+        self.round_id  = self.enter_standard(symtab_stack, Definition.FUNCTION, "round",  'ROUND')
+        self.sin_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "sin",    'SIN')
+        self.sqr_id    = self.enter_standard(symtab_stack, Definition.FUNCTION, "sqr",    'SQR')
+        self.sqrt_id   = self.enter_standard(symtab_stack, Definition.FUNCTION, "sqrt",   'SQRT')
+        self.succ_id   = self.enter_standard(symtab_stack, Definition.FUNCTION, "succ",   'SUCC')
+        self.trunc_id  = self.enter_standard(symtab_stack, Definition.FUNCTION, "trunc",  'TRUNC')
+
+    def enter_type(self, symtab_stack: SymTabStack, name: str, typespec, create_types):
+        """
+        共有の型を指す識別子を記号表に入れる。型を作った時は、型の名前にこの識別子を使う。
+        """
+        type_id: SymTabEntry = symtab_stack.enter_local(name)
+        if create_types:
+            typespec.set_identifier(type_id)
+        type_id.set_definition(Definition.TYPE)
+        type_id.set_typespec(typespec)
+        return type_id
 
     def enter_standard(self, symtab_stack: SymTabStack, defn: Definition, name:str, routine_code:str):
         prod_id: SymTabEntry = symtab_stack.enter_local(name)
@@ -159,6 +170,16 @@ class Predefined:
         prod_id.set_attribute('ROUTINE_CODE', routine_code)
         return prod_id
 
+    @classmethod
+    def get_types(cls):
+        """
+        共有の型を名前から引く辞書。型をまだ作っていない時は空。
+        """
+        with cls.types_lock:
+            if cls.integer_type == None:
+                return {}
+            return dict((name, getattr(cls, name)) for name in cls.TYPE_NAMES)
+
 
 class TypeSpec(TypeSpecIF):
     def __init__(self, value):
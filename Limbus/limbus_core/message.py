@@ -1,4 +1,8 @@
 # -*- coding: utf-8 -*-
+import atexit
+import collections
+import sys
+import threading
 from enum import Enum,  auto
 from abc import ABCMeta, abstractmethod
 
@@ -43,27 +47,113 @@ class MessageProducer(metaclass=ABCMeta):
 
 
 class MessageListener(metaclass=ABCMeta):
+    # 受け取るMessageTypeの集合。Noneの時はすべてのMessageを受け取る。
+    message_types = None
+
     @abstractmethod
     def message_received(self, message):
         raise NotImplementedError()
 
 
 class MessageHandler:
-    # クラス変数として宣言
-    msg = None
-    listener = []
+    """
+    MessageProducerごとに持つMessageの配信先。
+    listenerはmessage_typesで受け取るMessageTypeを宣言し、Messageはそのtypeを受け取るlistenerにだけ配る。
+    """
+    def __init__(self):
+        self.listeners = []
+        # MessageTypeから、そのMessageを受け取るlistenerのリストを引く表
+        self.dispatch_table = {}
 
     def add_message_listener(self, listener):
-        MessageHandler.listener.append(listener)
+        self.listeners.append(listener)
+        self.update_dispatch_table()
 
     def remove_message_listener(self, listener):
-        MessageHandler.listener.remove(listener)
+        self.listeners.remove(listener)
+        self.update_dispatch_table()
+
+    def update_dispatch_table(self):
+        table = {}
+        for mtype in MessageType:
+            listeners = [l for l in self.listeners if l.message_types == None or mtype in l.message_types]
+            if listeners:
+                table[mtype] = listeners
+        self.dispatch_table = table
+
+    def has_listener(self, mtype):
+        """
+        mtypeのMessageを受け取るlistenerがいる時はTrue。
+        Messageを作る前に呼んで、受け取り手がいなければ作らずに済ませる。
+        """
+        return mtype in self.dispatch_table
 
     def send_message(self, message):
-        MessageHandler.msg = message
-        self.notify_listener()
-
-    def notify_listener(self):
-        for l in MessageHandler.listener:
-            l.message_received(MessageHandler.msg)
+        for l in self.dispatch_table.get(message.type, ()):
+            l.message_received(message)
+
+
+class BufferedMessageListener(MessageListener):
+    """
+    受け取ったMessageを溜めておき、まとめて文字列にして書き出すlistener。
+    listenerにはformat_message(msg)を持つlistenerを渡す。format_messageは出力する文字列を返す(出力しない時はNone)。
+    溜まったMessageがhigh_water個になったら書き出す。threaded=Trueの時は書き出しを別スレッドで行う。
+    close()で残っているMessageをすべて書き出す。sys.exit()で終わった時もatexitでclose()する。
+    """
+    HIGH_WATER = 4096
+
+    def __init__(self, listener, out=None, high_water=HIGH_WATER, threaded=False):
+        self.listener = listener
+        self.message_types = listener.message_types
+        self.out = out
+        self.high_water = high_water
+        self.buffer = collections.deque()
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(threading.Lock())
+        self.closed = False
+        self.thread = None
+        if threaded:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        atexit.register(self.close)
 
+    def message_received(self, message):
+        self.buffer.append(message)
+        if len(self.buffer) >= self.high_water:
+            if self.thread == None:
+                self.flush()
+            else:
+                with self.ready:
+                    self.ready.notify()
+
+    def flush(self):
+        with self.lock:
+            buffer = self.buffer
+            format_message = self.listener.format_message
+            lines = []
+            while buffer:
+                text = format_message(buffer.popleft())
+                if text != None:
+                    lines.append(text)
+            if lines:
+                out = self.out if self.out != None else sys.stdout
+                out.write('\n'.join(lines) + '\n')
+
+    def run(self):
+        while True:
+            with self.ready:
+                while len(self.buffer) < self.high_water and not self.closed:
+                    self.ready.wait()
+            self.flush()
+            if self.closed:
+                return
+
+    def close(self):
+        atexit.unregister(self.close)
+        if self.thread != None:
+            with self.ready:
+                self.closed = True
+                self.ready.notify()
+            self.thread.join()
+        self.closed = True
+        self.flush()
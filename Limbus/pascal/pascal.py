@@ -1,20 +1,31 @@
 # -*- coding: utf-8 -*-
+import re
+import string
 import sys
+from types import MappingProxyType
 
-from limbus_core.message import Message, MessageType ,MessageListener
+from limbus_core.message import Message, MessageType ,MessageListener, BufferedMessageListener
+from limbus_core.context import CompilationContext
 from limbus_core.frontend.token import Token, TokenType, ErrorToken
 from limbus_core.frontend.scanner import Scanner
-from limbus_core.frontend.source import Source
+from limbus_core.frontend.source import Source, BufferedSource
 from limbus_core.backend.backend_factory import BackendFactory
 from limbus_core.intermidiate.cross_referencer import CrossReferencer
 from limbus_core.intermidiate.parse_tree_printer import ParseTreePrinter
+from limbus_core.intermidiate.iCode_store import compact_routines
+from limbus_core.intermidiate.iCode_optimizer import ConstantFolder, DeadCodeEliminator
 
 from pascal.pascal_parser import PascalParserTD
+from pascal.pascal_cache import PascalCache
+from pascal.pascal_parallel import ParallelPascalParser
 from pascal.pascal_error import PascalErrorType, PascalError
 from pascal.pascal_token import *
+from pascal.pascal_token import float_value, classify_word, special_symbol_table
 
 
 class SourceMessageListener(MessageListener):
+    message_types = frozenset([MessageType.PARSER_SUMMARY])
+
     def message_received(self, msg):
         type = msg.type
         body = msg.body
@@ -23,6 +34,8 @@ class SourceMessageListener(MessageListener):
 
 
 class ParserMessageListener(MessageListener):
+    message_types = frozenset([MessageType.TOKEN, MessageType.SYNTAX_ERROR])
+
     def message_received(self, msg):
         mtype = msg.type
         body = msg.body
@@ -74,35 +87,53 @@ class ParserMessageListener(MessageListener):
 
 
 class BackendMessageListener(MessageListener):
+    message_types = frozenset([MessageType.INTERPRETER_SUMMARY, MessageType.COMPILER_SUMMARY,
+                               MessageType.ASSIGN, MessageType.RUNTIME_ERROR])
+
     def __init__(self):
         self.first_output_msg = True
         self.ASSIGN_FORMAT = '>>> LINE %3d: %s = %s'
 
     def message_received(self, msg):
+        text = self.format_message(msg)
+        if text != None:
+            print(text)
+
+    def format_message(self, msg):
         mtype = msg.type
         body = msg.body
         if mtype == MessageType.INTERPRETER_SUMMARY:
-            print('%d statements executed. %d runtime errors.' % (body[0], body[1]))
+            return '%d statements executed. %d runtime errors.' % (body[0], body[1])
         elif mtype == MessageType.COMPILER_SUMMARY:
-            print('%d instructions generated' % body)
-        elif mtype == 'ASSIGN':
+            return '%d instructions generated' % body
+        elif mtype == MessageType.ASSIGN:
+            line_number, name, value = body
+            text = self.ASSIGN_FORMAT % (line_number, name, str(value))
             if self.first_output_msg:
-                print('===== OUTPUT =====')
                 self.first_output_msg = False
-            line_number, name, value = body
-            print(self.ASSIGN_FORMAT % (line_number, name, str(value)))
-        elif mtype == 'RUNTIME_ERROR':
+                text = '===== OUTPUT =====\n' + text
+            return text
+        elif mtype == MessageType.RUNTIME_ERROR:
             err_msg, line_number = body
 
-            print("*** RUNTIME ERROR")
+            text = "*** RUNTIME ERROR\n"
             if line_number:
-                print(' AT LINE %03d' % line_number, end = '')
-            print(" : ", err_msg)
+                text = text + ' AT LINE %03d' % line_number
+            return text + " :  " + str(err_msg)
+        return None
 
 
 class PascalScanner(Scanner):
     special_chars = "<>=()[]{}^.+-*/:.,;'="
 
+    # 先頭の一文字から作るTokenのクラスを引く表。ASCII以外の文字は表に無いので、
+    # 従来通りisalpha()/isdigit()で判定する。
+    token_classes = MappingProxyType(
+        {**{cc: PascalWordToken for cc in string.ascii_letters},
+         **{cc: PascalNumberToken for cc in string.digits},
+         **{cc: PascalSpecialToken for cc in special_chars},
+         "'": PascalStringToken})
+
     def __init__(self, source):
         super().__init__(source)
 
@@ -110,17 +141,16 @@ class PascalScanner(Scanner):
         self.skip_whitespace()
         cc = self.current_char()
 
-        if cc == Scanner.EOF:
+        token_class = self.token_classes.get(cc)
+        if token_class != None:
+            token = token_class(self.source)
+        elif cc == Scanner.EOF:
             token = Token(self.source)
             token.type = TokenType.EOF
         elif cc.isalpha():
             token = PascalWordToken(self.source)
         elif cc.isdigit():
             token = PascalNumberToken(self.source)
-        elif cc == "'":
-            token = PascalStringToken(self.source)
-        elif cc in PascalScanner.special_chars:
-            token = PascalSpecialToken(self.source)
         else:
             token = ErrorToken("PascalScanner", self.source)
             self.next_char()
@@ -128,17 +158,146 @@ class PascalScanner(Scanner):
         return token
 
     def skip_whitespace(self):
+        """
+        空白(スペース、タブ、改行)とコメント({ }, (* *), //)を読み飛ばす。
+        BufferedSourceの時はバッファをまとめて探して、次の字句の先頭へ移動する。
+        """
+        source = self.source
+        if isinstance(source, BufferedSource):
+            offset = skip_blanks(source.buffer, source.offset)
+            if offset != source.offset:
+                source.seek(offset)
+        else:
+            self.skip_whitespace_chars()
+
+    def skip_whitespace_chars(self):
         cc = self.current_char()
-        while cc == ' ' or cc == '{' or cc == '\n' :
-            # comment
-            if cc == '{':
+        while True:
+            if cc == ' ' or cc == '\t' or cc == '\n':
+                cc = self.next_char()
+            elif cc == '{':
                 cc = self.next_char()
-                while cc == Scanner.EOF or cc != '}':
+                while cc != Scanner.EOF and cc != '}':
                     cc = self.next_char()
                 if cc == '}':
                     cc = self.next_char()
-            else:
+            elif cc == '(' and self.source.peek_char() == '*':
+                self.next_char()
                 cc = self.next_char()
+                while cc != Scanner.EOF and not (cc == '*' and self.source.peek_char() == ')'):
+                    cc = self.next_char()
+                if cc == '*':
+                    self.next_char()
+                    cc = self.next_char()
+            elif cc == '/' and self.source.peek_char() == '/':
+                while cc != Scanner.EOF and cc != '\n':
+                    cc = self.next_char()
+            else:
+                break
+
+
+BLANKS_RE = re.compile(r'[ \t\n]++')
+
+
+def skip_blanks(buffer, offset):
+    """
+    bufferのoffsetから、空白とコメントを飛ばした次の位置を返す。閉じていないコメントはバッファの最後まで。
+    """
+    n = len(buffer)
+    while offset < n:
+        cc = buffer[offset]
+        if cc == ' ' or cc == '\t' or cc == '\n':
+            offset = BLANKS_RE.match(buffer, offset).end()
+        elif cc == '{':
+            end = buffer.find('}', offset + 1)
+            offset = n if end == -1 else end + 1
+        elif cc == '(' and buffer.startswith('*', offset + 1):
+            end = buffer.find('*)', offset + 2)
+            offset = n if end == -1 else end + 2
+        elif cc == '/' and buffer.startswith('/', offset + 1):
+            end = buffer.find('\n', offset + 2)
+            offset = n if end == -1 else end
+        else:
+            break
+    return offset
+
+
+class PascalRegexScanner(PascalScanner):
+    """
+    一つの正規表現で字句をまとめて切り出すScanner。BufferedSourceと組み合わせて使う。
+    正規表現で扱えない入力(エラーになる字句や非ASCII文字)はPascalScannerに任せるので、
+    結果のTokenはPascalScannerと同じになる。
+    """
+    TOKEN_RE = re.compile(r"""
+        (?:[ \t\n]++|\{[^}]*+(?:\}|\Z)|\(\*(?s:.*?)(?:\*\)|\Z)|//[^\n]*+)*+
+        (?:
+              (?P<word>[A-Za-z][A-Za-z0-9]*+)
+            | (?P<number>(?P<whole>[0-9]++)
+                         (?:\.(?P<fraction>[0-9]++)|(?=\.\.)|(?!\.))
+                         (?:[eE](?P<sign>[+-]?)(?P<exponent>[0-9]++)|(?![eE])))
+            | (?P<string>'(?:[^']|'')*+')
+            | (?P<special>:=|<=|<>|>=|\.\.|[-+*/,;=()\[\]{}^:<>.])
+        )
+    """, re.VERBOSE)
+
+    def __init__(self, source):
+        super().__init__(source)
+        self.buffer = source.buffer
+
+    def extract_token(self):
+        source = self.source
+        buffer = self.buffer
+
+        m = self.TOKEN_RE.match(buffer, source.offset)
+        if not m:
+            # 閉じていないコメントやエラーになる字句はPascalScannerに任せる
+            return super().extract_token()
+
+        kind = m.lastgroup
+        source.seek(m.start(kind))
+        end = m.end()
+
+        if kind == 'word':
+            if end < len(buffer) and buffer[end] >= '\x80':
+                return super().extract_token()
+            ptype, value = classify_word(m.group(kind))
+            token = new_token(PascalWordToken, source, ptype, "", value)
+        elif kind == 'number':
+            if end < len(buffer) and buffer[end] >= '\x80':
+                return super().extract_token()
+            text = m.group(kind)
+            if m.group('fraction') == None and m.group('exponent') == None:
+                token = new_token(PascalNumberToken, source, PTT.INTEGER, text, int(text))
+            else:
+                fv = float_value(m.group('whole'), m.group('fraction'), m.group('exponent'), m.group('sign'))
+                if fv == None:
+                    return super().extract_token()
+                token = new_token(PascalNumberToken, source, PTT.REAL, text, float(fv))
+        elif kind == 'string':
+            text = m.group(kind)
+            token = new_token(PascalStringToken, source, PTT.STRING, text, text[1:-1].replace("''", "'"))
+        else:
+            text = m.group(kind)
+            ptype, value = special_symbol_table[text]
+            token = new_token(PascalSpecialToken, source, ptype, text, value)
+
+        source.seek(end)
+        return token
+
+
+def new_token(token_class, source, ptype, text, value):
+    """
+    字句を切り出さずに、現在のSourceの位置でTokenを作る。
+    """
+    token = token_class.__new__(token_class)
+    token.type = TokenType.PASCAL
+    token.ptype = ptype
+    token.text = text
+    token.value = value
+    token.error_code = None
+    token.line_num = source.get_line_num()
+    token.pos = source.get_position()
+    return token
 
 
 class Pascal:
@@ -154,24 +313,65 @@ class Pascal:
         else:
             self.xref = False
 
-        self.source = Source(open(file))
+        # エラーが多すぎてもsys.exitせず、集めたエラーを表示して止める
+        self.collect_errors = 'e' in flags
+
+        # 構文解析の後で、iCodeの木を列に並べた表(iCodeStore)に詰めてメモリを減らす
+        self.compact = 'm' in flags
+
+        # 実行の前に、定数の式を畳み込み、実行されない文と呼ばれないルーチンを取り除いてiCodeを小さくする
+        self.optimize = 'o' in flags
+
+        if 'c' in flags:
+            # 構文解析の結果をソースのハッシュ値で保存しておき、ソースが変わっていなければ使う
+            self.cache = PascalCache(PascalCache.default_directory(file))
+        else:
+            self.cache = None
+
+        self.source = BufferedSource(open(file))
         self.source.add_message_listener(SourceMessageListener())
 
-        self.scanner = PascalScanner(self.source)
-        self.parser = PascalParserTD(self.scanner)
+        if 'r' in flags:
+            self.scanner = PascalRegexScanner(self.source)
+        else:
+            self.scanner = PascalScanner(self.source)
+        if 'p' in flags:
+            # プログラム直下の手続きと関数のブロックを、複数のプロセスで構文解析する
+            self.parser = ParallelPascalParser(self.scanner, CompilationContext(collect_errors=self.collect_errors))
+        else:
+            self.parser = PascalParserTD(self.scanner, CompilationContext(collect_errors=self.collect_errors))
         self.parser.add_message_listener(ParserMessageListener())
 
         self.backend = BackendFactory().create_backend(op)
-        self.backend.add_message_listener(BackendMessageListener())
-
-        self.parser.parse()
-        self.source.close()
+        self.backend_listener = BackendMessageListener()
+        if 'b' in flags:
+            # 実行時のメッセージを溜めてまとめて出力する
+            self.backend_listener = BufferedMessageListener(self.backend_listener)
+        self.backend.add_message_listener(self.backend_listener)
+
+        self.symtab_stack = None
+        if self.cache:
+            self.symtab_stack = self.cache.load(self.source.buffer)
+
+        if self.symtab_stack == None:
+            self.parser.parse()
+            self.source.close()
+
+            if self.parser.get_error_count() != 0:
+                if self.parser.context.aborted != None:
+                    print("*** ABORTED: %s" % self.parser.context.aborted)
+                print("PARSE ERROR, STOP PROCESSING")
+                return
 
-        if self.parser.get_error_count() != 0:
-            print("PARSE ERROR, STOP PROCESSING")
-            return
+            self.symtab_stack = self.parser.get_symTab()
+            # キャッシュのキーにフラグは入らないので、最適化する前の木を保存する
+            if self.cache:
+                self.cache.store(self.source.buffer, self.symtab_stack)
+            self.optimize_icode()
+        else:
+            self.source.close()
+            self.optimize_icode()
 
-        self.symtab_stack = self.parser.get_symTab()
         program_id = self.symtab_stack.get_program_id()
         self.iCode = program_id.get_attribute('ROUTINE_ICODE')
 
@@ -185,4 +385,19 @@ class Pascal:
                 tree_printer.print(self.symtab_stack)
 
 #        self.backend.process(self.iCode, self.symtab_stack)
+        if isinstance(self.backend_listener, BufferedMessageListener):
+            self.backend_listener.close()
+
+    def optimize_icode(self):
+        """
+        フラグに従って、iCodeを最適化してからiCodeStoreに詰める。
+        キャッシュには構文解析したままの木を保存するので、キャッシュから読んだ時もここで最適化する。
+        """
+        program_id = self.symtab_stack.get_program_id()
+        if self.optimize:
+            removed = ConstantFolder().optimize(program_id)
+            removed += DeadCodeEliminator().optimize(program_id)
+            print("%d iCode nodes removed by optimization" % removed)
+        if self.compact:
+            compact_routines(program_id)
 
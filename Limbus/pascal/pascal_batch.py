@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+たくさんのPascalのプログラムを、複数のプロセスに分けてまとめて構文解析し、実行する。
+ファイルごとの結果(行数、構文エラー、実行した文の数、実行時エラー)を1つのレポートにまとめる。
+"""
+import concurrent.futures
+import contextlib
+import io
+import os
+import time
+
+from limbus_core.context import CompilationContext, ExecutionContext
+from limbus_core.frontend.source import BufferedSource
+from limbus_core.backend.executer import Executer
+from pascal.pascal import PascalScanner
+from pascal.pascal_parser import PascalParserTD
+
+PASCAL_SUFFIX = '.pas'
+
+# workerを起動した時に一度構文解析と実行をして、Predefinedの型などを作っておくプログラム
+WARM_UP_PROGRAM = """PROGRAM warmup;
+VAR
+    i : integer;
+BEGIN
+    i := 1
+END.
+"""
+
+
+class BatchCompiler:
+    """
+    1つのプロセスで、ファイルを1つずつ構文解析して実行する。
+    ファイルをまたいで使うのは、プロセスと読み込んだモジュール、Predefinedの型(プロセスで共有)、出力の捨て先だけ。
+    ScannerとPascalParserTD(子のParserの表を含む)は、ソースとContextを持つのでファイルごとに作る。
+    子のParserの表を作る時間は、小さなプログラムでも構文解析の2%ほど。
+    ファイルごとにエラーを集めるモードの新しいContextで構文解析と実行をし、
+    エラーが多すぎる時も、sys.exitせずに次のファイルに進む。
+
+    結果のstatusは次のどれか。
+      ok            構文エラーが無く、(executeの時は)実行も最後まで終わった
+      syntax_error  構文エラーがあったので実行していない
+      aborted       エラーが多すぎて、構文解析か実行が途中で打ち切られた
+      crashed       構文解析か実行の途中で例外が起きた
+      io_error      ファイルが読めなかった
+    """
+    def __init__(self, execute=True, scanner_class=PascalScanner, max_errors=5, max_skipped_tokens=10000):
+        self.execute = execute
+        self.scanner_class = scanner_class
+        self.max_errors = max_errors
+        self.max_skipped_tokens = max_skipped_tokens
+        # SymTabEntryなどのデバッグ用のprintは捨てる
+        self.devnull = open(os.devnull, 'w')
+
+    def warm_up(self):
+        self.process_source('<warm-up>', BufferedSource(io.StringIO(WARM_UP_PROGRAM)))
+
+    def process(self, file):
+        try:
+            with open(file) as reader:
+                source = BufferedSource(reader)
+        except (OSError, UnicodeDecodeError) as e:
+            return self.new_result(file, 'io_error', error=str(e))
+        return self.process_source(file, source)
+
+    def process_source(self, file, source):
+        result = self.new_result(file, 'ok')
+        context = CompilationContext(collect_errors=True, max_errors=self.max_errors,
+                                     max_skipped_tokens=self.max_skipped_tokens)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(self.devnull):
+            try:
+                parser = PascalParserTD(self.scanner_class(source), context)
+                parser.parse()
+            except Exception as e:
+                result['status'] = 'crashed'
+                result['error'] = '%s: %s' % (type(e).__name__, e)
+        result['parse_time'] = time.perf_counter() - start
+        result['source_lines'] = source.get_line_num()
+        result['syntax_errors'] = context.error_count
+        result['diagnostics'] = [diagnostic.to_dict() for diagnostic in context.diagnostics]
+
+        if result['status'] == 'ok':
+            if context.aborted != None:
+                result['status'] = 'aborted'
+                result['error'] = context.aborted
+            elif context.error_count != 0:
+                result['status'] = 'syntax_error'
+
+        if self.execute and result['status'] == 'ok':
+            execution_context = ExecutionContext(collect_errors=True, max_errors=self.max_errors)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(self.devnull):
+                try:
+                    symtab_stack = parser.get_symTab()
+                    icode = symtab_stack.get_program_id().get_attribute('ROUTINE_ICODE')
+                    Executer(None, execution_context).process(icode, symtab_stack)
+                except Exception as e:
+                    result['status'] = 'crashed'
+                    result['error'] = '%s: %s' % (type(e).__name__, e)
+            result['execute_time'] = time.perf_counter() - start
+            result['execution'] = {'statements': execution_context.execution_count,
+                                   'runtime_errors': execution_context.runtime_error}
+            result['runtime_errors'] = [diagnostic.to_dict() for diagnostic in execution_context.diagnostics]
+            if result['status'] == 'ok' and execution_context.aborted != None:
+                result['status'] = 'aborted'
+                result['error'] = execution_context.aborted
+
+        return result
+
+    @staticmethod
+    def new_result(file, status, error=None):
+        return {'file': file, 'status': status, 'error': error,
+                'source_lines': 0, 'syntax_errors': 0, 'diagnostics': [], 'parse_time': 0.0,
+                'execution': None, 'runtime_errors': [], 'execute_time': 0.0}
+
+
+# workerプロセスごとのBatchCompiler
+_worker_compiler = None
+
+
+def _init_worker(execute, scanner_class):
+    # 最初のファイルの前に一度構文解析と実行をして、モジュールの読み込みとPredefinedの型の作成を済ませておく
+    global _worker_compiler
+    _worker_compiler = BatchCompiler(execute, scanner_class)
+    _worker_compiler.warm_up()
+
+
+def _process_file(file):
+    return _worker_compiler.process(file)
+
+
+def collect_files(paths):
+    """
+    pathsのファイルのリストを作る。
+    ディレクトリの時はその下の.pasのファイル(大文字小文字は区別しない)、.pasのファイルの時はそのファイル、
+    それ以外のファイルはマニフェストとして、1行に1つ書かれたファイルを使う。
+    マニフェストの中の相対パスはマニフェストのディレクトリから、#で始まる行と空行は読み飛ばす。
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(PASCAL_SUFFIX):
+                        files.append(os.path.join(dirpath, filename))
+        elif path.lower().endswith(PASCAL_SUFFIX):
+            files.append(path)
+        else:
+            base = os.path.dirname(path)
+            with open(path) as manifest:
+                for line in manifest:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        files.append(os.path.join(base, line))
+    return files
+
+
+def run_batch(files, workers=None, execute=True, scanner_class=PascalScanner):
+    """
+    filesをworkers個のプロセスで構文解析して(executeの時は実行も)、レポートの辞書を返す。
+    ファイルの結果はfilesと同じ順に並ぶ。workersが1の時はプロセスを作らずにこのプロセスで処理する。
+    """
+    if workers == None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(files)))
+
+    start = time.perf_counter()
+    if workers == 1:
+        compiler = BatchCompiler(execute, scanner_class)
+        results = [compiler.process(file) for file in files]
+    else:
+        # 小さなファイルが多い時にプロセス間のやり取りが増えないように、ファイルをまとめて渡す
+        chunksize = max(1, len(files) // (workers * 4))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                    initargs=(execute, scanner_class)) as executor:
+            results = list(executor.map(_process_file, files, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    return {'workers': workers, 'execute': execute, 'scanner': scanner_class.__name__,
+            'summary': summarize(results, elapsed), 'files': results}
+
+
+def summarize(results, elapsed):
+    statuses = dict((status, 0) for status in ('ok', 'syntax_error', 'aborted', 'crashed', 'io_error'))
+    for result in results:
+        statuses[result['status']] += 1
+
+    source_lines = sum(result['source_lines'] for result in results)
+    executed = [result['execution'] for result in results if result['execution'] != None]
+    return {'files': len(results),
+            'status': statuses,
+            'source_lines': source_lines,
+            'syntax_errors': sum(result['syntax_errors'] for result in results),
+            'statements_executed': sum(execution['statements'] for execution in executed),
+            'runtime_errors': sum(execution['runtime_errors'] for execution in executed),
+            'elapsed': elapsed,
+            'files_per_sec': len(results) / elapsed if elapsed > 0 else 0.0,
+            'lines_per_sec': source_lines / elapsed if elapsed > 0 else 0.0}
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import gc
+import hashlib
+import os
+
+from limbus_core.intermidiate import iCode_serializer
+
+# キャッシュのファイルの形式が変わった時に上げる
+CACHE_FORMAT = 3
+
+_compiler_version = None
+
+
+def compiler_version():
+    """
+    コンパイラのバージョンとして、pascalとlimbus_coreのソースファイル全体のハッシュ値を使う。
+    コンパイラに手を入れると、以前のキャッシュは使われなくなる。
+    """
+    global _compiler_version
+    if _compiler_version == None:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        digest = hashlib.sha256(b'%d' % CACHE_FORMAT)
+        for package in ('limbus_core', 'pascal'):
+            for dirpath, dirnames, filenames in sorted(os.walk(os.path.join(root, package))):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.endswith('.py'):
+                        path = os.path.join(dirpath, filename)
+                        digest.update(os.path.relpath(path, root).encode('utf-8'))
+                        with open(path, 'rb') as fp:
+                            digest.update(fp.read())
+        _compiler_version = digest.hexdigest()
+    return _compiler_version
+
+
+class PascalCache:
+    """
+    構文解析の結果(記号表のstackと、そこから辿れるiCode)をファイルに保存しておくキャッシュ。
+    ソースの内容とコンパイラのバージョンのハッシュ値をキーにする。
+    保存するのはエラーの無かった構文解析の結果だけで、形式はiCode_serializerのバイナリ。
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    @staticmethod
+    def default_directory(file):
+        """
+        ソースファイルと同じディレクトリの__limbuscache__。
+        """
+        return os.path.join(os.path.dirname(os.path.abspath(file)), '__limbuscache__')
+
+    def key(self, text):
+        digest = hashlib.sha256(compiler_version().encode('ascii'))
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def path(self, text):
+        return os.path.join(self.directory, self.key(text) + '.limbusic')
+
+    def load(self, text):
+        """
+        textを構文解析した結果の記号表のstackを返す。キャッシュに無い時や読めない時はNone。
+        Predefinedの型は、このプロセスの共有の型になる(まだ無い時は作る)。
+        """
+        try:
+            with open(self.path(text), 'rb') as fp:
+                data = fp.read()
+            # 大量のオブジェクトを作る間、循環参照のGCが何度も走らないように止めておく。
+            # 呼び出し元がGCを止めている時は、止めたままにする。
+            enabled = gc.isenabled()
+            gc.disable()
+            try:
+                return iCode_serializer.loads(data)
+            finally:
+                if enabled:
+                    gc.enable()
+        except Exception:
+            # 無いか壊れている時は、構文解析をやり直す
+            return None
+
+    def store(self, text, symtab_stack):
+        """
+        textを構文解析した結果の記号表のstackを保存する。
+        他のプロセスが途中まで書いたファイルを読まないように、一時ファイルに書いてから置き換える。
+        """
+        try:
+            data = iCode_serializer.dumps(symtab_stack)
+        except iCode_serializer.SerializeError:
+            # 保存できない値がある時は、キャッシュしない
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(text)
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        try:
+            with open(tmp_path, 'wb') as fp:
+                fp.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
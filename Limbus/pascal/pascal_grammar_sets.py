@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Parserの同期(synchronize)や構文の判定に使う、Tokenの集合。
+要素はTokenのvalue(予約語や特殊記号の名前)で、_PTTの付いた集合はTokenのptype。
+どれも一度だけ作るfrozensetなので、Parserのクラス変数から共有して使う。
+"""
+from pascal.pascal_token import PTT
+
+# 宣言
+DECLARATION_START_SET = frozenset(['CONST', 'TYPE', 'VAR', 'PROCEDURE', 'FUNCTION', 'BEGIN'])
+DECLARATION_TYPE_START_SET = DECLARATION_START_SET - {'CONST'}
+DECLARATION_VAR_START_SET = DECLARATION_TYPE_START_SET - {'TYPE'}
+DECLARATION_ROUTINE_START_SET = DECLARATION_VAR_START_SET - {'VAR'}
+
+# 文
+STMT_START_SET = frozenset(['BEGIN', 'CASE', 'FOR', 'IF', 'REPEAT', 'WHILE', 'IDENTIFIER', 'SEMICOLON'])
+STMT_FOLLOW_SET = frozenset(['SEMICOLON', 'END', 'ELSE', 'UNTIL', 'DOT'])
+
+# 変数
+SUBSCRIPT_FIELD_START_SET = frozenset(['LEFT_BRACKET', 'DOT'])
+SUBSCRIPT_RIGHT_BRACKET_SET = frozenset(['RIGHT_BRACKET', 'EQUALS', 'SEMICOLON'])
+
+# 式
+EXPR_START_SET = frozenset(['PLUS', 'MINUS', 'NOT', 'LEFT_PAREN'])
+EXPR_START_SET_PTT = frozenset([PTT.IDENTIFIER, PTT.INTEGER, PTT.REAL, PTT.STRING])
+REL_OPS = frozenset(['EQUALS', 'NOT_EQUALS', 'LESS_THAN', 'LESS_EQUALS', 'GREATER_THAN', 'GREATER_EQUALS'])
+ADD_OPS = frozenset(['PLUS', 'MINUS', 'OR'])
+MUL_OPS = frozenset(['STAR', 'SLASH', 'DIV', 'MOD', 'AND'])
+
+# 代入文
+COLON_EQUALS_SET = EXPR_START_SET | {'COLON_EQUALS'} | STMT_FOLLOW_SET
+
+# CASE文
+CASE_CONSTANT_START_SET = frozenset(['PLUS', 'MINUS'])
+CASE_CONSTANT_START_SET_PTT = frozenset([PTT.IDENTIFIER, PTT.INTEGER, PTT.STRING])
+CASE_OF_SET = CASE_CONSTANT_START_SET | {'OF'} | STMT_FOLLOW_SET
+CASE_COMMA_SET = CASE_CONSTANT_START_SET | {'COMMA', 'COLON'} | STMT_START_SET | STMT_FOLLOW_SET
+
+# FOR, IF, REPEAT, WHILE文
+TO_DOWNTO_SET = EXPR_START_SET | {'TO', 'DOWNTO'} | STMT_FOLLOW_SET
+TO_DOWNTO_SET_PTT = EXPR_START_SET_PTT
+DO_SET = STMT_START_SET | {'DO'} | STMT_FOLLOW_SET
+THEN_SET = STMT_START_SET | {'THEN'} | STMT_FOLLOW_SET
+
+# 定数定義
+CONSTANT_START_SET = frozenset(['PLUS', 'MINUS', 'SEMICOLON'])
+CONSTANT_START_SET_PTT = frozenset([PTT.IDENTIFIER, PTT.INTEGER, PTT.REAL, PTT.STRING])
+CONSTANT_IDENTIFIER_SET = DECLARATION_TYPE_START_SET | {'IDENTIFIER'}
+CONSTANT_EQUALS_SET = CONSTANT_START_SET | {'EQUALS', 'SEMICOLON'}
+CONSTANT_NEXT_START_SET = DECLARATION_TYPE_START_SET | {'SEMICOLON', 'IDENTIFIER'}
+
+# 型定義
+TYPE_IDENTIFIER_SET = DECLARATION_VAR_START_SET
+TYPE_IDENTIFIER_SET_PTT = frozenset([PTT.IDENTIFIER])
+TYPE_EQUALS_SET = CONSTANT_START_SET | {'EQUALS', 'SEMICOLON'}
+TYPE_FOLLOW_SET = frozenset(['SEMICOLON'])
+TYPE_NEXT_START_SET = DECLARATION_VAR_START_SET | {'SEMICOLON', 'IDENTIFIER'}
+
+# 型
+TYPE_START_SET = CONSTANT_START_SET | {'LEFT_PAREN', 'COMMA', 'SEMICOLON', 'ARRAY', 'RECORD'}
+TYPE_START_SET_PTT = CONSTANT_START_SET_PTT
+SIMPLE_TYPE_START_SET = CONSTANT_START_SET | {'LEFT_PAREN', 'COMMA', 'SEMICOLON'}
+SIMPLE_TYPE_START_SET_PTT = CONSTANT_START_SET_PTT
+RECORD_END_SET = DECLARATION_VAR_START_SET | {'END', 'SEMICOLON'}
+ENUM_CONSTANT_START_SET = frozenset(['IDENTIFIER', 'COMMA'])
+ENUM_DEFINITION_FOLLOW_SET = frozenset(['RIGHT_PAREN', 'SEMICOLON']) | DECLARATION_VAR_START_SET
+
+# 配列型
+ARRAY_LEFT_BRACKET_SET = SIMPLE_TYPE_START_SET | {'LEFT_BRACKET', 'RIGHT_BRACKET'}
+ARRAY_LEFT_BRACKET_SET_PTT = SIMPLE_TYPE_START_SET_PTT
+ARRAY_RIGHT_BRACKET_SET = frozenset(['RIGHT_BRACKET', 'OF', 'SEMICOLON'])
+ARRAY_OF_SET = TYPE_START_SET | {'OF', 'SEMICOLON'}
+INDEX_START_SET = SIMPLE_TYPE_START_SET | {'COMMA'}
+INDEX_START_SET_PTT = SIMPLE_TYPE_START_SET_PTT
+INDEX_END_SET = frozenset(['RIGHT_BRACKET', 'OF', 'SEMICOLON'])
+INDEX_FOLLOW_SET = INDEX_START_SET | INDEX_END_SET
+
+# 変数宣言
+VAR_IDENTIFIER_SET = DECLARATION_VAR_START_SET | {'END', 'SEMICOLON'}
+VAR_IDENTIFIER_SET_PTT = frozenset([PTT.IDENTIFIER])
+VAR_NEXT_START_SET = DECLARATION_ROUTINE_START_SET | {'IDENTIFIER', 'SEMICOLON'}
+IDENTIFIER_START_SET = frozenset(['IDENTIFIER', 'COMMA'])
+IDENTIFIER_FOLLOW_SET = frozenset(['COLON', 'SEMICOLON']) | DECLARATION_VAR_START_SET
+VAR_COMMA_SET = frozenset(['COMMA', 'COLON', 'IDENTIFIER', 'SEMICOLON'])
+VAR_COLON_SET = frozenset(['COLON', 'SEMICOLON'])
+
+# 手続きと関数の呼び出し
+CALL_COMMA_SET = EXPR_START_SET | {'COMMA', 'RIGHT_PAREN'}
+CALL_COMMA_SET_PTT = EXPR_START_SET_PTT
+
+# 手続きと関数の宣言
+PARAMETER_SET = DECLARATION_START_SET | {'VAR', 'RIGHT_PAREN'}
+PARAMETER_SET_PTT = frozenset([PTT.IDENTIFIER])
+LEFT_PAREN_SET = DECLARATION_START_SET | {'LEFT_PAREN', 'SEMICOLON', 'COLON'}
+RIGHT_PAREN_SET = DECLARATION_START_SET | {'RIGHT_PAREN', 'SEMICOLON', 'COLON'}
+PARAMETER_FOLLOW_SET = frozenset(['COLON', 'RIGHT_PAREN', 'SEMICOLON']) | DECLARATION_START_SET
+PARAMETER_COMMA_SET = frozenset(['COMMA', 'COLON', 'RIGHT_PAREN', 'SEMICOLON']) | DECLARATION_START_SET
+PARAMETER_COMMA_SET_PTT = frozenset([PTT.IDENTIFIER])
+PROGRAM_START_SET = frozenset(['PROGRAM', 'SEMICOLON']) | DECLARATION_START_SET
+
+EMPTY_SET = frozenset()
+
+# 文の並びの同期に使う集合。終端(END, UNTIL)ごとに一度だけ作る。
+_statement_list_sets = {}
+
+
+def statement_list_set(terminator):
+    """
+    STMT_START_SETに終端のTokenを加えた集合。
+    """
+    syncset = _statement_list_sets.get(terminator)
+    if syncset == None:
+        syncset = STMT_START_SET | {terminator}
+        _statement_list_sets[terminator] = syncset
+    return syncset
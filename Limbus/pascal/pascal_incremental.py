@@ -0,0 +1,459 @@
+# -*- coding: utf-8 -*-
+import bisect
+import io
+
+from limbus_core.context import CompilationContext, ProcessingAborted
+from limbus_core.frontend.source import BufferedSource
+from limbus_core.frontend.token import TokenType
+from limbus_core.intermidiate.type_impl import Definition, TypeForm
+from pascal.pascal import PascalRegexScanner
+from pascal.pascal_parser import PascalParserTD, BlockParser
+
+# 宣言の位置で見えるかどうかを決める識別子
+ROUTINE_DEFINITIONS = frozenset([Definition.PROCEDURE, Definition.FUNCTION])
+
+
+class PascalTokenTable:
+    """
+    ソース全体のTokenの表。編集された時は、変更のあった行から字句解析をやり直し、
+    以前と同じ位置から同じ字句解析が始まった所で、残りのTokenは元の表から再利用する。
+
+    tokens, starts, endsは同じ長さのリストで、それぞれToken、Tokenのソース中の開始位置と終了位置。
+    最後の要素は常にEOFのToken。行ごとのTokenはBufferedSourceの行の開始位置の表から引く。
+    """
+    def __init__(self, text, scanner_class=PascalRegexScanner):
+        self.scanner_class = scanner_class
+        self.text = ""
+        self.source = None
+        self.tokens = []
+        self.starts = []
+        self.ends = []
+        self.edit(0, 0, text)
+
+    def line_tokens(self, line_num):
+        """
+        line_num行目から始まるTokenのリスト。
+        """
+        line_starts = self.source.line_starts
+        if line_num < 1 or line_num >= len(line_starts):
+            return []
+        first = bisect.bisect_left(self.starts, line_starts[line_num - 1], 0, len(self.starts) - 1)
+        last = bisect.bisect_left(self.starts, line_starts[line_num], 0, len(self.starts) - 1)
+        return self.tokens[first:last]
+
+    def edit(self, start, end, new_text):
+        """
+        ソースのstartからendの手前までをnew_textで置き換え、Tokenの表を更新する。
+        (first, old_stop, new_stop)を返す。
+        編集前のtokens[first:old_stop]が、編集後のtokens[first:new_stop]に置き換わったことを表す。
+        範囲の後ろのTokenは編集前と同じオブジェクトで、行番号と行内の位置だけを新しいソースに合わせて書き換える。
+        """
+        old_text = self.text
+        old_tokens = self.tokens
+        old_starts = self.starts
+        old_ends = self.ends
+        n_old = len(old_tokens) - 1  # EOF以外のTokenの数
+
+        text = old_text[:start] + new_text + old_text[end:]
+        delta = len(new_text) - (end - start)
+        new_end = start + len(new_text)
+
+        # 編集された行の先頭より前で終わるTokenはそのまま使い、その直後から字句解析をやり直す
+        if self.source == None:
+            first = 0
+        else:
+            line_num, pos = self.source.line_of(start)
+            first = bisect.bisect_right(old_ends, self.source.line_starts[line_num - 1], 0, n_old)
+        restart = old_ends[first - 1] if first > 0 else 0
+
+        source = BufferedSource(io.StringIO(text))
+        line_starts = source.line_starts
+        scanner = self.scanner_class(source)
+        source.seek(restart)
+
+        new_tokens = []
+        new_starts = []
+        new_ends = []
+        j = first
+        synced = False
+        while True:
+            token = scanner.next_token()
+            if token.type == TokenType.EOF:
+                break
+
+            token_start = line_starts[token.line_num - 1] + token.pos
+            if token_start >= new_end:
+                # 編集範囲の後ろで、元のTokenと同じ位置から始まったら以降は同じTokenになる
+                while j < n_old and (old_starts[j] < end or old_starts[j] + delta < token_start):
+                    j = j + 1
+                if j < n_old and old_starts[j] + delta == token_start:
+                    synced = True
+                    break
+
+            new_tokens.append(token)
+            new_starts.append(token_start)
+            new_ends.append(source.offset)
+
+        new_stop = first + len(new_tokens)
+        if synced:
+            old_stop = j
+            tokens, starts, ends = self.shift(source, end, delta, j)
+            source.seek(len(text))
+            eof_token = scanner.next_token()
+        else:
+            old_stop = n_old
+            tokens, starts, ends = [], [], []
+            eof_token = token
+
+        self.text = text
+        self.source = source
+        self.tokens = old_tokens[:first] + new_tokens + tokens + [eof_token]
+        self.starts = old_starts[:first] + new_starts + starts + [len(text)]
+        self.ends = old_ends[:first] + new_ends + ends + [len(text)]
+
+        return first, old_stop, new_stop
+
+    def shift(self, source, end, delta, j):
+        """
+        編集範囲より後ろの、再利用するTokenの位置を付け直す。
+        行番号は編集で増減した行数だけずらし、編集範囲の最後と同じ行にあるTokenは行内の位置も計算し直す。
+        """
+        old_tokens = self.tokens
+        n_old = len(old_tokens) - 1
+
+        end_line = self.source.line_of(end)[0]
+        line_delta = source.line_of(end + delta)[0] - end_line
+        line_starts = source.line_starts
+
+        tokens = old_tokens[j:n_old]
+        for k, token in enumerate(tokens):
+            if token.line_num == end_line:
+                token.line_num = token.line_num + line_delta
+                token.pos = self.starts[j + k] + delta - line_starts[token.line_num - 1]
+            elif line_delta != 0:
+                token.line_num = token.line_num + line_delta
+            else:
+                break
+
+        starts = [s + delta for s in self.starts[j:n_old]]
+        ends = [e + delta for e in self.ends[j:n_old]]
+        return tokens, starts, ends
+
+
+class PascalIncrementalParser:
+    """
+    手続きと関数の単位で、編集された所だけを構文解析し直すParser。
+
+    最初にプログラム全体を構文解析し、各ルーチンのソース中の位置(ROUTINE_SPAN)を覚えておく。
+    編集された時は、編集範囲を含む一番内側の手続きか関数のブロックだけを構文解析し直し、
+    そのルーチンのROUTINE_ICODEとROUTINE_SYMTABを差し替える。SymTabEntryは同じものを使うので、
+    親のROUTINE_ROUTINESはそのままで、他のルーチンは以前の木を使い、行番号と位置だけをずらす。
+
+    次の時はプログラム全体を構文解析し直す。
+      編集範囲がどの手続きと関数のブロックにも収まらない(プログラムの本体、ヘッダ、ルーチンの間の編集)
+      ブロックの最初の行にヘッダが、最後の行に後ろのルーチンの文がある(相互参照の行番号を分けられない)
+      構文解析し直したブロックが以前と同じ所で終わらなかった
+      エラーが多すぎて構文解析が打ち切られた
+    """
+    def __init__(self, text, scanner_class=PascalRegexScanner, max_errors=5):
+        self.scanner_class = scanner_class
+        self.max_errors = max_errors
+        self.text = text
+        self.source = None
+        self.context = None
+        self.parse_all()
+
+    def parse_all(self):
+        self.source = BufferedSource(io.StringIO(self.text))
+        self.context = CompilationContext(collect_errors=True, max_errors=self.max_errors)
+        parser = PascalParserTD(self.scanner_class(self.source), self.context)
+        parser.parse()
+
+    def get_symTab(self):
+        return self.context.symtab_stack
+
+    def get_program_id(self):
+        return self.context.symtab_stack.get_program_id()
+
+    def get_error_count(self):
+        return self.context.error_count
+
+    def get_diagnostics(self):
+        return self.context.diagnostics
+
+    def edit(self, start, end, new_text):
+        """
+        ソースのstartからendの手前までをnew_textで置き換えて、構文解析し直す。
+        ブロックだけを構文解析し直したルーチンのSymTabEntryを返す。全体を構文解析し直した時はNone。
+        """
+        text = self.text[:start] + new_text + self.text[end:]
+        path = self.find_routine(start, end)
+        if path:
+            try:
+                reparsed = self.reparse_routine(path, start, end, new_text, text)
+            except Exception:
+                # 構文解析の途中で例外が起きた時は、全体を構文解析し直して同じ結果にする
+                reparsed = False
+            if reparsed:
+                self.text = text
+                return path[-1]
+
+        self.text = text
+        self.parse_all()
+        return None
+
+    def find_routine(self, start, end):
+        """
+        startからendまでを含むブロックを持つ、プログラムから一番内側の手続きか関数までのルーチンのリスト。
+        """
+        program_id = self.get_program_id()
+        if program_id == None or self.context.aborted != None:
+            return []
+
+        path = []
+        routine_id = program_id
+        while True:
+            for sub_id in routine_id.get_attribute('ROUTINE_ROUTINES') or []:
+                span = sub_id.get_attribute('ROUTINE_SPAN')
+                if span != None and span[1] <= start and end <= span[2]:
+                    path.append(sub_id)
+                    routine_id = sub_id
+                    break
+            else:
+                return path
+
+    def reparse_routine(self, path, start, end, new_text, text):
+        routine_id = path[-1]
+        ancestors = [self.get_program_id()] + path[:-1]
+        routine_start, block_start, block_end = routine_id.get_attribute('ROUTINE_SPAN')
+        delta = len(new_text) - (end - start)
+
+        old_source = self.source
+        if not self.has_own_lines(block_start, block_end):
+            return False
+
+        # 以前のブロックの行と、編集で増減した行数
+        source = BufferedSource(io.StringIO(text))
+        first_line = old_source.line_of(block_start)[0]
+        last_line = old_source.line_of(block_end)[0]
+        line_delta = source.line_of(block_end + delta)[0] - last_line
+
+        # ブロックの最初と次のTokenのエラーは、ヘッダや親の構文解析のものかも知れないので区別できない。
+        # ブロックより後ろでFORWARDのルーチンのヘッダを構文解析し直していると、ブロックから見える宣言が以前と違う。
+        boundaries = (old_source.line_of(block_start), old_source.line_of(block_end))
+        for diagnostic in self.context.diagnostics:
+            if (diagnostic.line_number, diagnostic.position) in boundaries:
+                return False
+            if diagnostic.error_code == 'ALREADY_FORWARDED' and (diagnostic.line_number or 0) > last_line:
+                return False
+
+        # ブロックの中の参照の行番号を消し、後ろの行番号をずらす。
+        # ブロックから見える記号表は、構文解析し直した後で行番号を並べ直す。
+        visible = [self.context.symtab_stack.get_local_symtab()]
+        visible.extend(ancestor.get_attribute('ROUTINE_SYMTAB') for ancestor in ancestors)
+        parms = routine_id.get_attribute('ROUTINE_PARMS') or []
+        seen = set()
+        visible_entries = list(parms)
+        for symtab in self.with_record_symtabs(visible, seen):
+            visible_entries.extend(symtab.map.values())
+        # 宣言の行(最初の行番号)は、ブロックの中の行番号を消す前に覚えておく
+        first_lines = {}
+        for entry in visible_entries:
+            line_numbers = entry.line_numbers
+            if line_numbers:
+                first_lines[id(entry)] = line_numbers[0]
+            if line_numbers and line_numbers[-1] >= first_line:
+                entry.line_numbers = [ln + line_delta if ln > last_line else ln
+                                      for ln in line_numbers if not first_line <= ln <= last_line]
+
+        if line_delta != 0:
+            others = []
+            self.collect_symtabs(self.get_program_id(), routine_id, block_start, others)
+            for symtab in self.with_record_symtabs(others, seen):
+                for entry in symtab.map.values():
+                    line_numbers = entry.line_numbers
+                    if line_numbers and line_numbers[-1] > last_line:
+                        entry.line_numbers = [ln + line_delta if ln > last_line else ln for ln in line_numbers]
+
+        # エラーは構文解析した順に並んでいるので、ブロックのエラーがあった所に新しいエラーを入れる
+        diagnostics = []
+        insert_at = None
+        for diagnostic in self.context.diagnostics:
+            ln = diagnostic.line_number
+            if ln != None and ln >= first_line:
+                if insert_at == None:
+                    insert_at = len(diagnostics)
+                if ln <= last_line:
+                    continue
+                diagnostic.line_number = ln + line_delta
+            diagnostics.append(diagnostic)
+        if insert_at == None:
+            insert_at = len(diagnostics)
+
+        # 呼び出し元と同じ入れ子の記号表のstackを作り、ブロックを構文解析する
+        context = CompilationContext(collect_errors=True, max_errors=self.max_errors - len(diagnostics))
+        symtab_stack = context.symtab_stack
+        symtab_stack.stack[0] = self.context.symtab_stack.get_local_symtab()
+        for ancestor in ancestors:
+            symtab_stack.push(ancestor.get_attribute('ROUTINE_SYMTAB'))
+        symtab_stack.set_program_id(self.get_program_id())
+
+        symtab = symtab_stack.push(None)
+        for parm_id in parms:
+            symtab.map[parm_id.get_name()] = parm_id
+            parm_id.symtab = symtab
+
+        # ブロックより後ろで宣言された識別子は、以前の構文解析の時と同じく見えないようにする。
+        # ルーチンの名前の行番号は呼び出しの行だけで宣言の行が無いので、行番号ではなく、
+        # 宣言の位置(FORWARDの時はその宣言)がブロックより後ろのものを隠す。
+        later_ids = set()
+        for ancestor in ancestors:
+            for sub_id in ancestor.get_attribute('ROUTINE_ROUTINES'):
+                declared = self.declared_at(sub_id)
+                if declared == None:
+                    return False
+                if declared > block_start:
+                    later_ids.add(id(sub_id))
+        hidden = []
+        for ancestor in ancestors:
+            ancestor_symtab = ancestor.get_attribute('ROUTINE_SYMTAB')
+            visible_map = dict((name, entry) for name, entry in ancestor_symtab.map.items()
+                               if id(entry) not in later_ids and
+                               (entry.get_definition() in ROUTINE_DEFINITIONS or
+                                first_lines.get(id(entry), 0) <= last_line))
+            if len(visible_map) != len(ancestor_symtab.map):
+                hidden.append((ancestor_symtab, ancestor_symtab.map))
+                ancestor_symtab.map = visible_map
+
+        icode = routine_id.get_attribute('ROUTINE_ICODE')
+        routine_id.set_attribute('ROUTINE_ROUTINES', [])
+        parser = PascalParserTD(self.scanner_class(source), context)
+        source.seek(block_start)
+        try:
+            token = parser.next_token()
+            new_start = parser.get_token_offset(token)
+            root_node = parser.get_parser(BlockParser).parse(token, routine_id)
+        except ProcessingAborted:
+            return False
+        finally:
+            for ancestor_symtab, symtab_map in hidden:
+                ancestor_symtab.map = symtab_map
+        new_end = parser.get_token_offset(parser.current_token())
+        if new_end != block_end + delta or parser.current_token().type == TokenType.EOF:
+            return False
+
+        icode.set_root(root_node)
+        routine_id.set_attribute('ROUTINE_SYMTAB', symtab)
+        routine_id.set_attribute('ROUTINE_SPAN', (routine_start, new_start, new_end))
+        for entry in visible_entries:
+            entry.line_numbers.sort()
+
+        # ブロックより後ろのルーチンの位置と、iCodeの行番号をずらす
+        program_id = self.get_program_id()
+        span = program_id.get_attribute('ROUTINE_SPAN')
+        if span != None:
+            program_id.set_attribute('ROUTINE_SPAN', (span[0], span[1], span[2] + delta))
+        if line_delta != 0:
+            self.shift_lines(program_id.get_attribute('ROUTINE_ICODE').get_root(), last_line, line_delta)
+        self.shift_routines(program_id, routine_id, block_start, block_end, delta, last_line, line_delta)
+
+        diagnostics[insert_at:insert_at] = context.diagnostics
+        self.context.diagnostics = diagnostics
+        self.context.error_count = len(self.context.diagnostics)
+        self.source = source
+        return True
+
+    @staticmethod
+    def declared_at(routine_id):
+        """
+        ルーチンの名前が宣言された位置。FORWARDで宣言したルーチンは、本体ではなくFORWARDの宣言の位置。
+        """
+        forward = routine_id.get_attribute('ROUTINE_FORWARD')
+        if forward != None:
+            return forward
+        span = routine_id.get_attribute('ROUTINE_SPAN')
+        return span[0] if span != None else None
+
+    def has_own_lines(self, block_start, block_end):
+        """
+        ブロックの最初の行の前と、ブロックの次のToken(;)の後ろに、他のTokenが無いか。
+        相互参照の行番号には位置が無いので、ブロックの行に他のTokenがあると、そのTokenの参照と区別できない。
+        """
+        text = self.source.buffer
+        line_start = text.rfind('\n', 0, block_start) + 1
+        if text[line_start:block_start].strip() != '':
+            return False
+
+        line_end = text.find('\n', block_end)
+        if line_end < 0:
+            line_end = len(text)
+        rest = text[block_end:line_end].strip()
+        if rest.startswith(';'):
+            rest = rest[1:].strip()
+        return rest == '' or rest.startswith('//')
+
+    def collect_symtabs(self, routine_id, skip_id, block_start, symtabs):
+        """
+        skip_idと、skip_idより前で終わるルーチン以外の、ルーチンの記号表を集める。
+        """
+        for sub_id in routine_id.get_attribute('ROUTINE_ROUTINES') or []:
+            span = sub_id.get_attribute('ROUTINE_SPAN')
+            if sub_id is skip_id or (span != None and span[2] <= block_start):
+                continue
+            symtabs.append(sub_id.get_attribute('ROUTINE_SYMTAB'))
+            self.collect_symtabs(sub_id, skip_id, block_start, symtabs)
+
+    @staticmethod
+    def with_record_symtabs(symtabs, seen):
+        """
+        symtabsと、その中の型が持つRECORDの記号表を、seenに無いものだけ順に返す。
+        """
+        pending = list(symtabs)
+        while pending:
+            symtab = pending.pop()
+            if symtab == None or id(symtab) in seen:
+                continue
+            seen.add(id(symtab))
+            yield symtab
+
+            for entry in symtab.map.values():
+                typespec = entry.get_typespec()
+                while typespec != None and typespec.get_form() == TypeForm.ARRAY:
+                    typespec = typespec.get_attribute('ARRAY_ELEMENT_TYPE')
+                if typespec != None and typespec.get_form() == TypeForm.RECORD:
+                    pending.append(typespec.get_attribute('RECORD_SYMTAB'))
+
+    def shift_routines(self, routine_id, skip_id, block_start, block_end, delta, last_line, line_delta):
+        """
+        編集したブロックより後ろにあるルーチンのROUTINE_SPANとROUTINE_FORWARDをdeltaだけ、iCodeのLINEをline_deltaだけずらす。
+        編集したルーチンを含むルーチンは、ROUTINE_SPANの終わりだけをずらす。
+        """
+        for sub_id in routine_id.get_attribute('ROUTINE_ROUTINES') or []:
+            if sub_id is skip_id:
+                continue
+            span = sub_id.get_attribute('ROUTINE_SPAN')
+            if span != None:
+                if span[2] <= block_start:
+                    continue
+                if span[0] >= block_end:
+                    sub_id.set_attribute('ROUTINE_SPAN', (span[0] + delta, span[1] + delta, span[2] + delta))
+                else:
+                    sub_id.set_attribute('ROUTINE_SPAN', (span[0], span[1], span[2] + delta))
+            forward = sub_id.get_attribute('ROUTINE_FORWARD')
+            if forward != None and forward >= block_end:
+                sub_id.set_attribute('ROUTINE_FORWARD', forward + delta)
+            if line_delta != 0:
+                self.shift_lines(sub_id.get_attribute('ROUTINE_ICODE').get_root(), last_line, line_delta)
+            self.shift_routines(sub_id, skip_id, block_start, block_end, delta, last_line, line_delta)
+
+    @staticmethod
+    def shift_lines(node, last_line, line_delta):
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            if node == None:
+                continue
+            line = node.line
+            if line != None and line > last_line:
+                node.line = line + line_delta
+            pending.extend(node.children)
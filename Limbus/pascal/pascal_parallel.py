@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+プログラム直下の手続きと関数のブロックを、複数のプロセスで構文解析する。
+
+1段階目はプログラム全体を構文解析するが、プログラム直下のルーチンのブロックはTokenを読んで飛ばすだけにし、
+ヘッダ(名前、引数、関数の型)とブロックの位置(ROUTINE_SPAN)だけを記号表に入れる。
+2段階目はブロックをいくつかにまとめてworkerのプロセスに渡し、iCodeの木と局所の記号表を作ってもらって、
+1段階目の記号表に継ぎ足す。
+
+workerも同じソースで1段階目をやり直して同じ記号表を作る(ブロックの位置を渡すので、ブロックは読まずに飛ばす)。
+workerから返すオブジェクトのうち1段階目の記号表から辿れるものは、両方のプロセスで同じ順に辿った時の番号に
+置き換えて送り、受け取った側で自分の記号表のオブジェクトに戻す。
+"""
+import concurrent.futures
+import io
+import os
+import pickle
+import sys
+
+from limbus_core.context import CompilationContext, ProcessingAborted
+from limbus_core.frontend.source import BufferedSource
+from limbus_core.intermidiate.symtabstack_impl import SymTab, SymTabEntry, SymTabStack
+from limbus_core.intermidiate.type_impl import Predefined, TypeSpec
+from pascal.pascal_parser import PascalParserTD, BlockParser
+
+# 1段階目の記号表から辿れるオブジェクトのうち、番号で送るもの
+SHARED_CLASSES = (SymTabEntry, SymTab, TypeSpec)
+
+
+class ParallelPascalParser(PascalParserTD):
+    """
+    2段階でプログラムを構文解析するParser。結果はPascalParserTDと同じ記号表とiCodeになる。
+
+    workersが1か、ソースがBufferedSourceでない時は、PascalParserTDと同じく1回で構文解析する。
+    プログラム直下のブロックが2つより少ない時は、workerを使わずにこのプロセスでブロックを構文解析する。
+    どちらかの段階でエラーがあった時と、ブロックが1段階目で見つけた所で終わらなかった時は、
+    エラーのメッセージと数をPascalParserTDと同じにするため、初めから1回で構文解析し直す。
+    """
+    def __init__(self, scanner, context=None, workers=None):
+        super().__init__(scanner, context)
+        if workers == None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+
+    def parse(self):
+        source = self.scanner.source
+        if self.workers > 1 and isinstance(source, BufferedSource) and self.parse_in_parallel(source.buffer):
+            return
+        super().parse()
+
+    def parse_in_parallel(self, text):
+        scanner_class = type(self.scanner)
+        skeleton = parse_skeleton(text, scanner_class)
+        if skeleton == None:
+            return False
+        routine_ids = skeleton.get_program_id().get_attribute('ROUTINE_ROUTINES')
+        indexes = [i for i, routine_id in enumerate(routine_ids)
+                   if routine_id.get_attribute('ROUTINE_ICODE').get_root() == None and
+                   routine_id.get_attribute('ROUTINE_SPAN') != None]
+
+        shared = shared_objects(skeleton)
+        if len(indexes) < 2:
+            if indexes and parse_blocks(text, scanner_class, skeleton, indexes) == None:
+                return False
+        else:
+            chunks = split_chunks(routine_ids, indexes, self.workers)
+            # workerにはプログラムの本体のiCodeは要らない。定義済みの型は、workerのプロセスの型にする。
+            program_icode = skeleton.get_program_id().get_attribute('ROUTINE_ICODE')
+            root_node = program_icode.get_root()
+            program_icode.set_root(None)
+            try:
+                data = dumps_shared((skeleton, shared), shared[:len(Predefined.TYPE_NAMES)])
+            finally:
+                program_icode.set_root(root_node)
+            with concurrent.futures.ProcessPoolExecutor(max_workers=len(chunks), initializer=_init_worker,
+                                                        initargs=(text, scanner_class, data)) as executor:
+                for blocks in executor.map(_parse_blocks, chunks):
+                    if blocks == None:
+                        return False
+                    merge_blocks(skeleton, shared, blocks)
+        sort_line_numbers(shared)
+
+        self.symtab_stack = self.context.symtab_stack = skeleton
+        # 1回で構文解析した時と同じく、ソースを最後まで読んだことにする(ソースの行のMessageを送る)
+        self.scanner.seek(len(text))
+        return True
+
+
+def parse_skeleton(text, scanner_class):
+    """
+    1段階目の構文解析。記号表のstackを返す。エラーがあった時はNone。
+    """
+    context = CompilationContext(collect_errors=True, max_errors=0)
+    context.skip_routine_blocks = True
+    parser = PascalParserTD(scanner_class(BufferedSource(io.StringIO(text))), context)
+    parser.parse()
+    if context.error_count != 0 or context.symtab_stack.get_program_id() == None:
+        return None
+    return context.symtab_stack
+
+
+def split_chunks(routine_ids, indexes, count):
+    """
+    ブロックをソースの順に、大きさがだいたい同じになるようにcount個までにまとめる。
+    """
+    indexes = sorted(indexes, key=lambda i: routine_ids[i].get_attribute('ROUTINE_SPAN')[1])
+    sizes = [routine_ids[i].get_attribute('ROUTINE_SPAN')[2] - routine_ids[i].get_attribute('ROUTINE_SPAN')[1]
+             for i in indexes]
+    limit = sum(sizes) / count
+    chunks = [[]]
+    size = 0
+    for i, block_size in zip(indexes, sizes):
+        if size >= limit:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(i)
+        size += block_size
+    return chunks
+
+
+def shared_objects(symtab_stack):
+    """
+    1段階目の記号表から辿れるSHARED_CLASSESのオブジェクトのリスト。定義済みの型が先頭に来る。
+    定義済みの型はプロセスで最初に構文解析した時の記号表を指しているので、その先は辿らない。
+    iCodeの木はworkerから送り返さないので、その中も辿らない。
+    """
+    objects = [getattr(Predefined, name) for name in Predefined.TYPE_NAMES]
+    seen = set(id(obj) for obj in objects)
+    pending = [symtab_stack.get_local_symtab(), symtab_stack.get_program_id()]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, SHARED_CLASSES):
+            objects.append(obj)
+            pending.extend(reversed(list(vars(obj).values())))
+        elif isinstance(obj, (list, tuple)):
+            pending.extend(reversed(obj))
+        elif isinstance(obj, dict):
+            for key, value in reversed(list(obj.items())):
+                pending.append(value)
+                pending.append(key)
+    return objects
+
+
+class SharedPickler(pickle.Pickler):
+    """
+    sharedのオブジェクトを、sharedの中の番号にしてpickleする。
+    """
+    def __init__(self, file, numbers):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.numbers = numbers
+
+    def persistent_id(self, obj):
+        return self.numbers.get(id(obj))
+
+
+class SharedUnpickler(pickle.Unpickler):
+    def __init__(self, file, shared):
+        super().__init__(file)
+        self.shared = shared
+
+    def persistent_load(self, number):
+        return self.shared[number]
+
+
+def dumps_shared(obj, shared):
+    data = io.BytesIO()
+    SharedPickler(data, dict((id(shared_obj), number) for number, shared_obj in enumerate(shared))).dump(obj)
+    return data.getvalue()
+
+
+def loads_shared(data, shared):
+    return SharedUnpickler(io.BytesIO(data), shared).load()
+
+
+def parse_blocks(text, scanner_class, symtab_stack, indexes):
+    """
+    1段階目の記号表で、indexesのルーチンのブロックを構文解析する。
+    ブロックのiCodeの木と局所の識別子は、記号表のルーチンに直接入る。
+    ブロックごとの(番号, iCodeの木の根, 局所の識別子, 入れ子のルーチン)のリストを返す。エラーがあった時はNone。
+    """
+    program_id = symtab_stack.get_program_id()
+    program_symtab = program_id.get_attribute('ROUTINE_SYMTAB')
+    routine_ids = program_id.get_attribute('ROUTINE_ROUTINES')
+
+    context = CompilationContext(collect_errors=True, max_errors=0)
+    context.symtab_stack = symtab_stack
+    parser = PascalParserTD(scanner_class(BufferedSource(io.StringIO(text))), context)
+    block_parser = parser.get_parser(BlockParser)
+
+    # 後ろで宣言されたルーチンは、1回で構文解析する時と同じく見えないようにする。
+    # 宣言の順にブロックを構文解析し、そのルーチンまでを見えるようにしていく。
+    indexes = sorted(indexes)
+    program_map = program_symtab.map
+    program_symtab.map = dict(program_map)
+    for routine_id in routine_ids[indexes[0] + 1:]:
+        if program_symtab.map.get(routine_id.get_name()) is routine_id:
+            del program_symtab.map[routine_id.get_name()]
+    visible = indexes[0]
+
+    blocks = []
+    symtab_stack.push(program_symtab)
+    try:
+        for i in indexes:
+            for routine_id in routine_ids[visible + 1:i + 1]:
+                program_symtab.map[routine_id.get_name()] = routine_id
+            visible = i
+
+            routine_id = routine_ids[i]
+            routine_start, block_start, block_end = routine_id.get_attribute('ROUTINE_SPAN')
+            symtab = routine_id.get_attribute('ROUTINE_SYMTAB')
+            parms = len(symtab.map)
+
+            symtab_stack.push(symtab)
+            try:
+                parser.scanner.seek(block_start)
+                root_node = block_parser.parse(parser.next_token(), routine_id)
+            except ProcessingAborted:
+                return None
+            finally:
+                symtab_stack.pop()
+            if context.error_count != 0 or parser.get_token_offset(parser.current_token()) != block_end:
+                return None
+            routine_id.get_attribute('ROUTINE_ICODE').set_root(root_node)
+
+            # 1段階目の記号表には引数だけが入っているので、その後ろに入った局所の識別子
+            local_entries = list(symtab.map.items())[parms:]
+            blocks.append((i, root_node, local_entries, routine_id.get_attribute('ROUTINE_ROUTINES')))
+    finally:
+        symtab_stack.pop()
+        program_symtab.map = program_map
+    return blocks
+
+
+def merge_blocks(symtab_stack, shared, data):
+    """
+    workerが構文解析したブロックを、1段階目の記号表に継ぎ足す。
+    """
+    blocks, line_numbers = loads_shared(data, shared)
+    routine_ids = symtab_stack.get_program_id().get_attribute('ROUTINE_ROUTINES')
+    for i, root_node, entries, subroutines in blocks:
+        routine_id = routine_ids[i]
+        routine_id.get_attribute('ROUTINE_ICODE').set_root(root_node)
+        routine_id.get_attribute('ROUTINE_SYMTAB').map.update(entries)
+        routine_id.get_attribute('ROUTINE_ROUTINES').extend(subroutines)
+    for entry, numbers in line_numbers:
+        entry.line_numbers.extend(numbers)
+
+
+def sort_line_numbers(shared):
+    """
+    1段階目の本体の参照と、ブロックの中の参照の行番号を、1回で構文解析した時と同じ順に並べる。
+    """
+    for entry in shared:
+        if isinstance(entry, SymTabEntry):
+            entry.line_numbers.sort()
+
+
+# workerプロセスごとの、ソースと1段階目の記号表
+_worker = None
+
+
+def _init_worker(text, scanner_class, data):
+    global _worker
+    # 深い入れ子の文の構文解析と、その木のpickleは再帰が深くなる
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    # 定義済みの型はこのプロセスのものを使う
+    Predefined().initialize(SymTabStack())
+    types = [getattr(Predefined, name) for name in Predefined.TYPE_NAMES]
+    symtab_stack, shared = loads_shared(data, types)
+    _worker = (text, scanner_class, symtab_stack, shared,
+               dict((id(obj), number) for number, obj in enumerate(shared)))
+
+
+def _parse_blocks(indexes):
+    """
+    indexesのルーチンのブロックを構文解析し、結果をpickleしたbytesを返す。エラーがあった時はNone。
+    """
+    text, scanner_class, symtab_stack, shared, numbers = _worker
+    entries = [obj for obj in shared if isinstance(obj, SymTabEntry)]
+    counts = [len(entry.line_numbers) for entry in entries]
+
+    blocks = parse_blocks(text, scanner_class, symtab_stack, indexes)
+    if blocks == None:
+        return None
+
+    # 1段階目の記号表の識別子に足された行番号
+    line_numbers = [(entry, entry.line_numbers[count:])
+                    for entry, count in zip(entries, counts) if len(entry.line_numbers) != count]
+
+    data = io.BytesIO()
+    SharedPickler(data, numbers).dump((blocks, line_numbers))
+    return data.getvalue()
@@ -3,7 +3,9 @@ import sys
 import copy
 
 from limbus_core.message import Message, MessageType ,MessageListener
+from limbus_core.context import Diagnostic, ProcessingAborted
 from limbus_core.frontend.parser import Parser
+from limbus_core.frontend.source import BufferedSource
 from limbus_core.intermidiate.iCode_factory import iCodeFactory, iCodeNodeFactory
 from limbus_core.intermidiate.iCode_if import iCodeNodeType
 from limbus_core.intermidiate.type_impl import Predefined, Definition, TypeSpec, TypeForm
@@ -12,22 +14,24 @@ from limbus_core.intermidiate.type_checker import TypeChecker
 
 from pascal.pascal_error import PascalErrorType, PascalError
 from pascal.pascal_token import *
+import pascal.pascal_grammar_sets as grammar
 from pascal.pascal_parser import *
 
 class PascalErrorHandler:
-    error_cnt = 0
-    MAX_ERROR = 5
-
-    def __init__(self):
-        pass
+    def __init__(self, context):
+        # エラーはコンパイルのContextに集める
+        self.context = context
 
     def flag(self, token, error_code, parser):
         line = parser.get_line()
         msg = Message(MessageType.SYNTAX_ERROR, (token, error_code, line))
         parser.send_message(msg)
 
-        PascalErrorHandler.error_cnt = PascalErrorHandler.error_cnt + 1
-        if PascalErrorHandler.error_cnt > PascalErrorHandler.MAX_ERROR:
+        context = self.context
+        context.diagnostics.append(Diagnostic(error_code, getattr(token, 'line_num', None),
+                                              getattr(token, 'pos', None), getattr(token, 'text', None)))
+        context.error_count = context.error_count + 1
+        if context.error_count > context.max_errors:
             self.abort_translation('TOO_MANY_ERRORS', parser)
 
     def abort_translation(self, err_code, parser):
@@ -36,37 +40,66 @@ class PascalErrorHandler:
         line = parser.get_line()
         msg = Message(MessageType.SYNTAX_ERROR, (token, err_code, line))
 
+        self.context.aborted = err_code
+        if self.context.collect_errors:
+            raise ProcessingAborted(err_code)
         sys.exit(1)
 
     def get_error_count(self):
-        return self.error_cnt
+        return self.context.error_count
 
 
 # -------------- Parser --------------------------
 class PascalParserTD(Parser):
-    def __init__(self, scanner):
-        self.error_handler = PascalErrorHandler()
+    def __init__(self, scanner, context=None):
         self.routine_id = None
-        self.predefined = Predefined()
         if isinstance(scanner, Parser):
-            super().__init__(scanner.get_scanner())
+            # 構文ごとの子のParserは、親とscanner、コンパイルのContext、error handler、Messageの送り先、子のParserの表を共有する
+            parent = scanner
+            self.symTab = None
+            self.scanner = parent.get_scanner()
+            self.message_handler = parent.message_handler
+            self.context = parent.context
+            self.symtab_stack = parent.symtab_stack
+            self.iCode = parent.iCode
+            self.error_handler = parent.error_handler
+            self.predefined = parent.predefined
+            self.parsers = parent.parsers
         else:
-            super().__init__(scanner)
+            super().__init__(scanner, context)
+            self.error_handler = PascalErrorHandler(self.context)
+            self.predefined = self.context.predefined
+            self.parsers = {}
 
     def get_routine_id(self):
         return self.routine_id
 
+    def get_parser(self, parser_class):
+        """
+        parser_classの子のParser。状態を持たないParserは1回のコンパイルで1つだけ作り、使い回す。
+        状態を持つVariableDeclarationsParserとDeclaredRoutineParserは、使う所で毎回作る。
+        """
+        parser = self.parsers.get(parser_class)
+        if parser == None:
+            parser = parser_class(self)
+            self.parsers[parser_class] = parser
+        return parser
+
     def parse(self):
         from pascal.pascal_parser_routine import ProgramParser
-        Predefined().initialize(Parser.symtab_stack)
+        self.predefined.initialize(self.symtab_stack)
         try:
-            token = self.next_token()
-            program_parser = ProgramParser(self)
-            program_parser.parse(token, None)
-            token = self.current_token()
+            try:
+                token = self.next_token()
+                program_parser = self.get_parser(ProgramParser)
+                program_parser.parse(token, None)
+                token = self.current_token()
 
-        except FileNotFoundError:
-            self.error_handler.abort_translation('IO_ERROR', self)
+            except FileNotFoundError:
+                self.error_handler.abort_translation('IO_ERROR', self)
+        except ProcessingAborted:
+            # エラーを集めるモードで打ち切った時は、集めたエラーをContextに残して戻る
+            pass
 
     def get_error_count(self):
         return self.error_handler.get_error_count()
@@ -80,7 +113,18 @@ class PascalParserTD(Parser):
     def get_line(self):
         return self.scanner.source.line
 
-    def synchronize(self, syncset, ptt_set=[]):
+    def get_token_offset(self, token):
+        """
+        tokenのソースの先頭からの位置。ソースがBufferedSourceでない時はNone。
+        """
+        source = self.scanner.source
+        if not isinstance(source, BufferedSource):
+            return None
+        if token.type == TokenType.EOF:
+            return len(source.buffer)
+        return source.line_starts[token.line_num - 1] + token.pos
+
+    def synchronize(self, syncset, ptt_set=grammar.EMPTY_SET):
         token = self.current_token()
 
         if token.type == TokenType.EOF:
@@ -97,8 +141,13 @@ class PascalParserTD(Parser):
         if not sync:
             self.error_handler.flag(token, 'UNEXPECTED_TOKEN', self)
 
+            context = self.context
             token = self.next_token()
             while (token.type != TokenType.EOF) and (not token.value in syncset):
+                # 読み飛ばすTokenの数に上限がある時は、超えた所でコンパイルを打ち切る
+                context.skipped_tokens += 1
+                if context.max_skipped_tokens != None and context.skipped_tokens > context.max_skipped_tokens:
+                    self.error_handler.abort_translation('TOO_MANY_ERRORS', self)
                 token = self.next_token()
 
         return token
@@ -109,8 +158,8 @@ class BlockParser(PascalParserTD):
         super().__init__(parent)
 
     def parse(self, token, routine_id):
-        declaration_parser = DeclarationsParser(self)
-        statement_parser = StatementParser(self)
+        declaration_parser = self.get_parser(DeclarationsParser)
+        statement_parser = self.get_parser(StatementParser)
 
         declaration_parser.parse(token, routine_id)
 
@@ -125,20 +174,17 @@ class BlockParser(PascalParserTD):
         else:
             self.error_handler.flag(token, 'MISSING_BEGIN', self)
             if token.value in StatementParser.STMT_START_SET:
-                root_node = iCodeNodeFactory().create('COMPOUND')
+                root_node = iCodeNodeFactory().create(iCodeNodeType.COMPOUND)
                 statement_parser.parse_list(token, root_node, 'END', 'MISSING_END')
 
         return root_node
 
 
 class DeclarationsParser(PascalParserTD):
-    DECLARATION_START_SET = ['CONST', 'TYPE', 'VAR', 'PROCEDURE', 'FUNCTION', 'BEGIN']
-    TYPE_START_SET = copy.deepcopy(DECLARATION_START_SET)
-    TYPE_START_SET.remove('CONST')
-    VAR_START_SET = copy.deepcopy(TYPE_START_SET)
-    VAR_START_SET.remove('TYPE')
-    ROUTINE_START_SET = copy.deepcopy(VAR_START_SET)
-    ROUTINE_START_SET.remove('VAR')
+    DECLARATION_START_SET = grammar.DECLARATION_START_SET
+    TYPE_START_SET = grammar.DECLARATION_TYPE_START_SET
+    VAR_START_SET = grammar.DECLARATION_VAR_START_SET
+    ROUTINE_START_SET = grammar.DECLARATION_ROUTINE_START_SET
 
     def __init__(self, parent):
         super().__init__(parent)
@@ -149,13 +195,13 @@ class DeclarationsParser(PascalParserTD):
         token = self.synchronize(DeclarationsParser.DECLARATION_START_SET)
         if token.ptype == PTT.RESERVED and token.value == 'CONST':
             token = self.next_token()
-            constant_definition_parser = ConstantDefinitionsParser(self)
+            constant_definition_parser = self.get_parser(ConstantDefinitionsParser)
             constant_definition_parser.parse(token, None)
 
         token = self.synchronize(self.TYPE_START_SET)
         if token.ptype == PTT.RESERVED and token.value == 'TYPE':
             token = self.next_token()
-            type_defination_parser = TypeDefinitionsParser(self)
+            type_defination_parser = self.get_parser(TypeDefinitionsParser)
             type_defination_parser.parse(token, None)
 
         token = self.synchronize(self.VAR_START_SET)
@@ -185,8 +231,8 @@ class DeclarationsParser(PascalParserTD):
         return None
 
 class StatementParser(PascalParserTD):
-    STMT_START_SET = ['BEGIN', 'CASE', 'FOR', 'IF', 'REPEAT', 'WHILE', 'IDENTIFIER', 'SEMICOLON']
-    STMT_FOLLOW_SET = ['SEMICOLON', 'END', 'ELSE', 'UNTIL', 'DOT']
+    STMT_START_SET = grammar.STMT_START_SET
+    STMT_FOLLOW_SET = grammar.STMT_FOLLOW_SET
 
     def __init__(self, parent):
         super().__init__(parent)
@@ -195,11 +241,11 @@ class StatementParser(PascalParserTD):
         from pascal.pascal_parser_routine import CallParser
 
         if token.ptype == PTT.RESERVED and  token.value == 'BEGIN':
-            statement_node = CompoundStatementParser(self).parse(token)
+            statement_node = self.get_parser(CompoundStatementParser).parse(token)
         elif token.ptype == PTT.IDENTIFIER:
             # statement_node = AssignmentStatementParser(self).parse(token)
             name = token.value.lower()
-            id = Parser.symtab_stack.lookup(name)
+            id = self.symtab_stack.lookup(name)
             if id:
                 id_defn = id.get_definition()
             else:
@@ -207,34 +253,34 @@ class StatementParser(PascalParserTD):
 
             if id_defn == Definition.VARIABLE or id_defn == Definition.VALUE_PARM or id_defn == Definition.VAR_PARM \
                     or id_defn == Definition.UNDEFINED:
-                assignment_parser = AssignmentStatementParser(self)
+                assignment_parser = self.get_parser(AssignmentStatementParser)
                 statement_node = assignment_parser.parse(token)
             elif id_defn == Definition.FUNCTION:
-                assignment_parser = AssignmentStatementParser(self)
+                assignment_parser = self.get_parser(AssignmentStatementParser)
                 statement_node = assignment_parser.parse_function_name_assignment(token)
             elif id_defn == Definition.PROCEDURE:
-                call_parser = CallParser(self)
+                call_parser = self.get_parser(CallParser)
                 statement_node = call_parser.parse(token)
             else:
                 self.error_handler.flag(token, 'UNEXPECTED_TOKEN', self)
                 token = self.next_token()
         elif token.ptype == PTT.RESERVED and  token.value == 'REPEAT':
-            statement_node = RepeatStatementParser(self).parse(token)
+            statement_node = self.get_parser(RepeatStatementParser).parse(token)
         elif token.ptype == PTT.RESERVED and  token.value == 'WHILE':
-            statement_node = WhileStatementParser(self).parse(token)
+            statement_node = self.get_parser(WhileStatementParser).parse(token)
         elif token.ptype == PTT.RESERVED and  token.value == 'FOR':
-            statement_node = ForStatementParser(self).parse(token)
+            statement_node = self.get_parser(ForStatementParser).parse(token)
         elif token.ptype == PTT.RESERVED and  token.value == 'IF':
-            statement_node = IfStatementParser(self).parse(token)
+            statement_node = self.get_parser(IfStatementParser).parse(token)
         elif token.ptype == PTT.RESERVED and  token.value == 'CASE':
-            statement_node = CaseStatementParser(self).parse(token)
+            statement_node = self.get_parser(CaseStatementParser).parse(token)
         else:
-            statement_node = iCodeNodeFactory().create('NO_OP')
+            statement_node = iCodeNodeFactory().create(iCodeNodeType.NO_OP)
         set_line_number(statement_node, token)
         return statement_node
 
     def parse_list(self, token, parent_node, terminator, err_code):
-        terminator_set = StatementParser.STMT_START_SET + [terminator]
+        terminator_set = grammar.statement_list_set(terminator)
 
         while token.type != TokenType.EOF and token.value != terminator:
             statement_node = self.parse(token)
@@ -260,42 +306,40 @@ class StatementParser(PascalParserTD):
 
 
 class VariableParser(StatementParser):
-    SUBSCRIPT_FIELD_START_SET = ['LEFT_BRACKET', 'DOT']
-    RIGHT_BRACKET_SET = ['RIGHT_BRACKET', 'EQUALS', 'SEMICOLON']
+    SUBSCRIPT_FIELD_START_SET = grammar.SUBSCRIPT_FIELD_START_SET
+    RIGHT_BRACKET_SET = grammar.SUBSCRIPT_RIGHT_BRACKET_SET
 
     def __init__(self, parent):
-        self.is_function_target = False
         super().__init__(parent)
 
-    def parse(self, token):
+    def parse(self, token, is_function_target=False):
         name = token.value.lower()
-        variable_id = Parser.symtab_stack.lookup(name)
+        variable_id = self.symtab_stack.lookup(name)
 
         if not variable_id:
             self.error_handler.flag(token, 'IDENTIFIER_UNDEFINED', self)
-            variable_id = Parser.symtab_stack.enter_local(name)
+            variable_id = self.symtab_stack.enter_local(name)
             variable_id.set_definition('UNDEFINED')
             variable_id.set_typespec(Predefined.undefined_type)
 
-        return self.parse_variable_id(token, variable_id)
+        return self.parse_variable_id(token, variable_id, is_function_target)
 
     def parse_function_name_target(self, token):
-        self.is_function_target = True
-        return self.parse(token)
+        return self.parse(token, True)
 
-    def parse_variable_id(self, token, variable_id):
+    def parse_variable_id(self, token, variable_id, is_function_target=False):
 #        defn_code = variable_id.get_definition()
-        if not self.is_variable_defined(variable_id):
+        if not self.is_variable_defined(variable_id, is_function_target):
             self.error_handler.flag(token, 'INVALID_IDENTIFIER_USAGE', self)
 
         variable_id.append_line_number(token.line_num)
-        variable_node = iCodeNodeFactory().create('VARIABLE')
-        variable_node.set_attribute('ID', variable_id)
+        variable_node = iCodeNodeFactory().create(iCodeNodeType.VARIABLE)
+        variable_node.id = variable_id
         token = self.next_token()
 
         variable_type = variable_id.get_typespec()
 
-        if not self.is_function_target:
+        if not is_function_target:
             while token.value in self.SUBSCRIPT_FIELD_START_SET:
                 if token.ptype == PascalSpecialSymbol.LEFT_BRACKET:
                     sub_fld_node = self.parse_subscripts(variable_type)
@@ -310,18 +354,18 @@ class VariableParser(StatementParser):
         return variable_node
 
 
-    def is_variable_defined(self, variable_id):
+    def is_variable_defined(self, variable_id, is_function_target=False):
         defn_code = variable_id.get_definition()
         if defn_code == Definition.VARIABLE or defn_code == Definition.VAR_PARM or defn_code == Definition.VAR_PARM:
             return True
-        elif self.is_function_target and (defn_code == Definition.FUNCTION):
+        elif is_function_target and (defn_code == Definition.FUNCTION):
             return True
         else:
             return False
 
     def parse_subscripts(self, variable_type):
-        expression_parer = ExpressionParser(self)
-        subscript_node = iCodeNodeFactory().create('SUBSCRIPTS')
+        expression_parer = self.get_parser(ExpressionParser)
+        subscript_node = iCodeNodeFactory().create(iCodeNodeType.SUBSCRIPTS)
 
         first = True
         while first or token.ptype == PascalSpecialSymbol.COMMA:
@@ -358,7 +402,7 @@ class VariableParser(StatementParser):
         return subscript_node
 
     def parse_field(self, variable_type):
-        field_node = iCodeNodeFactory().create('FIELD')
+        field_node = iCodeNodeFactory().create(iCodeNodeType.FIELD)
 
         token = self.next_token()
         variable_form = variable_type.get_form()
@@ -371,7 +415,7 @@ class VariableParser(StatementParser):
             if filedid:
                 variable_type = filedid.get_typespec()
                 filedid.append_line_number(token.line_num)
-                field_node.set_attribute('ID', filedid)
+                field_node.id = filedid
             else:
                 self.error_handler.flag(token, 'INVALID_FIELD', self)
         else:
@@ -387,193 +431,171 @@ class CompoundStatementParser(StatementParser):
 
     def parse(self, token):
         token = self.next_token()
-        compound_node = iCodeNodeFactory().create('COMPOUND')
-        statement_parser = StatementParser(self)
+        compound_node = iCodeNodeFactory().create(iCodeNodeType.COMPOUND)
+        statement_parser = self.get_parser(StatementParser)
         statement_parser.parse_list(token, compound_node, 'END', 'MISSING_END')
         return compound_node
 
 
 class ExpressionParser(StatementParser):
-    EXPR_START_SET = ['PLUS', 'MINUS', 'NOT', 'LEFT_PAREN']
-    EXPR_START_SET_PTT = [PTT.IDENTIFIER, PTT.INTEGER, PTT.REAL, PTT.STRING]
+    EXPR_START_SET = grammar.EXPR_START_SET
+    EXPR_START_SET_PTT = grammar.EXPR_START_SET_PTT
+
+    OP_MAP = {'EQUALS': iCodeNodeType.EQ,
+              'NOT_EQUALS': iCodeNodeType.NE,
+              'LESS_THAN': iCodeNodeType.LT,
+              'LESS_EQUALS': iCodeNodeType.LE,
+              'GREATER_THAN': iCodeNodeType.GT,
+              'GREATER_EQUALS': iCodeNodeType.GE,
+              'PLUS': iCodeNodeType.ADD,
+              'MINUS': iCodeNodeType.SUBTRACT,
+              'OR': iCodeNodeType.OR,
+              'STAR': iCodeNodeType.MULTIPLY,
+              'SLASH': iCodeNodeType.FLOAT_DIVIDE,
+              'DIV': iCodeNodeType.INTEGER_DIVIDE,
+              'MOD': iCodeNodeType.MOD,
+              'AND': iCodeNodeType.AND
+    }
+    REL_OPS = grammar.REL_OPS
+    ADD_OPS = grammar.ADD_OPS
+    MUL_OPS = grammar.MUL_OPS
+
+    # 二項演算子の優先順位。大きいほど強く結び付く。
+    RELATIONAL = 1
+    ADDITIVE = 2
+    MULTIPLICATIVE = 3
+    PRECEDENCE = dict.fromkeys(REL_OPS, RELATIONAL)
+    PRECEDENCE.update(dict.fromkeys(ADD_OPS, ADDITIVE))
+    PRECEDENCE.update(dict.fromkeys(MUL_OPS, MULTIPLICATIVE))
+
+    node_factory = iCodeNodeFactory()
+    type_checker = TypeChecker()
 
     def __init__(self, parent):
         super().__init__(parent)
-        self.op_map =  {'EQUALS' : 'EQ',
-                        'NOT_EQUALS' : 'NE',
-                        'LESS_THAN':  'LT',
-                        'LESS_EQUALS' : 'LE',
-                        'GREATER_THAN' : 'GT',
-                        'GREATER_EQUALS' : 'GE',
-                        'PLUS' : 'ADD',
-                        'MINUS' : 'SUBTRACT',
-                        'OR' : 'OR',
-                        'STAR' : 'MULTIPLY',
-                        'SLASH' : 'FLOAT_DIVIDE',
-                        'DIV' : 'INTEGER_DIVIDE',
-                        'MOD' : 'MOD',
-                        'AND' : 'AND'
-        }
-        self.add_ops = ['PLUS', 'MINUS', 'OR']
-        self.mul_ops = ['STAR', 'SLASH', 'DIV', 'MOD', 'AND']
 
     def parse(self, token):
-        return self.parse_expression(token)
+        return self.parse_operation(token, self.RELATIONAL)
 
     def parse_expression(self, token):
-        root_node = self.parse_simple_expression(token)
-        if root_node:
-            result_type = root_node.get_typespec()
-        else:
-            result_type = Predefined.undefined_type
-
-        token = self.current_token()
-        token_type = token.value
-
-        if token_type in self.op_map:
-            node_type = self.op_map[token_type]
-            opnode = iCodeNodeFactory().create(node_type)
-            opnode.add_child(root_node)
+        return self.parse_operation(token, self.RELATIONAL)
 
-            token = self.next_token()
-            sim_expr_node = self.parse_simple_expression(token)
-            opnode.add_child(sim_expr_node)
-            root_node = opnode
-
-            if sim_expr_node:
-                sim_expr_type = sim_expr_node.get_typespec()
+    def parse_operation(self, token, level):
+        """
+        優先順位がlevel以上の二項演算子だけを取り込んで、式を解析する。
+        演算子と左のオペランドをstackに積んでおき、同じか低い優先順位の演算子が来た所で木にまとめる。
+        関係演算子は結合しないので、1つしか取り込まない。
+        符号(+, -)は、式の最初と関係演算子の右の、最初の項にだけ付けられる。
+        """
+        if level <= self.ADDITIVE and (token.value == 'PLUS' or token.value == 'MINUS'):
+            root_node = self.parse_sign(token)
+        else:
+            root_node = self.parse_factor(token)
+
+        current_token = self.scanner.current_token
+        next_token = self.scanner.next_token
+        precedence_of = self.PRECEDENCE.get
+        stack = []
+        relational = False
+
+        token = current_token()
+        precedence = precedence_of(token.value, 0)
+        while precedence >= level:
+            if precedence == self.RELATIONAL:
+                if relational:
+                    break
+                relational = True
+
+            while stack and stack[-1][0] >= precedence:
+                op_precedence, operator, left_node, op_token = stack.pop()
+                root_node = self.make_operation(operator, left_node, root_node, op_token)
+
+            operator = token.value
+            token = next_token()
+            stack.append((precedence, operator, root_node, token))
+
+            if precedence == self.RELATIONAL and (token.value == 'PLUS' or token.value == 'MINUS'):
+                root_node = self.parse_sign(token)
             else:
-                sim_expr_type = Predefined.undefined_type
+                root_node = self.parse_factor(token)
 
-            if TypeChecker().are_comparison_compatible(result_type, sim_expr_type):
-                result_type = Predefined.boolean_type
-            else:
-                self.error_handler.flag(token, 'INCOMPATIBLE_TYPES', self)
+            token = current_token()
+            precedence = precedence_of(token.value, 0)
 
-            if root_node:
-                root_node.set_typespec(result_type)
+        while stack:
+            op_precedence, operator, left_node, op_token = stack.pop()
+            root_node = self.make_operation(operator, left_node, root_node, op_token)
 
         return root_node
 
-    def parse_simple_expression(self, token):
-        sign_token = None
-        sign_type = None
-
-        token_type = token.value
-        if token_type == 'PLUS' or token_type == 'MINUS':
-            sign_type = token_type
-            sign_token = copy.copy(token)
-            token = self.next_token()
-
-        root_node = self.parse_term(token)
+    def parse_sign(self, sign_token):
+        token = self.next_token()
+        root_node = self.parse_operation(token, self.MULTIPLICATIVE)
         if root_node:
             result_type = root_node.get_typespec()
         else:
             result_type = Predefined.undefined_type
 
-        if sign_type and (not TypeChecker().is_integer_or_real(result_type)):
+        if not self.type_checker.is_integer_or_real(result_type):
             self.error_handler.flag(sign_token, 'INCOMPATIBLE_TYPES', self)
 
-        if sign_type == 'MINUS':
-            negate_node = iCodeNodeFactory().create('NEGATE')
+        if sign_token.value == 'MINUS':
+            negate_node = self.node_factory.create(iCodeNodeType.NEGATE)
             negate_node.add_child(root_node)
-            negate_node.set_typespec(root_node.get_typespec())
+            negate_node.set_typespec(result_type)
             root_node = negate_node
 
-        token = self.current_token()
-        token_type = token.value
-
-        while token_type in self.add_ops:
-            operator = token_type
-            node_type = self.op_map[operator]
-            op_node = iCodeNodeFactory().create(node_type)
-            op_node.add_child(root_node)
-
-            token = self.next_token()
-            term_node = self.parse_term(token)
-            op_node.add_child(term_node)
-
-            if term_node:
-                term_type = term_node.get_typespec()
-            else:
-                term_type = Predefined.undefined_type
-
-            root_node = op_node
-
-            if operator == 'PLUS' or operator == 'MINUS':
-                if TypeChecker().are_both_integer(result_type, term_type):
-                    result_type = Predefined.integer_type
-                elif TypeChecker().is_at_least_one_real(result_type, term_type):
-                    result_type = Predefined.real_type
-                else:
-                    self.error_handler.flag(token, 'INCOMPATIBLE_TYPES', self)
-            elif operator == 'OP':
-                if TypeChecker().are_both_boolean(result_type, term_type):
-                    result_type = Predefined.boolean_type
-                else:
-                    self.error_handler.flag(token, 'INCOMPATIBLE_TYPES', self)
-
-            root_node.set_typespec(result_type)
-
-            token = self.current_token()
-            token_type = token.value
-
         return root_node
 
-    def parse_term(self, token):
-        root_node = self.parse_factor(token)
-        if root_node:
-            result_type = root_node.get_typespec()
-        else:
-            result_type = Predefined.undefined_type
-
-        token = self.current_token()
-        token_type = token.value
-
-        while token_type in self.mul_ops:
-            operator = token_type
-            node_type = self.op_map[operator]
-            op_node = iCodeNodeFactory().create(node_type)
-            op_node.add_child(root_node)
+    def make_operation(self, operator, left_node, right_node, token):
+        """
+        二項演算のNodeを作り、結果の型を付ける。
+        オペランドの型が合わない時はエラーにして、左のオペランドの型を結果の型にする。
+        tokenは右のオペランドの最初のTokenで、エラーの位置に使う。
+        """
+        op_node = self.node_factory.create(self.OP_MAP[operator])
+        op_node.add_child(left_node)
+        op_node.add_child(right_node)
 
-            token = self.next_token()
-            factor_node = self.parse_factor(token)
-            op_node.add_child(factor_node)
-            if factor_node:
-                factor_type = factor_node.get_typespec()
+        if left_node:
+            left_type = left_node.get_typespec()
+        else:
+            left_type = Predefined.undefined_type
+        if right_node:
+            right_type = right_node.get_typespec()
+        else:
+            right_type = Predefined.undefined_type
+
+        checker = self.type_checker
+        result_type = left_type
+        if operator == 'PLUS' or operator == 'MINUS':
+            if checker.are_both_integer(left_type, right_type):
+                result_type = Predefined.integer_type
+            elif checker.is_at_least_one_real(left_type, right_type):
+                result_type = Predefined.real_type
             else:
-                factor_type = Predefined.undefined_type
-
-            root_node = op_node
-
-            if operator == 'START':
-                if TypeChecker().are_both_integer(result_type, factor_type):
-                    result_type = Predefined.undefined_type
-                elif TypeChecker().is_at_least_one_real(result_type, factor_type):
-                    result_type = Predefined.real_type
-                else:
-                    self.error_handler.flag(self, 'INCOMPATIBLE_TYPES', self)
-            elif operator == 'SLASH':
-                if TypeChecker().are_both_integer(result_type, factor_type):
-                    result_type = Predefined.real_type
-                else:
-                    self.error_handler.flag(self, 'INCOMPATIBLE_TYPES', self)
-            elif operator == 'DIV' or operator == 'MOD':
-                if TypeChecker().are_both_integer(result_type, factor_type):
-                    result_type = Predefined.real_type
-                else:
-                    self.error_handler.flag(token, 'INCOMPATIBLE_TYPES', self)
-            elif operator == 'AND':
-                if TypeChecker().are_both_boolean(result_type, factor_type):
-                    result_type = Predefined.boolean_type
-                else:
-                    self.error_handler(token,  'INCOMPATIBLE_TYPES', self)
-
-            root_node.set_typespec(result_type)
-            token = self.current_token()
-            token_type = token.value
+                self.error_handler.flag(token, 'INCOMPATIBLE_TYPES', self)
+        elif operator == 'STAR' or operator == 'OR':
+            # 型を検査せず、左のオペランドの型のままにする
+            pass
+        elif operator in self.REL_OPS:
+            if checker.are_comparison_compatible(left_type, right_type):
+                result_type = Predefined.boolean_type
+            else:
+                self.error_handler.flag(token, 'INCOMPATIBLE_TYPES', self)
+        elif operator == 'SLASH' or operator == 'DIV' or operator == 'MOD':
+            if checker.are_both_integer(left_type, right_type):
+                result_type = Predefined.real_type
+            else:
+                self.error_handler.flag(token, 'INCOMPATIBLE_TYPES', self)
+        elif operator == 'AND':
+            if checker.are_both_boolean(left_type, right_type):
+                result_type = Predefined.boolean_type
+            else:
+                self.error_handler.flag(token, 'INCOMPATIBLE_TYPES', self)
 
-        return root_node
+        op_node.set_typespec(result_type)
+        return op_node
 
     def parse_factor(self, token):
         ptype = token.ptype
@@ -581,20 +603,20 @@ class ExpressionParser(StatementParser):
         if ptype == PTT.IDENTIFIER:
             return self.parse_identifier(token)
         elif ptype == PTT.INTEGER:
-            root_node = iCodeNodeFactory().create('INTEGER_CONSTANT')
-            root_node.set_attribute('VALUE', token.value)
+            root_node = iCodeNodeFactory().create(iCodeNodeType.INTEGER_CONSTANT)
+            root_node.value = token.value
             root_node.set_typespec(Predefined.integer_type)
             token = self.next_token()
 
         elif ptype == PTT.REAL:
-            root_node = iCodeNodeFactory().create('REAL_CONSTANT')
-            root_node.set_attribute('VALUE', token.value)
+            root_node = iCodeNodeFactory().create(iCodeNodeType.REAL_CONSTANT)
+            root_node.value = token.value
             root_node.set_typespec(Predefined.real_type)
             token = self.next_token()
 
         elif ptype == PTT.STRING:
-            root_node = iCodeNodeFactory().create('STRING_CONSTANT')
-            root_node.set_attribute('VALUE', token.value)
+            root_node = iCodeNodeFactory().create(iCodeNodeType.STRING_CONSTANT)
+            root_node.value = token.value
             if len(token.value) == 1:
                 result_type = Predefined.char_type
             else:
@@ -604,16 +626,16 @@ class ExpressionParser(StatementParser):
 
         elif token.value == 'NOT':
             token = self.next_token()
-            root_node = iCodeNodeFactory().create('NOT')
-            factor_node = self.parser_factor(token)
-            root_node.set_attributes(factor_node)
+            root_node = iCodeNodeFactory().create(iCodeNodeType.NOT)
+            factor_node = self.parse_factor(token)
+            root_node.add_child(factor_node)
             if factor_node:
                 factor_type = factor_node.get_typespec()
             else:
                 factor_type = Predefined.undefined_type
 
             if not TypeChecker().is_bool(factor_type):
-                self.error_handler(token, 'INCOMPATIBLE_TYPES', self)
+                self.error_handler.flag(token, 'INCOMPATIBLE_TYPES', self)
             root_node.set_typespec(Predefined.boolean_type)
 
         elif token.value == 'LEFT_PAREN':
@@ -637,17 +659,13 @@ class ExpressionParser(StatementParser):
         return root_node
 
     def parse_identifier(self, token):
-
-        from pascal.pascal_parser_routine import CallParser
-
-
         root_node = None
         name = token.value.lower()
-        id = Parser.symtab_stack.lookup(name)
+        id = self.symtab_stack.lookup(name)
 
         if not id:
             self.error_handler.flag(token, 'IDENTIFIER_UNDEFINED', self)
-            id = Parser.symtab_stack.enter_local(name)
+            id = self.symtab_stack.enter_local(name)
             id.set_definition(Definition.UNDEFINED)
             id.set_typespec(Predefined.undefined_type)
 
@@ -658,14 +676,14 @@ class ExpressionParser(StatementParser):
             type = id.get_typespec()
 
             if isinstance(value, int):
-                root_node = iCodeNodeFactory().create('INTEGER_CONSTANT')
-                root_node.set_attribute('VALUE', value)
+                root_node = iCodeNodeFactory().create(iCodeNodeType.INTEGER_CONSTANT)
+                root_node.value = value
             elif isinstance(value, float):
-                root_node = iCodeNodeFactory().create('REAL_CONSTANT')
-                root_node.set_attribute('VALUE', value)
+                root_node = iCodeNodeFactory().create(iCodeNodeType.REAL_CONSTANT)
+                root_node.value = value
             elif isinstance(value, str):
-                root_node = iCodeNodeFactory().create('STRING_CONSTANT')
-                root_node.set_attribute('VALUE', value)
+                root_node = iCodeNodeFactory().create(iCodeNodeType.STRING_CONSTANT)
+                root_node.value = value
 
             id.append_line_number(token.line_num)
             token = self.next_token()
@@ -677,35 +695,34 @@ class ExpressionParser(StatementParser):
             value = id.get_attribute('CONSTANT_VALUE')
             type = id.get_typespec()
 
-            root_node = iCodeNodeFactory().create('INTEGER_CONSTANT')
-            root_node.set_attribute('VALUE', value)
+            root_node = iCodeNodeFactory().create(iCodeNodeType.INTEGER_CONSTANT)
+            root_node.value = value
 
             id.append_line_number(token.line_num)
             token = self.next_token()
             root_node.set_typespec(type)
         elif defn_code == Definition.FUNCTION:
-            call_parser = CallParser(self)
+            from pascal.pascal_parser_routine import CallParser
+            call_parser = self.get_parser(CallParser)
             root_node = call_parser.parse(token)
         else:
-            variable_parser = VariableParser(self)
-            root_node = variable_parser.parse(token)
+            variable_parser = self.get_parser(VariableParser)
+            root_node = variable_parser.parse_variable_id(token, id)
 
         return root_node
 
 
 class AssignmentStatementParser(StatementParser):
-    COLON_EQUALS_SET = copy.deepcopy(ExpressionParser.EXPR_START_SET) + ['COLON_EQUALS'] + \
-                       copy.deepcopy(StatementParser.STMT_FOLLOW_SET)
+    COLON_EQUALS_SET = grammar.COLON_EQUALS_SET
 
     def __init__(self, parent):
-        self.is_function_target = False
         super().__init__(parent)
 
-    def parse(self, token):
-        assigin_node = iCodeNodeFactory().create('ASSIGN')
-        variable_parser = VariableParser(self)
+    def parse(self, token, is_function_target=False):
+        assigin_node = iCodeNodeFactory().create(iCodeNodeType.ASSIGN)
+        variable_parser = self.get_parser(VariableParser)
 
-        if self.is_function_target:
+        if is_function_target:
             target_node = variable_parser.parse_function_name_target(token)
         else:
             target_node = variable_parser.parse(token)
@@ -722,7 +739,7 @@ class AssignmentStatementParser(StatementParser):
         else:
             self.error_handler.flag(token, 'MISSING_COLON_EQUALS', self)
 
-        expression_parser = ExpressionParser(self)
+        expression_parser = self.get_parser(ExpressionParser)
         expr_node = expression_parser.parse(token)
         assigin_node.add_child(expr_node)
 
@@ -738,24 +755,24 @@ class AssignmentStatementParser(StatementParser):
         return assigin_node
 
     def parse_function_name_assignment(self, token):
-        self.is_function_target = True
-        return self.parse(token)
+        return self.parse(token, True)
 
 
 class CaseStatementParser(StatementParser):
+    CONSTANT_START_SET = grammar.CASE_CONSTANT_START_SET
+    CONSTANT_START_SET_PTT = grammar.CASE_CONSTANT_START_SET_PTT
+    OF_SET = grammar.CASE_OF_SET
+    COMMA_SET = grammar.CASE_COMMA_SET
+
     def __init__(self, parent):
         super().__init__(parent)
-        self.CONSTANT_START_SET = [ 'PLUS', 'MINUS']
-        self.CONSTANT_START_SET_PTT = [PTT.IDENTIFIER, PTT.INTEGER, PTT.STRING]
-        self.OF_SET = self.CONSTANT_START_SET + ['OF'] + StatementParser.STMT_FOLLOW_SET
-        self.COMMA_SET = self.CONSTANT_START_SET + ['COMMA', 'COLON'] +StatementParser.STMT_START_SET + StatementParser.STMT_FOLLOW_SET
 
     # CaseStatementParser
     def parse(self, token):
         token = self.next_token()
-        select_node = iCodeNodeFactory().create('SELECT')
+        select_node = iCodeNodeFactory().create(iCodeNodeType.SELECT)
 
-        expression_parser = ExpressionParser(self)
+        expression_parser = self.get_parser(ExpressionParser)
         expr_node = expression_parser.parse(token)
         select_node.add_child(expr_node)
         if expr_node:
@@ -772,7 +789,7 @@ class CaseStatementParser(StatementParser):
         else:
             self.error_handler.flag(token, 'MISSING_OF', self)
 
-        constain_set = []
+        constain_set = set()
         while token.type != TokenType.EOF and token.value != 'END':
             select_node.add_child(self. parse_branch(token, expr_type, constain_set))
             token = self.current_token()
@@ -780,7 +797,7 @@ class CaseStatementParser(StatementParser):
             if token_type == 'SEMICOLON':
                 token = self.next_token()
             elif token_type in self.CONSTANT_START_SET:
-                self.error_handler.flag(token, 'MISSING_SEMICOLON', this)
+                self.error_handler.flag(token, 'MISSING_SEMICOLON', self)
 
         if token.value == 'END':
             token = self.next_token()
@@ -790,8 +807,8 @@ class CaseStatementParser(StatementParser):
         return select_node
 
     def parse_branch(self, token, expr_type, constant_set):
-        branch_node = iCodeNodeFactory().create('SELECT_BRANCH')
-        constants_node = iCodeNodeFactory().create('SELECT_CONSTANTS')
+        branch_node = iCodeNodeFactory().create(iCodeNodeType.SELECT_BRANCH)
+        constants_node = iCodeNodeFactory().create(iCodeNodeType.SELECT_CONSTANTS)
         branch_node.add_child(constants_node)
 
         self.parse_constant_list(token, expr_type, constants_node, constant_set)
@@ -802,7 +819,7 @@ class CaseStatementParser(StatementParser):
         else:
             self.error_handler.flag(token, 'MISSING_COLON', self)
 
-        statement_parser = StatementParser(self)
+        statement_parser = self.get_parser(StatementParser)
         branch_node.add_child(statement_parser.parse(token))
 
         return branch_node
@@ -843,11 +860,11 @@ class CaseStatementParser(StatementParser):
             self.error_handler.flag(token, 'INVALID_CONSTANT', self)
 
         if constant_node != None:
-            value = constant_node.get_attribute('VALUE')
+            value = constant_node.value
             if value in constants_set:
                 self.error_handler.flag(token, 'CASE_CONSTANT_REUSED', self)
             else:
-                constants_set.append(value)
+                constants_set.add(value)
 
         if not TypeChecker().are_comparison_compatible(expr_type, constant_type):
             self.error_handler.flag(token, 'INCOMPATIBLE_TYPES', self)
@@ -863,10 +880,10 @@ class CaseStatementParser(StatementParser):
         const_type = None
 
         name = token.value.lower()
-        id = Parser.symtab_stack.lookup(name)
+        id = self.symtab_stack.lookup(name)
 
         if not id:
-            id = Parser.symtab_stack.enter_local(name)
+            id = self.symtab_stack.enter_local(name)
             id.set_definition(Definition.UNDEFINED)
             id.set_typespec(Predefined.undefined_type)
             self.error_handler.flag(token, 'IDENTIFIER_UNDEFINED', self)
@@ -880,8 +897,8 @@ class CaseStatementParser(StatementParser):
             if sign and (not TypeChecker().is_integer(const_type)):
                 self.error_handler.flag(token, 'INVALID_CONSTANT', self)
 
-            const_node = iCodeNodeFactory().create('INTEGER_CONSTANT')
-            const_node.set_attribute('VALUE', const_value)
+            const_node = iCodeNodeFactory().create(iCodeNodeType.INTEGER_CONSTANT)
+            const_node.value = const_value
 
         id.append_line_number(token.line_num)
         if const_node:
@@ -890,12 +907,12 @@ class CaseStatementParser(StatementParser):
         return const_node
 
     def parse_integer_constant(self, value, sign):
-        constant_node = iCodeNodeFactory().create('INTEGER_CONSTANT')
+        constant_node = iCodeNodeFactory().create(iCodeNodeType.INTEGER_CONSTANT)
         int_value = int(value)
         if sign == 'MINUS':
             int_value = -int_value
 
-        constant_node.set_attribute('VALUE', int_value)
+        constant_node.value = int_value
         return constant_node
 
     def parse_character_constant(self, token, value, sign):
@@ -905,8 +922,8 @@ class CaseStatementParser(StatementParser):
             self.error_handler.flag(token, 'INVALID_CONSTANT', self)
         else:
             if len(value) == 1:
-                constant_node = iCodeNodeFactory().create('STRING_CONSTANT')
-                constant_node.set_attribute('VALUE', value)
+                constant_node = iCodeNodeFactory().create(iCodeNodeType.STRING_CONSTANT)
+                constant_node.value = value
             else:
                 self.error_handler.flag(token, 'STRING_CONSTANT', self)
 
@@ -914,9 +931,9 @@ class CaseStatementParser(StatementParser):
 
 
 class ForStatementParser(StatementParser):
-    TO_DOWNTO_SET = ExpressionParser.EXPR_START_SET + ['TO', 'DOWNTO'] + StatementParser.STMT_FOLLOW_SET
-    TO_DOWNTO_SET_PTT = ExpressionParser.EXPR_START_SET_PTT
-    DO_SET = StatementParser.STMT_START_SET + ['DO'] + StatementParser.STMT_FOLLOW_SET
+    TO_DOWNTO_SET = grammar.TO_DOWNTO_SET
+    TO_DOWNTO_SET_PTT = grammar.TO_DOWNTO_SET_PTT
+    DO_SET = grammar.DO_SET
 
     def __init__(self, parent):
         super().__init__(parent)
@@ -926,11 +943,11 @@ class ForStatementParser(StatementParser):
         token = self.next_token()
         target_token = token
 
-        compound_node = iCodeNodeFactory().create('COMPOUND')
-        loop_node = iCodeNodeFactory().create('LOOP')
-        test_node = iCodeNodeFactory().create('TEST')
+        compound_node = iCodeNodeFactory().create(iCodeNodeType.COMPOUND)
+        loop_node = iCodeNodeFactory().create(iCodeNodeType.LOOP)
+        test_node = iCodeNodeFactory().create(iCodeNodeType.TEST)
 
-        assignment_parser = AssignmentStatementParser(self)
+        assignment_parser = self.get_parser(AssignmentStatementParser)
         init_assign_node = assignment_parser.parse(token)
         if init_assign_node:
             control_type = init_assign_node.get_typespec()
@@ -955,15 +972,15 @@ class ForStatementParser(StatementParser):
             self.error_handler.flag(token, 'MISSING_TO_DOWNTO', self)
 
         if direction == 'TO':
-            rel_op_node = iCodeNodeFactory().create('GT')
+            rel_op_node = iCodeNodeFactory().create(iCodeNodeType.GT)
         else:
-            rel_op_node = iCodeNodeFactory().create('LT')
+            rel_op_node = iCodeNodeFactory().create(iCodeNodeType.LT)
 
         rel_op_node.set_typespec(Predefined.boolean_type)
         control_var_node = init_assign_node.get_children()[0]
         rel_op_node.add_child(control_var_node)
 
-        expression_parser = ExpressionParser(self)
+        expression_parser = self.get_parser(ExpressionParser)
         expr_node = expression_parser.parse(token)
         rel_op_node.add_child(expr_node)
 
@@ -984,22 +1001,22 @@ class ForStatementParser(StatementParser):
         else:
             self.error_handler.flag(token, 'MISSING_DO', self)
 
-        statement_parser = StatementParser(self)
+        statement_parser = self.get_parser(StatementParser)
         loop_node.add_child(statement_parser.parse(token))
 
-        next_assign_node = iCodeNodeFactory().create('ASSIGN')
+        next_assign_node = iCodeNodeFactory().create(iCodeNodeType.ASSIGN)
         next_assign_node.set_typespec(control_type)
         next_assign_node.add_child(copy.copy(control_var_node))
 
         if direction == 'TO':
-            arith_op_node = iCodeNodeFactory().create('ADD')
+            arith_op_node = iCodeNodeFactory().create(iCodeNodeType.ADD)
         else:
-            arith_op_node = iCodeNodeFactory().create('SUBTRACT')
+            arith_op_node = iCodeNodeFactory().create(iCodeNodeType.SUBTRACT)
 
         arith_op_node.get_typespec(Predefined.integer_type)
         arith_op_node.add_child(control_var_node)
-        one_node = iCodeNodeFactory().create('INTEGER_CONSTANT')
-        one_node.set_attribute('VALUE', 1)
+        one_node = iCodeNodeFactory().create(iCodeNodeType.INTEGER_CONSTANT)
+        one_node.value = 1
         one_node.set_typespec(Predefined.integer_type)
         arith_op_node.add_child(one_node)
 
@@ -1012,7 +1029,7 @@ class ForStatementParser(StatementParser):
 
 
 class IfStatementParser(StatementParser):
-    THEN_SET = StatementParser.STMT_START_SET + ['THEN'] + StatementParser.STMT_FOLLOW_SET
+    THEN_SET = grammar.THEN_SET
 
     def __init__(self, parent):
         super().__init__(parent)
@@ -1020,8 +1037,8 @@ class IfStatementParser(StatementParser):
     def parse(self, token):
         token = self.next_token()
 
-        if_node = iCodeNodeFactory().create('IF')
-        expression_parser = ExpressionParser(self)
+        if_node = iCodeNodeFactory().create(iCodeNodeType.IF)
+        expression_parser = self.get_parser(ExpressionParser)
         expr_node = expression_parser.parse(token)
         if_node.add_child(expr_node)
 
@@ -1039,7 +1056,7 @@ class IfStatementParser(StatementParser):
         else:
             self.error_handler.flag(token, 'MISSING_THEN', self)
 
-        statement_parser = StatementParser(self)
+        statement_parser = self.get_parser(StatementParser)
         if_node.add_child(statement_parser.parse(token))
         token = self.current_token()
 
@@ -1052,21 +1069,21 @@ class IfStatementParser(StatementParser):
 
 
 class RepeatStatementParser(StatementParser):
-    THEN_SET = StatementParser.STMT_START_SET + ['THEN'] + StatementParser.STMT_FOLLOW_SET
+    THEN_SET = grammar.THEN_SET
 
     def __init__(self, parent):
         super().__init__(parent)
 
     def parse(self, token):
         token = self.next_token()
-        loop_node = iCodeNodeFactory().create('LOOP')
-        test_node = iCodeNodeFactory().create('TEST')
+        loop_node = iCodeNodeFactory().create(iCodeNodeType.LOOP)
+        test_node = iCodeNodeFactory().create(iCodeNodeType.TEST)
 
-        statement_parser = StatementParser(self)
+        statement_parser = self.get_parser(StatementParser)
         statement_parser.parse_list(token, loop_node, 'UNTIL', 'MISSING_UNTIL')
         token = self.current_token()
 
-        express_parser = ExpressionParser(self)
+        express_parser = self.get_parser(ExpressionParser)
         expr_node = express_parser.parse(token)
         test_node.add_child(expr_node)
         loop_node.add_child(test_node)
@@ -1083,7 +1100,7 @@ class RepeatStatementParser(StatementParser):
 
 
 class WhileStatementParser(StatementParser):
-    DO_SET = StatementParser.STMT_START_SET + ['DO'] + StatementParser.STMT_FOLLOW_SET
+    DO_SET = grammar.DO_SET
 
     def __init__(self, parent):
         super().__init__(parent)
@@ -1092,14 +1109,14 @@ class WhileStatementParser(StatementParser):
     def parse(self, token):
         token = self.next_token()
 
-        loop_node = iCodeNodeFactory().create('LOOP')
-        break_node = iCodeNodeFactory().create('TEST')
-        not_node = iCodeNodeFactory().create('NOT')
+        loop_node = iCodeNodeFactory().create(iCodeNodeType.LOOP)
+        break_node = iCodeNodeFactory().create(iCodeNodeType.TEST)
+        not_node = iCodeNodeFactory().create(iCodeNodeType.NOT)
 
         loop_node.add_child(break_node)
         break_node.add_child(not_node)
 
-        expression_parser = ExpressionParser(self)
+        expression_parser = self.get_parser(ExpressionParser)
         expr_node = expression_parser.parse(token)
         not_node.add_child(expr_node)
 
@@ -1117,23 +1134,18 @@ class WhileStatementParser(StatementParser):
         else:
             self.error_handler.flag(token, 'MISSING_DO', self)
 
-        statement_parser = StatementParser(self)
+        statement_parser = self.get_parser(StatementParser)
         loop_node.add_child(statement_parser.parse(token))
 
         return loop_node
 
 
 class ConstantDefinitionsParser(DeclarationsParser):
-    IDENTIFIER_SET = copy.deepcopy(DeclarationsParser.TYPE_START_SET)
-    IDENTIFIER_SET.append('IDENTIFIER')
-    CONSTANT_START_SET = ['PLUS', 'MINUS', 'SEMICOLON']
-    CONSTANT_START_SET_PTT = [PTT.IDENTIFIER, PTT.INTEGER, PTT.REAL, PTT.STRING]
-    EQUALS_SET = copy.deepcopy(CONSTANT_START_SET)
-    EQUALS_SET.append('EQUALS')
-    EQUALS_SET.append('SEMICOLON')
-    NEXT_START_SET = copy.deepcopy(DeclarationsParser.TYPE_START_SET)
-    NEXT_START_SET.append('SEMICOLON')
-    NEXT_START_SET.append('IDENTIFIER')
+    IDENTIFIER_SET = grammar.CONSTANT_IDENTIFIER_SET
+    CONSTANT_START_SET = grammar.CONSTANT_START_SET
+    CONSTANT_START_SET_PTT = grammar.CONSTANT_START_SET_PTT
+    EQUALS_SET = grammar.CONSTANT_EQUALS_SET
+    NEXT_START_SET = grammar.CONSTANT_NEXT_START_SET
 
     def __init__(self, parent):
         super().__init__(parent)
@@ -1143,10 +1155,10 @@ class ConstantDefinitionsParser(DeclarationsParser):
         token = self.synchronize(ConstantDefinitionsParser.IDENTIFIER_SET)
         while token.ptype == PTT.IDENTIFIER:
             name = token.value.lower()
-            constant_id = Parser.symtab_stack.lookup_local(name)
+            constant_id = self.symtab_stack.lookup_local(name)
 
             if not constant_id:
-                constant_id = Parser.symtab_stack.enter_local(name)
+                constant_id = self.symtab_stack.enter_local(name)
                 constant_id.append_line_number(token.line_num)
             else:
                 self.error_handler.flag(token, 'IDENTIFIER_REDEFINED', self)
@@ -1160,7 +1172,7 @@ class ConstantDefinitionsParser(DeclarationsParser):
             else:
                 self.error_handler.flag(token, 'MISSING_EQUALS', self)
 
-            constant_token = copy.copy(token)
+            constant_token = token
             value = self.parse_constant(token)
 
             if constant_id:
@@ -1219,7 +1231,7 @@ class ConstantDefinitionsParser(DeclarationsParser):
 
     def parse_identifier_constant(self, token, sign):
         name = token.value.lower()
-        id = Parser.symtab_stack.lookup(name)
+        id = self.symtab_stack.lookup(name)
 
         self.next_token()
 
@@ -1276,7 +1288,7 @@ class ConstantDefinitionsParser(DeclarationsParser):
 
     def get_constant_type_token(self, identifier):
         name = identifier.value.lower()
-        id = Parser.symtab_stack.lookup(name)
+        id = self.symtab_stack.lookup(name)
 
         if not id:
             return None
@@ -1287,15 +1299,11 @@ class ConstantDefinitionsParser(DeclarationsParser):
 
 
 class TypeDefinitionsParser(DeclarationsParser):
-    IDENTIFIER_SET = copy.deepcopy(DeclarationsParser.VAR_START_SET)
-    IDENTIFIER_SET_PTT = [PTT.IDENTIFIER]
-    EQUALS_SET = copy.deepcopy(ConstantDefinitionsParser.CONSTANT_START_SET)
-    EQUALS_SET.append('EQUALS')
-    EQUALS_SET.append('SEMICOLON')
-    FOLLOW_SET = ['SEMICOLON']
-    NEXT_START_SET = copy.deepcopy(DeclarationsParser.VAR_START_SET)
-    NEXT_START_SET.append('SEMICOLON')
-    NEXT_START_SET.append('IDENTIFIER')
+    IDENTIFIER_SET = grammar.TYPE_IDENTIFIER_SET
+    IDENTIFIER_SET_PTT = grammar.TYPE_IDENTIFIER_SET_PTT
+    EQUALS_SET = grammar.TYPE_EQUALS_SET
+    FOLLOW_SET = grammar.TYPE_FOLLOW_SET
+    NEXT_START_SET = grammar.TYPE_NEXT_START_SET
 
     def __init__(self, parent):
         super().__init__(parent)
@@ -1305,10 +1313,10 @@ class TypeDefinitionsParser(DeclarationsParser):
 
         while token.ptype == PTT.IDENTIFIER:
             name = token.value.lower()
-            type_id = Parser.symtab_stack.lookup(name)
+            type_id = self.symtab_stack.lookup(name)
 
             if not type_id:
-                type_id = Parser.symtab_stack.enter_local(name)
+                type_id = self.symtab_stack.enter_local(name)
                 type_id.append_line_number(token.line_num)
             else:
                 self.error_handler.flag(token, 'IDENTIFIER_REDEFINED', self)
@@ -1320,7 +1328,7 @@ class TypeDefinitionsParser(DeclarationsParser):
             else:
                 self.error_handler.flag(token, 'MISSING_EQUALS', self)
 
-            typespecification_parser = TypeSpecificationParser(self)
+            typespecification_parser = self.get_parser(TypeSpecificationParser)
             type = typespecification_parser.parse(token)
 
             if type_id:
@@ -1350,14 +1358,8 @@ class TypeDefinitionsParser(DeclarationsParser):
 
 
 class TypeSpecificationParser(PascalParserTD):
-    TYPE_START_SET = copy.deepcopy(ConstantDefinitionsParser.CONSTANT_START_SET)
-    TYPE_START_SET.append('LEFT_PAREN')
-    TYPE_START_SET.append('COMMA')
-    TYPE_START_SET.append('SEMICOLON')
-    TYPE_START_SET.append('ARRAY')
-    TYPE_START_SET.append('RECORD')
-    TYPE_START_SET.append('SEMICOLON')
-    TYPE_START_SET_PTT = copy.deepcopy(ConstantDefinitionsParser.CONSTANT_START_SET_PTT)
+    TYPE_START_SET = grammar.TYPE_START_SET
+    TYPE_START_SET_PTT = grammar.TYPE_START_SET_PTT
 
     def __init__(self, parent):
         super().__init__(parent)
@@ -1366,22 +1368,19 @@ class TypeSpecificationParser(PascalParserTD):
         token = self.synchronize(self.TYPE_START_SET, ptt_set=self.TYPE_START_SET_PTT)
         type = token.value
         if type == 'ARRAY':
-            array_type_parser = ArrayTypeParser(self)
+            array_type_parser = self.get_parser(ArrayTypeParser)
             return array_type_parser.parse(token)
         elif type == 'RECORD':
-            record_type_parser = RecordTypeParser(self)
+            record_type_parser = self.get_parser(RecordTypeParser)
             return record_type_parser.parse(token)
         else:
-            simple_type_parser = SimpleTypeParser(self)
+            simple_type_parser = self.get_parser(SimpleTypeParser)
             return simple_type_parser.parse(token)
 
 
 class SimpleTypeParser(TypeSpecificationParser):
-    SIMPLE_TYPE_START_SET = copy.deepcopy(ConstantDefinitionsParser.CONSTANT_START_SET)
-    SIMPLE_TYPE_START_SET.append('LEFT_PAREN')
-    SIMPLE_TYPE_START_SET.append('COMMA')
-    SIMPLE_TYPE_START_SET.append('SEMICOLON')
-    SIMPLE_TYPE_START_SET_PTT = copy.deepcopy(ConstantDefinitionsParser.CONSTANT_START_SET_PTT)
+    SIMPLE_TYPE_START_SET = grammar.SIMPLE_TYPE_START_SET
+    SIMPLE_TYPE_START_SET_PTT = grammar.SIMPLE_TYPE_START_SET_PTT
 
     def __init__(self, parent):
         super().__init__(parent)
@@ -1394,7 +1393,7 @@ class SimpleTypeParser(TypeSpecificationParser):
 
         if token.ptype == PTT.IDENTIFIER:
             name = token.value.lower()
-            id = Parser.symtab_stack.lookup(name)
+            id = self.symtab_stack.lookup(name)
             if id:
                 definition = id.get_definition()
                 if definition == Definition.TYPE:
@@ -1406,7 +1405,7 @@ class SimpleTypeParser(TypeSpecificationParser):
                     token = self.next_token()
                     return None
                 else:
-                    subrange_parser = SubrangeTypeParser(self)
+                    subrange_parser = self.get_parser(SubrangeTypeParser)
                     return subrange_parser.parse(token)
             else:
                 # id == None
@@ -1414,28 +1413,24 @@ class SimpleTypeParser(TypeSpecificationParser):
                 token = self.next_token()
                 return None
         elif token.ptype == PascalSpecialSymbol.LEFT_PAREN:
-            enumration_parser = EnumerationTypeParser(self)
+            enumration_parser = self.get_parser(EnumerationTypeParser)
             return enumration_parser.parse(token)
         elif token.ptype == PTT.RESERVED and (token.value == 'COMMA' or token.value == 'SEMICOLON'):
             self.error_handler.flag(token, 'INVALID_TYPE', self)
             return None
         else:
-            subrange_parser = SubrangeTypeParser(self)
+            subrange_parser = self.get_parser(SubrangeTypeParser)
             return subrange_parser.parse(token)
 
 
 class VariableDeclarationsParser(DeclarationsParser):
-    IDENTIFIER_SET = copy.deepcopy(DeclarationsParser.VAR_START_SET)
-    IDENTIFIER_SET.append('END')
-    IDENTIFIER_SET.append('SEMICOLON')
-    IDENTIFIER_SET_PTT = [PTT.IDENTIFIER, ]
-    NEXT_START_SET = copy.deepcopy(DeclarationsParser.ROUTINE_START_SET)
-    NEXT_START_SET.append('IDENTIFIER')
-    NEXT_START_SET.append('SEMICOLON')
-    IDENTIFIER_START_SET = ['IDENTIFIER', 'COMMA']
-    IDENTIFIER_FOLLOW_SET = ['COLON', 'SEMICOLON'] + DeclarationsParser.VAR_START_SET
-    COMMA_SET = ['COMMA', 'COLON', 'IDENTIFIER', 'SEMICOLON']
-    COLON_SET = ['COLON', 'SEMICOLON']
+    IDENTIFIER_SET = grammar.VAR_IDENTIFIER_SET
+    IDENTIFIER_SET_PTT = grammar.VAR_IDENTIFIER_SET_PTT
+    NEXT_START_SET = grammar.VAR_NEXT_START_SET
+    IDENTIFIER_START_SET = grammar.IDENTIFIER_START_SET
+    IDENTIFIER_FOLLOW_SET = grammar.IDENTIFIER_FOLLOW_SET
+    COMMA_SET = grammar.VAR_COMMA_SET
+    COLON_SET = grammar.VAR_COLON_SET
 
     def __init__(self, parent):
         self.definition = None
@@ -1464,7 +1459,7 @@ class VariableDeclarationsParser(DeclarationsParser):
 
         return None
 
-    def parse_identifier_sublist(self, token, follow_set, comma_set, ptt_set=[]):
+    def parse_identifier_sublist(self, token, follow_set, comma_set, ptt_set=grammar.EMPTY_SET):
         sublist = []
         first = True
 
@@ -1507,9 +1502,9 @@ class VariableDeclarationsParser(DeclarationsParser):
         id = None
         if token.ptype == PTT.IDENTIFIER:
             name = token.value
-            id = Parser.symtab_stack.lookup_local(name)
+            id = self.symtab_stack.lookup_local(name)
             if not id:
-                id = Parser.symtab_stack.enter_local(name)
+                id = self.symtab_stack.enter_local(name)
                 id.set_definition(self.definition)
                 id.append_line_number(token.line_num)
             else:
@@ -1528,7 +1523,7 @@ class VariableDeclarationsParser(DeclarationsParser):
         else:
             self.error_handler.flag(token, 'MISSING_COLON', self)
 
-        typespec_parser = TypeSpecificationParser(self)
+        typespec_parser = self.get_parser(TypeSpecificationParser)
         type = typespec_parser.parse(token)
 
         if self.definition == Definition.VARIABLE and self.definition == Definition.FIELD and type and (not type.get_identifier()):
@@ -1541,9 +1536,7 @@ class VariableDeclarationsParser(DeclarationsParser):
 
 
 class RecordTypeParser(TypeSpecificationParser):
-    END_SET = copy.deepcopy(DeclarationsParser.VAR_START_SET)
-    END_SET.append('END')
-    END_SET.append('SEMICOLON')
+    END_SET = grammar.RECORD_END_SET
 
     def __init__(self, parent):
         self.definition = None
@@ -1552,13 +1545,13 @@ class RecordTypeParser(TypeSpecificationParser):
     def parse(self, token):
         record_type = TypeSpec(TypeForm.RECORD)
         token = self.next_token()
-        record_type.set_attribute('RECORD_SYMTAB', Parser.symtab_stack.push(None))
+        record_type.set_attribute('RECORD_SYMTAB', self.symtab_stack.push(None))
 
         var_decl_parser = VariableDeclarationsParser(self)
         var_decl_parser.set_definition(Definition.FIELD)
         var_decl_parser.parse(token, None)
 
-        Parser.symtab_stack.pop()
+        self.symtab_stack.pop()
 
         token = self.synchronize(self.END_SET)
         if token.ptype == PTT.RESERVED and token.value == 'END':
@@ -1580,8 +1573,8 @@ class SubrangeTypeParser(TypeSpecificationParser):
         min_val = None
         max_val = None
 
-        constant_token = copy.copy(token)
-        constant_parser = ConstantDefinitionsParser(self)
+        constant_token = token
+        constant_parser = self.get_parser(ConstantDefinitionsParser)
         min_val = constant_parser.parse_constant(token)
 
         if constant_token.ptype == PTT.IDENTIFIER:
@@ -1601,7 +1594,7 @@ class SubrangeTypeParser(TypeSpecificationParser):
             if not saw_dot_dot:
                 self.error_handler.flag(token, 'MISSING_DOT_DOT', self)
             token = self.synchronize(ConstantDefinitionsParser.CONSTANT_START_SET, ptt_set=ConstantDefinitionsParser.CONSTANT_START_SET_PTT)
-            constant_token = copy.copy(token)
+            constant_token = token
             max_val = constant_parser.parse_constant(token)
 
             if constant_token.ptype == PTT.IDENTIFIER:
@@ -1642,8 +1635,8 @@ class SubrangeTypeParser(TypeSpecificationParser):
 
 
 class EnumerationTypeParser(TypeSpecificationParser):
-    ENUM_CONSTANT_START_SET = ['IDENTIFIER', 'COMMA']
-    ENUM_DEFINITION_FOLLOW_SET = ['RIGHT_PAREN', 'SEMICOLON'] + DeclarationsParser.VAR_START_SET
+    ENUM_CONSTANT_START_SET = grammar.ENUM_CONSTANT_START_SET
+    ENUM_DEFINITION_FOLLOW_SET = grammar.ENUM_DEFINITION_FOLLOW_SET
 
     def __init__(self, parent):
         self.definition = None
@@ -1692,12 +1685,12 @@ class EnumerationTypeParser(TypeSpecificationParser):
     def parse_enum_identifier(self, token, value, enum_type, constants):
         if token.ptype == PTT.IDENTIFIER:
             name = token.value.lower()
-            const_id = Parser.symtab_stack.lookup_local(name)
+            const_id = self.symtab_stack.lookup_local(name)
 
             if const_id:
                 self.error_handler.flag(token, 'IDENTIFIER_REDEFINED', self)
             else:
-                const_id = Parser.symtab_stack.enter_local(name)
+                const_id = self.symtab_stack.enter_local(name)
                 const_id.set_definition(Definition.ENUMERATION_CONSTANT)
                 const_id.set_typespec(enum_type)
                 const_id.set_attribute('CONSTANT_VALUE', value)
@@ -1708,19 +1701,14 @@ class EnumerationTypeParser(TypeSpecificationParser):
             self.error_handler.flag(token, 'MISSING_IDENTIFIER', self)
 
 class ArrayTypeParser(TypeSpecificationParser):
-    LEFT_BRACKET_SET = copy.deepcopy(SimpleTypeParser.SIMPLE_TYPE_START_SET)
-    LEFT_BRACKET_SET.append('LEFT_BRACKET')
-    LEFT_BRACKET_SET.append('RIGHT_BRACKET')
-    LEFT_BRACKET_SET_PTT = copy.deepcopy(SimpleTypeParser.SIMPLE_TYPE_START_SET_PTT)
-    RIGHT_BRACKET_SET = ['RIGHT_BRACKET', 'OF', 'SEMICOLON']
-    OF_SET = copy.deepcopy(TypeSpecificationParser.TYPE_START_SET)
-    OF_SET.append('OF')
-    OF_SET.append('SEMICOLON')
-    INDEX_START_SET = copy.deepcopy(SimpleTypeParser.SIMPLE_TYPE_START_SET)
-    INDEX_START_SET.append('COMMA')
-    INDEX_START_SET_PTT = copy.deepcopy(SimpleTypeParser.SIMPLE_TYPE_START_SET_PTT)
-    INDEX_END_SET = ['RIGHT_BRACKET', 'OF', 'SEMICOLON']
-    INDEX_FOLLOW_SET = copy.deepcopy(INDEX_START_SET) + INDEX_END_SET
+    LEFT_BRACKET_SET = grammar.ARRAY_LEFT_BRACKET_SET
+    LEFT_BRACKET_SET_PTT = grammar.ARRAY_LEFT_BRACKET_SET_PTT
+    RIGHT_BRACKET_SET = grammar.ARRAY_RIGHT_BRACKET_SET
+    OF_SET = grammar.ARRAY_OF_SET
+    INDEX_START_SET = grammar.INDEX_START_SET
+    INDEX_START_SET_PTT = grammar.INDEX_START_SET_PTT
+    INDEX_END_SET = grammar.INDEX_END_SET
+    INDEX_FOLLOW_SET = grammar.INDEX_FOLLOW_SET
 
     def __init__(self, parent):
         self.definition = None
@@ -1782,7 +1770,7 @@ class ArrayTypeParser(TypeSpecificationParser):
 
 
     def parse_index_type(self, token, array_type):
-        simple_parser = SimpleTypeParser(self)
+        simple_parser = self.get_parser(SimpleTypeParser)
         index_type = simple_parser.parse(token)
         array_type.set_attribute('ARRAY_INDEX_TYPE', index_type)
 
@@ -1806,37 +1794,12 @@ class ArrayTypeParser(TypeSpecificationParser):
         array_type.set_attribute('ARRAY_ELEMENT_COUNT', count)
 
     def parse_element_type(self, token):
-        typespec_parser = TypeSpecificationParser(self)
+        typespec_parser = self.get_parser(TypeSpecificationParser)
         return typespec_parser.parse(token)
 
 
 
 def set_line_number(node, token):
     if node:
-        node.set_attribute('LINE', token.line_num)
-
-
-def get_content_type(value):
-    if isinstance(value, Token):
-        name = value.value.lower()
-        id = Parser.symtab_stack.lookup(name)
-        if not id:
-            return None
-
-        defination = id.get_definition()
-        if defination == Definition.CONSTANT or defination == Definition.ENUMERATION_CONSTANT:
-            return id.get_typespec()
-        return None
+        node.line = token.line_num
 
-    else:
-        content_type = None
-        if isinstance(value, int):
-            content_type = Predefined.integer_type
-        elif isinstance(value, float):
-            content_type = Predefined.real_type
-        elif isinstance(value, str):
-            if len(value) == 1:
-                content_type = Predefined.char_type
-            else:
-                content_type = TypeSpec(value)
-        return content_type
@@ -1,3 +1,4 @@
+import re
 import sys
 import copy
 
@@ -17,14 +18,18 @@ from pascal.pascal_parser import StatementParser, ExpressionParser, Declarations
 #import pascal.pascal_parser
 
 from pascal.pascal_token import *
+import pascal.pascal_grammar_sets as grammar
 from pascal.pascal_parser import *
 
+# ブロックを読み飛ばす時に探す、コメント、文字列とブロックの構造を決める予約語
+BLOCK_WORD_RE = re.compile(r"\{[^}]*(?:\}|\Z)|\(\*.*?(?:\*\)|\Z)|//[^\n]*|'(?:[^']|'')*'?|"
+                           r"(?<![A-Za-z0-9])(?P<word>begin|case|end|record|procedure|function|forward)(?![A-Za-z0-9])",
+                           re.IGNORECASE | re.DOTALL)
+
 
 class CallParser(StatementParser):
-    COMMA_SET = copy.deepcopy(ExpressionParser.EXPR_START_SET)
-    COMMA_SET_PTT = copy.deepcopy(ExpressionParser.EXPR_START_SET_PTT)
-    COMMA_SET.append('COMMA')
-    COMMA_SET.append('RIGHT_PAREN')
+    COMMA_SET = grammar.CALL_COMMA_SET
+    COMMA_SET_PTT = grammar.CALL_COMMA_SET_PTT
 
     def __init__(self, parent):
         super().__init__(parent)
@@ -32,13 +37,13 @@ class CallParser(StatementParser):
     # CallParser
     def parse(self, token:Token):
         name = token.value.lower()
-        pfid = Parser.symtab_stack.lookup(name)
+        pfid = self.symtab_stack.lookup(name)
         routine_code = pfid.get_attribute('ROUTINE_CODE')
 
         if routine_code == 'DECLARED' or routine_code == 'FORWARD':
-            call_parser = CallDeclaredParser(self)
+            call_parser = self.get_parser(CallDeclaredParser)
         else:
-            call_parser = CallStandardParser(self)
+            call_parser = self.get_parser(CallStandardParser)
 
         return call_parser.parse(token)
 
@@ -48,8 +53,8 @@ class CallParser(StatementParser):
 
         :type is_write: bool
         """
-        expression_parser: ExpressionParser = ExpressionParser(self)
-        prms_node: iCodeNode = iCodeNodeFactory().create('PARAMETERS')
+        expression_parser: ExpressionParser = self.get_parser(ExpressionParser)
+        prms_node: iCodeNode = iCodeNodeFactory().create(iCodeNodeType.PARAMETERS)
         formal_prms = []
         prms_cnt = 0
         prms_index = -1
@@ -79,14 +84,14 @@ class CallParser(StatementParser):
             elif is_read:
                 typespec: TypeSpec = actual_node.get_typespec()
                 form: TypeForm = typespec.get_form()
-                if not (actual_node.get_type() == 'VARIABLE' and
+                if not (actual_node.get_type() == iCodeNodeType.VARIABLE and
                         (form == TypeForm.SCALAR or
                          typespec == Predefined.boolean_type or
                          (form == TypeForm.SUBRANGE and typespec.base_type() == Predefined.integer_type))):
                     self.error_handler.flag(token, 'INVALID_VAR_PARM', self)
             elif is_write:
                 expr_node: iCodeNode = copy.deepcopy(actual_node)
-                actual_node = iCodeNodeFactory().create('WRITE_PARM')
+                actual_node = iCodeNodeFactory().create(iCodeNodeType.WRITE_PARM)
                 actual_node.add_child(expr_node)
 
                 typespec: TypeSpec = expr_node.get_typespec().base_type()
@@ -133,7 +138,7 @@ class CallParser(StatementParser):
     def parse_write_spec(self, token: PascalWordToken):
         if token.value == 'COLON':
             token = self.next_token()
-            expression_parser: ExpressionParser = ExpressionParser(self)
+            expression_parser: ExpressionParser = self.get_parser(ExpressionParser)
             spec_node: iCodeNode = expression_parser.parse(token)
             if spec_node.get_type() == iCodeNodeType.STRING_CONSTANT:
                 return spec_node
@@ -151,10 +156,10 @@ class CallDeclaredParser(CallParser):
 
     # CallDeclaredParser
     def parse(self, token):
-        call_node = iCodeNodeFactory().create('CALL')
+        call_node = iCodeNodeFactory().create(iCodeNodeType.CALL)
         name: str = token.value.lower()
-        pfid = Parser.symtab_stack.lookup(name)
-        call_node.set_attribute('ID', pfid)
+        pfid = self.symtab_stack.lookup(name)
+        call_node.id = pfid
         call_node.set_typespec(pfid.get_typespec())
 
         token = self.next_token()
@@ -169,12 +174,12 @@ class CallStandardParser(CallParser):
         super().__init__(parent)
 
     def parse(self, token):
-        call_node: iCodeNode = iCodeNodeFactory().create('CALL')
+        call_node: iCodeNode = iCodeNodeFactory().create(iCodeNodeType.CALL)
         name: str = token.value.lower()
-        pfid: SymTabEntry = Parser.symtab_stack.lookup(name)
+        pfid: SymTabEntry = self.symtab_stack.lookup(name)
         routine_code: str = pfid.get_attribute('ROUTINE_CODE')
 
-        call_node.set_attribute('ID', pfid)
+        call_node.id = pfid
         token = self.next_token()
 
         if routine_code == 'READ' or routine_code == 'READLN':
@@ -204,7 +209,7 @@ class CallStandardParser(CallParser):
         prms_node: iCodeNode = self.parse_actual_parameters(token, pfid, False, True, False)
         call_node.add_child(prms_node)
 
-        if pfid == Predefined.readln_id and len(call_node.get_children()) == 0:
+        if pfid.get_attribute('ROUTINE_CODE') == 'READLN' and len(call_node.get_children()) == 0:
             self.error_handler.flag(token, 'WRONG_NUMBER_OF_PARMS', self)
 
         return call_node
@@ -213,7 +218,7 @@ class CallStandardParser(CallParser):
         prms_node: iCodeNode = self.parse_actual_parameters(token, pfid, False, False, True)
         call_node.add_child(prms_node)
 
-        if pfid == Predefined.writeln_id and len(call_node.get_children()) == 0:
+        if pfid.get_attribute('ROUTINE_CODE') == 'WRITELN' and len(call_node.get_children()) == 0:
             self.error_handler.flag(token, 'WRONG_NUMBER_OF_PARMS', self)
 
         return call_node
@@ -330,20 +335,15 @@ def check_parm_count(token, prms_node, count):
 
 class DeclaredRoutineParser(DeclarationsParser):
 
-    PARAMETER_SET = copy.deepcopy(DeclarationsParser.DECLARATION_START_SET)
-    PARAMETER_SET = PARAMETER_SET + ['VAR', 'RIGHT_PAREN']
-    PARAMETER_SET_PTT = [PTT.IDENTIFIER, ]
-
-    LEFT_PAREN_SET = copy.deepcopy(DeclarationsParser.DECLARATION_START_SET)
-    LEFT_PAREN_SET = LEFT_PAREN_SET + ['LEFT_PAREN', 'SEMICOLON', 'COLON']
+    PARAMETER_SET = grammar.PARAMETER_SET
+    PARAMETER_SET_PTT = grammar.PARAMETER_SET_PTT
 
-    RIGHT_PAREN_SET = copy.deepcopy(DeclarationsParser.DECLARATION_START_SET)
-    RIGHT_PAREN_SET = RIGHT_PAREN_SET + ['RIGHT_PAREN', 'SEMICOLON', 'COLON']
+    LEFT_PAREN_SET = grammar.LEFT_PAREN_SET
+    RIGHT_PAREN_SET = grammar.RIGHT_PAREN_SET
 
-    PARAMETER_FOLLOW_SET = ['COLON', 'RIGHT_PAREN', 'SEMICOLON'] + \
-                           copy.deepcopy(DeclarationsParser.DECLARATION_START_SET)
-    COMMA_SET = ['COMMA', 'COLON', 'RIGHT_PAREN', 'SEMICOLON'] + copy.deepcopy(DeclarationsParser.DECLARATION_START_SET)
-    COMMA_SET_PTT = [PTT.IDENTIFIER, ]
+    PARAMETER_FOLLOW_SET = grammar.PARAMETER_FOLLOW_SET
+    COMMA_SET = grammar.PARAMETER_COMMA_SET
+    COMMA_SET_PTT = grammar.PARAMETER_COMMA_SET_PTT
 
     def __init__(self, parent):
         self.dummy_counter = 0
@@ -353,6 +353,7 @@ class DeclaredRoutineParser(DeclarationsParser):
     def parse(self, token, parent_id: SymTabEntry) -> SymTabEntry:
         routine_defn: Definition = None
         routine_type = token.value
+        routine_start = self.get_token_offset(token)
 
         if routine_type == 'PROGRAM':
             token = self.next_token()
@@ -382,12 +383,12 @@ class DeclaredRoutineParser(DeclarationsParser):
 
         if routine_id.get_attribute('ROUTINE_CODE') == 'FORWARD':
             symtab: SymTab = routine_id.get_attribute('ROUTINE_SYMTAB')
-            Parser.symtab_stack.push(symtab)
+            self.symtab_stack.push(symtab)
         else:
-            routine_id.set_attribute('ROUTINE_SYMTAB', Parser.symtab_stack.push(None))
+            routine_id.set_attribute('ROUTINE_SYMTAB', self.symtab_stack.push(None))
 
         if routine_defn == Definition.PROGRAM:
-            Parser.symtab_stack.set_program_id(routine_id)
+            self.symtab_stack.set_program_id(routine_id)
         elif routine_id.get_attribute('ROUTINE_CODE') != 'FORWARD':
             subroutines = parent_id.get_attribute('ROUTINE_ROUTINES')
             subroutines.append(routine_id)
@@ -410,22 +411,83 @@ class DeclaredRoutineParser(DeclarationsParser):
         if token.ptype == PTT.IDENTIFIER and token.value.lower() == 'forward':
             token = self.next_token()
             routine_id.set_attribute('ROUTINE_CODE', 'FORWARD')
+            # FORWARDの宣言の位置。ルーチンの名前はここから見えるので、差分の構文解析で使う。
+            if routine_start != None:
+                routine_id.set_attribute('ROUTINE_FORWARD', routine_start)
         else:
             routine_id.set_attribute('ROUTINE_CODE', 'DECLARED')
-            block_parser: BlockParser = BlockParser(self)
-            root_node: iCodeNode = block_parser.parse(token, routine_id)
-            icode.set_root(root_node)
+            block_start = self.get_token_offset(token)
+            if self.context.skip_routine_blocks and block_start != None and \
+                    self.symtab_stack.get_current_nesting_level() == 2:
+                # プログラム直下のルーチンのブロックは、後で別に構文解析する
+                self.skip_block(token)
+            else:
+                block_parser: BlockParser = self.get_parser(BlockParser)
+                root_node: iCodeNode = block_parser.parse(token, routine_id)
+                icode.set_root(root_node)
+
+            # ソース中の位置(宣言の先頭、ブロックの先頭、宣言の次のTokenの先頭)。差分の構文解析で使う。
+            if routine_start != None:
+                routine_end = self.get_token_offset(self.current_token())
+                routine_id.set_attribute('ROUTINE_SPAN', (routine_start, block_start, routine_end))
 
-        Parser.symtab_stack.pop()
+        self.symtab_stack.pop()
         return routine_id
 
+    def skip_block(self, token):
+        """
+        ブロックを構文解析せずに読み飛ばし、ブロックの次のTokenを返す。
+        Tokenは作らずに、バッファの中のコメント、文字列とブロックの構造を決める予約語だけを正規表現で探す。
+        読み飛ばした所が正しいかどうかは、後でブロックを構文解析した時に確かめる。
+        """
+        buffer = self.scanner.source.buffer
+        routines = 1
+        header = False
+        record_depth = 0
+        depth = 0
+        for m in BLOCK_WORD_RE.finditer(buffer, self.get_token_offset(token)):
+            word = m.group('word')
+            if word == None:
+                continue
+            word = word.lower()
+            if header:
+                # 入れ子の手続きと関数のヘッダの次がforwardなら、ブロックは無い
+                header = False
+                if word == 'forward':
+                    routines -= 1
+                    continue
+            if depth == 0:
+                # 宣言の部分
+                if word == 'record':
+                    record_depth += 1
+                elif word == 'end' and record_depth > 0:
+                    record_depth -= 1
+                elif word == 'begin' and record_depth == 0:
+                    depth = 1
+                elif word == 'procedure' or word == 'function':
+                    routines += 1
+                    header = True
+            else:
+                # 文の部分
+                if word == 'begin' or word == 'case':
+                    depth += 1
+                elif word == 'end':
+                    depth -= 1
+                    if depth == 0:
+                        routines -= 1
+                        if routines == 0:
+                            self.scanner.seek(m.end())
+                            return self.next_token()
+        self.scanner.seek(len(buffer))
+        return self.next_token()
+
     def parse_routine_name(self, token, dummy_name: str) -> SymTabEntry:
         if token.ptype == PTT.IDENTIFIER:
             routine_name: str = token.value.lower()
-            routine_id: SymTabEntry = Parser.symtab_stack.lookup_local(routine_name)
+            routine_id: SymTabEntry = self.symtab_stack.lookup_local(routine_name)
 
             if not routine_id:
-                routine_id = Parser.symtab_stack.enter_local(routine_name)
+                routine_id = self.symtab_stack.enter_local(routine_name)
             elif routine_id.get_attribute('ROUTINE_CODE') != 'FORWARD':
                 routine_id = None
                 self.error_handler.flag(token, 'IDENTIFIER_REDEFINED', self)
@@ -436,7 +498,7 @@ class DeclaredRoutineParser(DeclarationsParser):
             self.error_handler.flag(token, 'MISSING_IDENTIFIER', self)
 
         if not routine_id:
-            routine_id = Parser.symtab_stack.enter_local(dummy_name)
+            routine_id = self.symtab_stack.enter_local(dummy_name)
 
         return routine_id
 
@@ -514,7 +576,7 @@ class DeclaredRoutineParser(DeclarationsParser):
 
 
 class ProgramParser(DeclarationsParser):
-    PROGRAM_START_SET = ['PROGRAM', 'SEMICOLON'] + DeclarationsParser.DECLARATION_START_SET
+    PROGRAM_START_SET = grammar.PROGRAM_START_SET
 
     def __init__(self, parent):
         super().__init__(parent)
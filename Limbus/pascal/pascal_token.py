@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import math
+import sys
 from enum import Enum,  auto
+from types import MappingProxyType
 from limbus_core.frontend.token import Token, TokenType
 
 
@@ -74,8 +76,34 @@ special_symbols = {
     '..' : PascalSpecialSymbol.DOT_DOT,
 }
 
+# Tokenのvalueに入れる特殊記号の名前
+special_symbol_names = {ptype: sys.intern(ptype.name) for ptype in PascalSpecialSymbol}
+
+# 綴りから(PTT, value)を引く表。予約語は大文字と小文字の綴りを登録しておき、
+# それ以外の大小混じりの綴りだけupper()してから引き直す。
+reserved_words = MappingProxyType(
+    {**{word: (PTT.RESERVED, word) for word in reserved_list},
+     **{word.lower(): (PTT.RESERVED, word) for word in reserved_list}})
+
+special_symbol_table = MappingProxyType(
+    {text: (ptype, special_symbol_names[ptype]) for text, ptype in special_symbols.items()})
+
+
+def classify_word(s):
+    """
+    単語の(PTT, value)を返す。
+    """
+    entry = reserved_words.get(s)
+    if entry == None:
+        entry = reserved_words.get(s.upper())
+        if entry == None:
+            return PTT.IDENTIFIER, sys.intern(s)
+    return entry
+
 
 class PascalWordToken(Token):
+    __slots__ = ('ptype',)
+
     def __init__(self, source):
         self.ptype = None
         super().__init__(source)
@@ -90,15 +118,12 @@ class PascalWordToken(Token):
             if not cc:
                 break
 
-        if s.upper() in reserved_list:
-            self.ptype = PTT.RESERVED
-            self.value = s.upper()
-        else:
-            self.ptype = PTT.IDENTIFIER
-            self.value = s
+        self.ptype, self.value = classify_word(s)
 
 
 class PascalNumberToken(Token):
+    __slots__ = ('ptype',)
+
     MAX_EXPONENT = 37
 
     def __init__(self, source):
@@ -171,37 +196,50 @@ class PascalNumberToken(Token):
         return digits
 
     def compute_float_value(self, whole_digits, fraction_digits, exponent_digits, exponent_sign):
-        fv = 0.0
-        if exponent_digits == None:
-            exponentical_value = 0
-        else:
-            exponentical_value = int(exponent_digits)
-        digits = whole_digits
-
-        if exponent_sign == '-':
-            exponentical_value = -exponentical_value
-
-        if fraction_digits != None:
-            exponentical_value = exponentical_value - len(fraction_digits)
-            digits = digits + fraction_digits
-
-        if abs(exponentical_value + len(whole_digits)) > PascalNumberToken.MAX_EXPONENT:
+        fv = float_value(whole_digits, fraction_digits, exponent_digits, exponent_sign)
+        if fv == None:
             self.type = TokenType.ERROR
             self.value = 'RANGE_REAL'
             return 0.0
 
-        index = 0
-        while index < len(digits):
-            fv = 10 * fv + int(digits[index])
-            index = index + 1
+        return fv
 
-        if exponentical_value != 0:
-            fv = fv * math.pow(10, exponentical_value)
 
-        return fv
+def float_value(whole_digits, fraction_digits, exponent_digits, exponent_sign):
+    """
+    数字の並びから実数値を計算する。指数が範囲外の時はNoneを返す。
+    """
+    fv = 0.0
+    if exponent_digits == None:
+        exponentical_value = 0
+    else:
+        exponentical_value = int(exponent_digits)
+    digits = whole_digits
+
+    if exponent_sign == '-':
+        exponentical_value = -exponentical_value
+
+    if fraction_digits != None:
+        exponentical_value = exponentical_value - len(fraction_digits)
+        digits = digits + fraction_digits
+
+    if abs(exponentical_value + len(whole_digits)) > PascalNumberToken.MAX_EXPONENT:
+        return None
+
+    index = 0
+    while index < len(digits):
+        fv = 10 * fv + int(digits[index])
+        index = index + 1
+
+    if exponentical_value != 0:
+        fv = fv * math.pow(10, exponentical_value)
+
+    return fv
 
 
 class PascalStringToken(Token):
+    __slots__ = ('ptype',)
+
     def __init__(self, source):
         self.ptype = None
         super().__init__(source)
@@ -244,8 +282,9 @@ class PascalStringToken(Token):
 
 
 class PascalSpecialToken(Token):
+    __slots__ = ('ptype',)
 
-    single_chars = "+-*/,;'=(){}^[]"
+    single_chars = frozenset("+-*/,;'=(){}^[]")
 
     def __init__(self, source):
         self.ptype = None
@@ -287,6 +326,5 @@ class PascalSpecialToken(Token):
             return
 
         self.text = text
-        self.ptype = special_symbols[text]
-        self.value = str(self.ptype).split('.')[1]
+        self.ptype, self.value = special_symbol_table[text]
 
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+差分の構文解析(PascalIncrementalParser.edit)が、編集後のソース全体を構文解析したのと同じ結果になること。
+
+    python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import re
+import unittest
+
+from limbus_core.intermidiate.cross_referencer import CrossReferencer
+from limbus_core.intermidiate.parse_tree_printer import ParseTreePrinter
+from pascal.pascal_incremental import PascalIncrementalParser
+
+# 名前の無い型は、tree.xmlにオブジェクトのidを使った名前で出る
+ANONYMOUS_TYPE_RE = re.compile(r'\$anon_\d+')
+
+# fwdはouterとtwiceの前にFORWARDで宣言し、本体はその後ろでtwiceを呼ぶ
+FORWARD_PROGRAM = """PROGRAM fw;
+VAR g : integer;
+
+PROCEDURE fwd(n : integer); FORWARD;
+
+FUNCTION outer(a : integer) : integer;
+    BEGIN
+        outer := a + 1
+    END;
+
+FUNCTION twice(a : integer) : integer;
+    BEGIN
+        twice := a * 2
+    END;
+
+PROCEDURE fwd;
+    VAR k : integer;
+    BEGIN
+        k := twice(n);
+        g := k
+    END;
+
+PROCEDURE later(n : integer);
+    BEGIN
+        fwd(n);
+        g := outer(n)
+    END;
+
+BEGIN
+    g := 1;
+    fwd(g);
+    later(g)
+END.
+"""
+
+# forwardedはfuncの前でforwardで宣言し、func > nested > deeplyの中で呼ぶ
+ROUTINES_PAS = os.path.join(os.path.dirname(__file__), '..', 'pascal_src', 'routines.pas')
+
+
+def parse_state(parser):
+    """
+    エラー、tree.xml、相互参照表。
+    """
+    diagnostics = [(d.error_code, d.line_number, d.position) for d in parser.get_diagnostics()]
+    tree = io.StringIO()
+    ParseTreePrinter(tree).print(parser.get_symTab())
+    xref = io.StringIO()
+    with contextlib.redirect_stdout(xref):
+        CrossReferencer().print(parser.get_symTab())
+    return diagnostics, ANONYMOUS_TYPE_RE.sub('', tree.getvalue()), ANONYMOUS_TYPE_RE.sub('', xref.getvalue())
+
+
+class IncrementalParserTest(unittest.TestCase):
+    def edit(self, text, anchor, new_text):
+        """
+        textのanchorの前にnew_textを入れ、差分で構文解析したルーチンの名前を返す。
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            parser = PascalIncrementalParser(text)
+            at = text.index(anchor)
+            reparsed = parser.edit(at, at, new_text)
+            full = PascalIncrementalParser(parser.text)
+        self.assertEqual(parse_state(parser), parse_state(full))
+        return reparsed.get_name() if reparsed != None else None
+
+    def test_forward_body_sees_routines_before_it(self):
+        # 本体より前、FORWARDの宣言より後ろのtwiceが見える
+        self.assertEqual(self.edit(FORWARD_PROGRAM, '        g := k\n', '        g := g * 2;\n'), 'fwd')
+
+    def test_forward_body_same_line(self):
+        self.assertEqual(self.edit(FORWARD_PROGRAM, 'twice(n)', 'outer(n) + '), 'fwd')
+
+    def test_routine_before_forward_body(self):
+        # outerの本体からは、後ろにあるtwiceとlaterは見えない
+        self.assertEqual(self.edit(FORWARD_PROGRAM, '        outer := a + 1\n', '        g := twice(a);\n'), 'outer')
+
+    def test_routine_after_forward_body(self):
+        self.assertEqual(self.edit(FORWARD_PROGRAM, '        g := outer(n)\n', '        fwd(g + 1);\n'), 'later')
+
+    def test_forward_called_from_nested_block(self):
+        # forwardedの参照はdeeplyの中だけなので、ブロックの行番号を消しても隠さない
+        with open(ROUTINES_PAS) as f:
+            text = f.read()
+        self.assertEqual(self.edit(text, '                w := forwarded(b, w);\n', '                w := w;\n'), 'deeply')
+        self.assertEqual(self.edit(text, '            a := s;\n', '            a := 1;\n'), 'nested')
+        self.assertEqual(self.edit(text, '        func := x;\n', '        z := 1.0;\n'), 'func')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+iCode_optimizerで最適化したiCodeを実行しても、最適化しない時と同じ代入と実行時エラーになること。
+
+    python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from limbus_core.backend.executer import Executer
+from limbus_core.context import CompilationContext
+from limbus_core.frontend.source import BufferedSource
+from limbus_core.intermidiate.iCode_if import iCodeNodeType
+from limbus_core.intermidiate.iCode_optimizer import ConstantFolder, DeadCodeEliminator, preorder
+from limbus_core.message import MessageListener, MessageType
+from pascal.pascal import Pascal, PascalScanner, BackendMessageListener
+from pascal.pascal_parser import PascalParserTD
+
+CONSTANT_PROGRAM = """PROGRAM cp;
+CONST debug = false; mode = 2; limit = 3;
+VAR i, k, s : integer; b : boolean;
+BEGIN
+    i := 0; k := 0; s := 0; b := true;
+    WHILE i < limit DO BEGIN
+        i := i + 1;
+        IF debug THEN k := k + 100 ELSE k := k + 1;
+        IF not debug THEN BEGIN s := s + i END;
+        IF limit > 5 THEN s := 0;
+        CASE mode OF
+            1: s := s - 1;
+            2: BEGIN ; s := s + 10; ; END;
+            3: k := 0
+        END;
+        CASE 7 OF
+            1, 2: k := 0
+        END;
+        CASE i OF
+            1: k := k + 2;
+            2: ;
+            3: BEGIN END
+        END;
+        WHILE debug DO k := k + 1;
+        REPEAT k := k + 1 UNTIL true;
+        REPEAT k := k + 1 UNTIL not false;
+        b := not not b;
+        IF not not (i > 1) THEN s := s + 1;
+        BEGIN BEGIN ; END END
+    END
+END.
+"""
+
+# fwdはFORWARDで宣言し、本体でhelperを呼ぶ。unusedとdeadは、どこからも実行されない所からしか呼ばれない。
+ROUTINE_PROGRAM = """PROGRAM rp;
+CONST debug = false;
+VAR g : integer;
+
+PROCEDURE fwd(n : integer); FORWARD;
+PROCEDURE unused(n : integer); FORWARD;
+
+FUNCTION helper(a : integer) : integer;
+    BEGIN
+        helper := a * 2
+    END;
+
+PROCEDURE dead(n : integer);
+    BEGIN
+        unused(n)
+    END;
+
+PROCEDURE fwd;
+    BEGIN
+        g := helper(n)
+    END;
+
+PROCEDURE unused;
+    BEGIN
+        fwd(n)
+    END;
+
+BEGIN
+    g := 1;
+    IF debug THEN dead(g);
+    fwd(g);
+    g := g + 1
+END.
+"""
+
+
+class TraceListener(MessageListener):
+    """
+    代入と実行時エラーのMessageを、ドライバが出力するのと同じ文字列で集める。
+    """
+    message_types = frozenset([MessageType.ASSIGN, MessageType.RUNTIME_ERROR])
+
+    def __init__(self):
+        self.formatter = BackendMessageListener()
+        self.lines = []
+
+    def message_received(self, msg):
+        self.lines.append(self.formatter.format_message(msg))
+
+
+def parse(text):
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = PascalParserTD(PascalScanner(BufferedSource(io.StringIO(text))), CompilationContext())
+        parser.parse()
+    assert parser.get_error_count() == 0
+    return parser.get_symTab()
+
+
+def execute(symtab_stack):
+    listener = TraceListener()
+    backend = Executer(None)
+    backend.add_message_listener(listener)
+    backend.process(symtab_stack.get_program_id().get_attribute('ROUTINE_ICODE'), symtab_stack)
+    return listener.lines
+
+
+def optimize(symtab_stack):
+    program_id = symtab_stack.get_program_id()
+    return ConstantFolder().optimize(program_id) + DeadCodeEliminator().optimize(program_id)
+
+
+def routine_names(routine_id):
+    return [sub_id.get_name() for sub_id in routine_id.get_attribute('ROUTINE_ROUTINES')]
+
+
+class OptimizerTest(unittest.TestCase):
+    def assert_same_trace(self, text):
+        expected = execute(parse(text))
+        symtab_stack = parse(text)
+        removed = optimize(symtab_stack)
+        self.assertGreater(removed, 0)
+        self.assertEqual(execute(symtab_stack), expected)
+        return symtab_stack
+
+    def test_constant_branches(self):
+        symtab_stack = self.assert_same_trace(CONSTANT_PROGRAM)
+        root = symtab_stack.get_program_id().get_attribute('ROUTINE_ICODE').get_root()
+        node_types = [node.type for node, parent, index in preorder(root)]
+        # 残るのは、外側のWHILEと条件がiのIF, CASEだけ
+        self.assertEqual(node_types.count(iCodeNodeType.LOOP), 1)
+        self.assertEqual(node_types.count(iCodeNodeType.IF), 1)
+        self.assertEqual(node_types.count(iCodeNodeType.SELECT), 1)
+        self.assertNotIn(iCodeNodeType.NO_OP, node_types)
+        # WHILEの条件のNOTと、b := not not bのNOT 2つ。bの値は1のこともあるので、boolにするNOTは残す。
+        self.assertEqual(node_types.count(iCodeNodeType.NOT), 3)
+
+    def test_unused_routines(self):
+        symtab_stack = self.assert_same_trace(ROUTINE_PROGRAM)
+        self.assertEqual(routine_names(symtab_stack.get_program_id()), ['fwd', 'helper'])
+
+    def test_cache_keeps_unoptimized_tree(self):
+        # 'co'で保存したキャッシュを、最適化しない'c'で読んでも、すべてのルーチンがある
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'rp.pas')
+            with open(path, 'w') as fp:
+                fp.write(ROUTINE_PROGRAM)
+            with contextlib.redirect_stdout(io.StringIO()):
+                optimized = Pascal('execute', path, 'co')
+                cached = Pascal('execute', path, 'c')
+            self.assertEqual(routine_names(optimized.symtab_stack.get_program_id()), ['fwd', 'helper'])
+            self.assertEqual(routine_names(cached.symtab_stack.get_program_id()), ['fwd', 'unused', 'helper', 'dead'])
+            self.assertTrue(os.listdir(os.path.join(directory, '__limbuscache__')))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
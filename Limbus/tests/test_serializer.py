@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+iCode_serializerで保存して読み込んだiCodeの定数が、元と同じ型と値になること。
+
+    python -m unittest discover tests
+"""
+import contextlib
+import io
+import unittest
+
+from limbus_core.context import CompilationContext
+from limbus_core.frontend.source import BufferedSource
+from limbus_core.intermidiate import iCode_serializer
+from limbus_core.intermidiate.iCode_if import iCodeNodeType
+from limbus_core.intermidiate.iCode_optimizer import preorder
+from pascal.pascal import PascalScanner
+from pascal.pascal_parser import PascalParserTD
+
+CONSTANT_PROGRAM = """PROGRAM sv;
+VAR x : real;
+BEGIN
+    x := 0; x := 0; x := 0; x := 0; x := 0; x := 0
+END.
+"""
+
+# 等しいが別の定数。0.0と-0.0、1と1.0とTrue
+CONSTANT_VALUES = [0.0, -0.0, 1, 1.0, True, -0.0]
+
+
+def parse(text):
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = PascalParserTD(PascalScanner(BufferedSource(io.StringIO(text))), CompilationContext())
+        parser.parse()
+    assert parser.get_error_count() == 0
+    return parser.get_symTab()
+
+
+def constant_nodes(symtab_stack):
+    root = symtab_stack.get_program_id().get_attribute('ROUTINE_ICODE').get_root()
+    return [node for node, parent, index in preorder(root) if node.type == iCodeNodeType.INTEGER_CONSTANT]
+
+
+class SerializerTest(unittest.TestCase):
+    def test_equal_constants_stay_distinct(self):
+        symtab_stack = parse(CONSTANT_PROGRAM)
+        nodes = constant_nodes(symtab_stack)
+        self.assertEqual(len(nodes), len(CONSTANT_VALUES))
+        for node, value in zip(nodes, CONSTANT_VALUES):
+            node.value = value
+        loaded = iCode_serializer.loads(iCode_serializer.dumps(symtab_stack))
+        values = [node.value for node in constant_nodes(loaded)]
+        self.assertEqual([(type(value), repr(value)) for value in values],
+                         [(type(value), repr(value)) for value in CONSTANT_VALUES])
+
+
+if __name__ == '__main__':
+    unittest.main()